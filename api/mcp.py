@@ -2,9 +2,10 @@ from http.server import BaseHTTPRequestHandler
 import json
 import sys
 import os
+import tempfile
 
-# Mock ML function for deployment
-def classify_dm(text):
+# Fallback when no distilled model is deployed
+def keyword_classify(text):
     """Mock toxicity classifier"""
     # Simple keyword-based detection for demo
     toxic_words = ['hate', 'stupid', 'idiot', 'kill', 'die', 'fuck']
@@ -16,14 +17,38 @@ def classify_dm(text):
     
     return "NON_TOXIC", 0.2
 
-import praw
+# Shared Reddit client lives in the securedm package at the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from securedm import metrics
+from securedm.distill import load_distilled
+from securedm.redditclient import get_reddit, fetch_user_pages
+from securedm.userstore import UserStore
+from securedm.bulkanalysis import BulkAnalyzer, BULK_MAX_USERS, get_bucket, parse_usernames, summary_text
+
+USER_AGENT = "ToxicityMCP/1.0"
+
+# toxic-bert can't cold-start in a serverless function; a linear model distilled
+# from it (python securedm/distill.py train ...) loads in milliseconds
+DISTILLED_PATH = os.getenv("SECUREDM_DISTILLED", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "toxicity_distilled.bin"))
+try:
+    distilled_model = load_distilled(DISTILLED_PATH)
+except (OSError, ValueError) as e:
+    print(f"⚠️ Distilled model unavailable ({e}), falling back to keyword matching")
+    distilled_model = None
+
+def classify_dm(text):
+    """Toxicity of one text from the distilled model, or keyword matching without one"""
+    if distilled_model is None:
+        return keyword_classify(text)
+    return distilled_model.classify(text)
 
-# Reddit configuration
-REDDIT_CONFIG = {
-    "client_id": "8GP0nJUPDOfiht-FUS7Cig",
-    "client_secret": "6wzYEv5IZJFTJjh-o3iW5mRZ-GT-gw",
-    "user_agent": "ToxicityMCP/1.0"
-}
+# Warm serverless instances keep /tmp, so repeat lookups only fetch new comments
+user_store = UserStore(
+    os.path.join(tempfile.gettempdir(), "reddit_toxicity_users.sqlite"),
+    classify_fn=lambda texts: [classify_dm(text) for text in texts],
+    # A newly deployed artifact re-classifies stored items instead of serving old verdicts
+    model_id=f"distilled:{distilled_model.fingerprint}" if distilled_model is not None else "keywords"
+)
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
@@ -49,9 +74,12 @@ class handler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
-        response = {"status": "Reddit Toxicity MCP Server", "tools": ["validate", "analyze_reddit_user", "classify_text"]}
+        response = {"status": "Reddit Toxicity MCP Server", "tools": ["validate", "analyze_reddit_user", "analyze_reddit_users", "classify_text"],
+                    "classifier": "distilled" if distilled_model is not None else "keywords"}
         self.wfile.write(json.dumps(response).encode())
 
+TOOL_NAMES = ("validate", "analyze_reddit_user", "analyze_reddit_users", "classify_text", "get_stats")
+
 def handle_request(request):
     """Handle MCP requests"""
     method = request.get("method")
@@ -83,6 +111,18 @@ def handle_request(request):
                         "required": ["username"]
                     }
                 },
+                {
+                    "name": "analyze_reddit_users",
+                    "description": "Analyze toxicity of many Reddit users at once, within Reddit's rate limit",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "usernames": {"type": "array", "items": {"type": "string"}},
+                            "max_posts": {"type": "integer", "default": 10}
+                        },
+                        "required": ["usernames"]
+                    }
+                },
                 {
                     "name": "classify_text",
                     "description": "Classify text toxicity",
@@ -93,6 +133,16 @@ def handle_request(request):
                         },
                         "required": ["text"]
                     }
+                },
+                {
+                    "name": "get_stats",
+                    "description": "Per-stage latency, batch size, cache and error metrics of this server",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "format": {"type": "string", "enum": ["json", "prometheus"], "default": "json"}
+                        }
+                    }
                 }
             ]
         }
@@ -101,15 +151,31 @@ def handle_request(request):
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
         
-        if tool_name == "validate":
-            return validate_token(arguments)
-        elif tool_name == "analyze_reddit_user":
-            return analyze_user(arguments)
-        elif tool_name == "classify_text":
-            return classify_text(arguments)
+        # Arbitrary names from clients must not become metric labels
+        stage = f"tool_{tool_name}" if tool_name in TOOL_NAMES else "tool_unknown"
+        with metrics.timer(stage):
+            result = call_tool(tool_name, arguments)
+        if result is not None:
+            if isinstance(result, dict) and "error" in result:
+                metrics.inc("securedm_errors_total", stage=stage)
+            return result
     
     return {"error": "Unknown method"}
 
+def call_tool(tool_name, arguments):
+    """Run one tool, None if there is no such tool"""
+    if tool_name == "validate":
+        return validate_token(arguments)
+    elif tool_name == "analyze_reddit_user":
+        return analyze_user(arguments)
+    elif tool_name == "analyze_reddit_users":
+        return analyze_users(arguments)
+    elif tool_name == "classify_text":
+        return classify_text(arguments)
+    elif tool_name == "get_stats":
+        return get_stats(arguments)
+    return None
+
 def validate_token(args):
     """Validate bearer token - required by PuchAI"""
     token = args.get("token")
@@ -126,25 +192,50 @@ def analyze_user(args):
     max_posts = args.get("max_posts", 10)
     
     try:
-        reddit = praw.Reddit(**REDDIT_CONFIG)
-        user = reddit.redditor(username)
+        reddit = get_reddit(USER_AGENT)
         
-        texts = []
-        for comment in user.comments.new(limit=max_posts):
-            if comment.body and comment.body != "[deleted]":
-                texts.append(comment.body)
+        summary = user_store.analyze(reddit, username, max_posts, include_submissions=False)
+        toxic_count, total_count = summary[:2] if summary else (0, 0)
         
-        toxic_count = 0
-        for text in texts:
-            label, score = classify_dm(text)
-            if label.upper() == "TOXIC":
-                toxic_count += 1
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"User: u/{username}\nTotal posts: {total_count}\nToxic posts: {toxic_count}\nToxicity rate: {(toxic_count/total_count*100 if total_count else 0.0):.1f}%"
+                }
+            ]
+        }
+        
+    except Exception as e:
+        return {"error": str(e)}
+
+def analyze_users(args):
+    """Analyze many Reddit users, comments only like analyze_reddit_user"""
+    usernames = parse_usernames(args.get("usernames"))
+    max_posts = args.get("max_posts", 10)
+    
+    if not usernames:
+        return {"error": "usernames required"}
+    if len(usernames) > BULK_MAX_USERS:
+        return {"error": f"at most {BULK_MAX_USERS} usernames per call"}
+    
+    try:
+        analyzer = BulkAnalyzer(
+            get_reddit(USER_AGENT),
+            classify_fn=lambda texts: [classify_dm(text) for text in texts],
+            store=user_store,
+            bucket=get_bucket()
+        )
+        try:
+            summaries = list(analyzer.analyze_many(usernames, max_posts, include_submissions=False))
+        finally:
+            analyzer.close()
         
         return {
             "content": [
                 {
                     "type": "text",
-                    "text": f"User: u/{username}\nTotal posts: {len(texts)}\nToxic posts: {toxic_count}\nToxicity rate: {(toxic_count/len(texts)*100):.1f}%"
+                    "text": summary_text(summaries)
                 }
             ]
         }
@@ -152,6 +243,14 @@ def analyze_user(args):
     except Exception as e:
         return {"error": str(e)}
 
+def get_stats(args):
+    """Metrics snapshot, or the Prometheus text served by webapp's /metrics"""
+    if args.get("format") == "prometheus":
+        text = metrics.render()
+    else:
+        text = json.dumps(metrics.snapshot(), indent=2, default=str)
+    return {"content": [{"type": "text", "text": text}]}
+
 def classify_text(args):
     """Classify single text"""
     text = args.get("text")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Parity and latency report for the securedm inference backends
+
+Runs the same cleaned corpus through every backend and compares scores
+against the eager float32 pipeline:
+
+    python benchmarks/compare_backends.py --threads 4 --tolerance 0.05 --output backends.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_corpus
+from run import latency_summary
+
+def run_backend(classifier, texts, batch_size):
+    timings = []
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        began = time.perf_counter()
+        predictions.extend(classifier(batch, batch_size=len(batch), truncation=True, max_length=512))
+        timings.append(time.perf_counter() - began)
+    return predictions, timings
+
+def main():
+    from securedm import model
+    from securedm.backends import BACKENDS, build_backend
+    from securedm.textcleaner import clean_many
+
+    parser = argparse.ArgumentParser(description="Compare securedm inference backends")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--source", default=model.MODEL_PATH or model.MODEL_NAME, help="model id or local weights directory")
+    parser.add_argument("--offline", action="store_true", default=model.OFFLINE or bool(model.MODEL_PATH))
+    parser.add_argument("--threads", type=int, default=model.NUM_THREADS)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=float(os.getenv("SECUREDM_BACKEND_TOLERANCE", "0.05")),
+                        help="largest allowed absolute score difference from eager")
+    parser.add_argument("--output", help="write the report JSON here")
+    args = parser.parse_args()
+
+    texts = [text for text in clean_many([text for _, text in generate_corpus(args.size, args.seed)]) if text]
+    names = [name for name in args.backends.split(",") if name]
+    if "eager" not in names:
+        names.insert(0, "eager")
+
+    report = {"source": args.source, "threads": args.threads, "texts": len(texts), "tolerance": args.tolerance, "backends": {}}
+    reference = None
+    failed = False
+
+    for name in names:
+        print(f"⏱️ {name}...", file=sys.stderr)
+        began = time.perf_counter()
+        try:
+            classifier = build_backend(name, args.source, args.offline, -1, args.threads)
+        except Exception as e:
+            print(f"⚠️ {name} unavailable: {e}", file=sys.stderr)
+            report["backends"][name] = {"error": str(e)}
+            continue
+        load_seconds = time.perf_counter() - began
+
+        # Untimed warmup batch
+        classifier(texts[:args.batch_size], batch_size=args.batch_size, truncation=True, max_length=512)
+        predictions, timings = run_backend(classifier, texts, args.batch_size)
+
+        entry = {
+            "load_s": load_seconds,
+            "texts_per_s": len(texts) / sum(timings) if sum(timings) else 0.0,
+            "batch_latency": latency_summary(timings),
+        }
+
+        if reference is None:
+            reference = predictions
+        else:
+            diffs = [abs(p["score"] - r["score"]) for p, r in zip(predictions, reference)]
+            agree = sum(1 for p, r in zip(predictions, reference) if p["label"] == r["label"])
+            entry.update({
+                "max_abs_diff": max(diffs, default=0.0),
+                "mean_abs_diff": sum(diffs) / len(diffs) if diffs else 0.0,
+                "label_agreement": agree / len(diffs) if diffs else 1.0,
+                "speedup_vs_eager": entry["texts_per_s"] / report["backends"]["eager"]["texts_per_s"],
+            })
+            entry["within_tolerance"] = entry["max_abs_diff"] <= args.tolerance
+            failed = failed or not entry["within_tolerance"]
+
+        report["backends"][name] = entry
+        del classifier
+
+    print(f"\n{'backend':<12} {'texts/s':>10} {'p95 ms':>9} {'max diff':>9} {'labels':>7}", file=sys.stderr)
+    for name, entry in report["backends"].items():
+        if "error" in entry:
+            print(f"{name:<12} {'error':>10}", file=sys.stderr)
+            continue
+        print(
+            f"{name:<12} {entry['texts_per_s']:>10.1f} {entry['batch_latency']['p95_ms']:>9.1f} "
+            f"{entry.get('max_abs_diff', 0.0):>9.4f} {entry.get('label_agreement', 1.0) * 100:>6.1f}%",
+            file=sys.stderr
+        )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if failed:
+        print(f"❌ Scores differ from eager by more than {args.tolerance}", file=sys.stderr)
+        sys.exit(1)
+    print("✅ All backends within tolerance", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# corpus.py
+"""
+Deterministic synthetic Reddit-like corpus for benchmarks
+
+The same seed always produces the same texts, so numbers from different
+commits are measured on identical input.
+"""
+import random
+
+WORDS = (
+    "the people thread post mod subreddit upvote karma really think would just "
+    "like know game team season player update patch server bug feature phone "
+    "price market stock week year today tomorrow friend family work school "
+    "reading article source comment reply edit thanks sorry honestly literally"
+).split()
+
+TOXIC_WORDS = "idiot stupid moron trash hate garbage pathetic loser dumb shut".split()
+
+FOREIGN = [
+    "Das ist wirklich eine gute Idee, danke für den Beitrag",
+    "C'est vraiment n'importe quoi, je ne suis pas d'accord",
+    "Esto es increíble, gracias por compartir con todos",
+    "これは本当に面白いですね、ありがとう",
+    "Это просто ужасно, не могу поверить",
+    "यह बहुत अच्छा पोस्ट है धन्यवाद",
+]
+
+EMOJIS = ["😂", "🔥", "💀", "👍", "🙄", "❤️", "🤡", "😡", "🎉", "👀"]
+
+URLS = [
+    "https://www.reddit.com/r/news/comments/abc123/",
+    "http://imgur.com/a/XyZ987",
+    "www.example.com/article?id=42&ref=reddit",
+    "https://youtu.be/dQw4w9WgXcQ",
+]
+
+CATEGORIES = ("short", "long", "url", "emoji", "foreign", "toxic")
+
+def _sentence(rng, length, toxic=False):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    if toxic:
+        for _ in range(max(1, length // 8)):
+            words[rng.randrange(length)] = rng.choice(TOXIC_WORDS)
+    text = " ".join(words)
+    return text[0].upper() + text[1:] + rng.choice([".", "!", "?", "..."])
+
+def make_text(rng, category):
+    """Generate one text of the given category"""
+    if category == "short":
+        return _sentence(rng, rng.randint(2, 12))
+    if category == "long":
+        # Selftext-sized: several paragraphs, often past the 512 token limit
+        paragraphs = [" ".join(_sentence(rng, rng.randint(8, 25)) for _ in range(rng.randint(3, 8))) for _ in range(rng.randint(2, 10))]
+        return "\n\n".join(paragraphs)
+    if category == "url":
+        return f"{_sentence(rng, rng.randint(3, 10))} {rng.choice(URLS)} @{rng.choice(WORDS)}_{rng.randint(1, 99)} #{rng.choice(WORDS)}"
+    if category == "emoji":
+        return " ".join(_sentence(rng, rng.randint(2, 8)) + " " + "".join(rng.choice(EMOJIS) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 3)))
+    if category == "foreign":
+        return rng.choice(FOREIGN) + " " + rng.choice(EMOJIS)
+    if category == "toxic":
+        return _sentence(rng, rng.randint(4, 20), toxic=True)
+    raise ValueError(f"unknown category {category}")
+
+def generate_corpus(size=1000, seed=1234, mix=None):
+    """
+    Build a list of (category, text) pairs
+
+    Args:
+        size (int): Number of texts
+        seed (int): Random seed
+        mix (dict): category -> weight, defaults to a comment-heavy mix
+    """
+    mix = mix or {"short": 45, "long": 5, "url": 15, "emoji": 15, "foreign": 10, "toxic": 10}
+    rng = random.Random(seed)
+    categories = list(mix)
+    weights = [mix[c] for c in categories]
+    return [(category, make_text(rng, category)) for category in rng.choices(categories, weights, k=size)]
+
+def generate_users(user_count=5, items_per_user=25, seed=1234):
+    """
+    Build FakeReddit user data from the corpus
+
+    Returns: dict of username -> {"comments": [...], "submissions": [...]}
+    """
+    rng = random.Random(seed)
+    users = {}
+    for u in range(user_count):
+        comments = [{"body": make_text(rng, rng.choice(("short", "url", "emoji", "toxic", "foreign")))} for _ in range(items_per_user)]
+        submissions = [{"title": make_text(rng, "short"), "selftext": make_text(rng, "long") if rng.random() < 0.5 else ""} for _ in range(items_per_user)]
+        users[f"benchuser{u}"] = {"comments": comments, "submissions": submissions}
+    return users
@@ -0,0 +1,36 @@
+# load_app.py
+"""
+webapp configured for load tests: FakeReddit users and a chosen model
+
+Loaded by gunicorn (see load_test.py) exactly like wsgi.py, so the model is
+preloaded in the master and shared by the forked workers.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every request pays for fetching and inference
+os.environ["SECUREDM_CACHE_SIZE"] = "0"
+os.environ["SECUREDM_CACHE_DB"] = ""
+os.environ["SECUREDM_USER_DB"] = ""
+
+from corpus import generate_users
+from stub_model import load_model
+from securedm import model
+from securedm.fakereddit import FakeReddit
+from securedm.redditclient import set_reddit
+
+kind = os.getenv("LOAD_MODEL", "stub")
+model_obj = load_model(kind, busy=True) if kind == "stub" else load_model(kind)
+if model_obj is not None:
+    model.set_model(model_obj, version=f"load-{kind}")
+
+set_reddit(FakeReddit(
+    generate_users(int(os.getenv("LOAD_USERS", "20")), int(os.getenv("LOAD_ITEMS", "10"))),
+    latency=float(os.getenv("LOAD_REDDIT_LATENCY_MS", "0")) / 1000.0
+))
+
+from wsgi import app
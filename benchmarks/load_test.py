@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Load test for the production serving mode
+
+Starts gunicorn (gunicorn.conf.py, preloaded model) with 1, 2, 4, ... N
+workers against FakeReddit users, drives POST /analyze from concurrent
+keep-alive clients for a fixed time and reports throughput, latency and
+speedup over one worker:
+
+    python benchmarks/load_test.py --model full --max-workers 8 --output load.json
+
+The stub model spins the CPU instead of sleeping, so one worker can only
+run one forward pass at a time and scaling comes from processes, as with
+a real model on CPU.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH)
+
+from run import percentile
+from scale_workers import worker_counts
+
+def start_server(workers, port, args):
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "SECUREDM_WEB_WORKERS": str(workers),
+        "LOAD_MODEL": args.model,
+        "LOAD_USERS": str(args.users),
+        "LOAD_REDDIT_LATENCY_MS": str(args.reddit_latency_ms),
+    })
+    if args.threads_per_worker:
+        env["SECUREDM_THREADS_PER_WORKER"] = str(args.threads_per_worker)
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", ROOT, "--pythonpath", BENCH, "load_app:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL if not args.verbose else None
+    )
+
+def wait_ready(port, workers, timeout):
+    """Poll /readyz until every worker has answered ready"""
+    deadline = time.monotonic() + timeout
+    seen = set()
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/readyz")
+            response = conn.getresponse()
+            body = json.loads(response.read())
+            conn.close()
+            if response.status == 200:
+                seen.add(body["pid"])
+                if len(seen) >= workers:
+                    return True
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.1)
+    return False
+
+def client(port, usernames, deadline, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    while time.monotonic() < deadline:
+        body = json.dumps({"username": random.choice(usernames)})
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/analyze", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            ok = response.status == 200 and "error" not in json.loads(response.read())
+        except (OSError, ValueError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        results.append((time.perf_counter() - start, ok))
+    conn.close()
+
+def load(port, args):
+    usernames = [f"benchuser{u}" for u in range(args.users)]
+    results = []
+    # Short unmeasured run so every worker has served a request
+    warm_deadline = time.monotonic() + 1.0
+    threads = [threading.Thread(target=client, args=(port, usernames, warm_deadline, [])) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=client, args=(port, usernames, deadline, results)) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for seconds, ok in results if ok]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000.0 if latencies else 0.0,
+        "p95_ms": percentile(latencies, 95) * 1000.0 if latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the gunicorn serving mode from 1 to N workers")
+    parser.add_argument("--model", choices=["stub", "tiny", "full"], default="stub")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, help="default cores / workers")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per worker count")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--reddit-latency-ms", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--verbose", action="store_true", help="show gunicorn's log")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    runs = []
+    for workers in worker_counts(args.max_workers):
+        server = start_server(workers, args.port, args)
+        try:
+            if not wait_ready(args.port, workers, args.ready_timeout):
+                print(f"❌ Server with {workers} workers never became ready", file=sys.stderr)
+                sys.exit(1)
+            result = load(args.port, args)
+        finally:
+            # Graceful shutdown: in-flight requests finish first
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        result["workers"] = workers
+        runs.append(result)
+        print(f"⏱️ {workers} workers: {result['requests_per_s']:.1f} req/s, p50 {result['p50_ms']:.0f} ms, "
+              f"p95 {result['p95_ms']:.0f} ms, {result['errors']} errors", file=sys.stderr)
+
+    base = runs[0]["requests_per_s"]
+    for result in runs:
+        result["speedup"] = result["requests_per_s"] / base if base else 0.0
+        result["efficiency"] = result["speedup"] / result["workers"]
+
+    report = {
+        "meta": {"model": args.model, "cpu_count": os.cpu_count(), "concurrency": args.concurrency, "duration_s": args.duration},
+        "runs": runs,
+    }
+    print("\n📊 Serving scaling:", file=sys.stderr)
+    print(f"   {'workers':>7} {'req/s':>8} {'p95 ms':>8} {'speedup':>8} {'efficiency':>10}", file=sys.stderr)
+    for r in runs:
+        print(f"   {r['workers']:>7} {r['requests_per_s']:>8.1f} {r['p95_ms']:>8.0f} {r['speedup']:>7.2f}x {r['efficiency'] * 100:>9.0f}%", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"💾 Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
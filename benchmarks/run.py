@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Component benchmarks for the preprocessing and classification hot paths
+
+Runs fully offline with the stub model and writes machine-readable JSON
+that can be compared against a previous run:
+
+    python benchmarks/run.py --model stub --output bench.json
+    python benchmarks/run.py --model stub --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Measure the model, not the caches or the per-user store
+os.environ.setdefault("SECUREDM_CACHE_SIZE", "0")
+os.environ["SECUREDM_CACHE_DB"] = ""
+os.environ["SECUREDM_USER_DB"] = ""
+
+from corpus import generate_corpus, generate_users, CATEGORIES
+from stub_model import load_model
+from securedm.metrics import percentile
+
+def latency_summary(seconds):
+    ms = [s * 1000.0 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": statistics.fmean(ms) if ms else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def bench_import():
+    from securedm.model import check_import_time
+    import_ms, budget_ms = check_import_time()
+    return {"import_ms": import_ms, "budget_ms": budget_ms}
+
+def bench_clean_text(corpus, repeat=3):
+    from securedm.textcleaner import TextCleaner
+
+    # Fresh cleaner so the lemma cache starts cold, like a new worker
+    cleaner = TextCleaner()
+    texts = [text for _, text in corpus]
+
+    start = time.perf_counter()
+    cleaner.clean_many(texts)
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cleaner.clean_many(texts)
+        warm.append(time.perf_counter() - start)
+
+    per_category = {}
+    for category in CATEGORIES:
+        subset = [text for c, text in corpus if c == category]
+        if not subset:
+            continue
+        start = time.perf_counter()
+        cleaner.clean_many(subset)
+        elapsed = time.perf_counter() - start
+        per_category[category] = {"texts": len(subset), "texts_per_s": len(subset) / elapsed if elapsed else 0.0}
+
+    return {
+        "texts": len(texts),
+        "cold_texts_per_s": len(texts) / cold if cold else 0.0,
+        "warm_texts_per_s": len(texts) / min(warm) if min(warm) else 0.0,
+        "per_category": per_category,
+    }
+
+def bench_classify_dm(corpus, samples):
+    from securedm.model import classify_dm
+
+    texts = [text for _, text in corpus][:samples]
+    timings = []
+    for text in texts:
+        start = time.perf_counter()
+        classify_dm(text)
+        timings.append(time.perf_counter() - start)
+    return latency_summary(timings)
+
+def bench_batches(corpus, batch_sizes):
+    from securedm.model import classify_cleaned
+    from securedm.textcleaner import clean_many
+
+    # Clean once up front so only inference is timed
+    cleaned = [text for text in clean_many([text for _, text in corpus]) if text]
+    results = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        classify_cleaned(cleaned, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {
+            "texts": len(cleaned),
+            "texts_per_s": len(cleaned) / elapsed if elapsed else 0.0,
+            "seconds": elapsed,
+        }
+    return results
+
+def bench_analyze_user(user_count, items_per_user, reddit_latency, max_posts):
+    from securedm.fakereddit import FakeReddit
+    import webapp
+
+    reddit = FakeReddit(generate_users(user_count, items_per_user), latency=reddit_latency)
+    timings = []
+    for username in reddit.users:
+        start = time.perf_counter()
+        webapp.analyze_user(reddit, username, max_posts)
+        timings.append(time.perf_counter() - start)
+
+    summary = latency_summary(timings)
+    summary.update({"users": user_count, "max_posts": max_posts, "reddit_latency_ms": reddit_latency * 1000.0})
+    return summary
+
+def bench_bulk_analyze(user_count, items_per_user, reddit_latency, max_posts, requests_per_minute=6000, concurrency=8):
+    from securedm.fakereddit import FakeReddit
+    from securedm.bulkanalysis import BulkAnalyzer, TokenBucket
+    import webapp
+
+    users = generate_users(user_count, items_per_user)
+
+    # One user after the other, as /analyze would be called today
+    reddit = FakeReddit(users, latency=reddit_latency)
+    start = time.perf_counter()
+    serial = [webapp.analyze_user(reddit, username, max_posts) for username in reddit.users]
+    serial_s = time.perf_counter() - start
+
+    reddit = FakeReddit(users, latency=reddit_latency)
+    analyzer = BulkAnalyzer(reddit, bucket=TokenBucket(requests_per_minute), concurrency=concurrency)
+    start = time.perf_counter()
+    first = None
+    summaries = []
+    for summary in analyzer.analyze_many(list(reddit.users), max_posts):
+        first = first or time.perf_counter() - start
+        summaries.append(summary)
+    bulk_s = time.perf_counter() - start
+    analyzer.close()
+    stats = analyzer.stats()
+
+    # Same counts as the serial run, whatever order users finished in
+    expected = {name: result[0] for name, result in zip(reddit.users, serial) if result}
+    matches = all(expected.get(s["username"].lower(), 0) == s["toxic_count"] for s in summaries)
+
+    # The bucket allows `burst` requests up front, then `rate` per second
+    allowed = analyzer.bucket.capacity + bulk_s * requests_per_minute / 60.0
+    return {
+        "users": user_count,
+        "serial_users_per_s": user_count / serial_s if serial_s else 0.0,
+        "bulk_users_per_s": user_count / bulk_s if bulk_s else 0.0,
+        "first_result_ms": (first or 0.0) * 1000.0,
+        "requests": reddit.requests,
+        "within_quota": reddit.requests <= allowed + 1,
+        "mean_batch_size": stats["batcher"]["mean_batch_size"],
+        "matches_serial": matches,
+    }
+
+def bench_monitor(corpus, queue_size=1000, batch_size=32):
+    import json
+    import tempfile
+    from securedm.monitor import Monitor, JSONLSource
+
+    # Replay the corpus as a firehose, as fast as the monitor takes it
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "firehose.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for i, (_, text) in enumerate(corpus):
+                f.write(json.dumps({"id": f"t1_{i + 1:x}", "text": text}) + "\n")
+        monitor = Monitor(
+            [JSONLSource(path)],
+            handler=lambda item, label, score: None,
+            checkpoint_path=os.path.join(tmp, "checkpoint.json"),
+            queue_size=queue_size,
+            batch_size=batch_size,
+            report_interval=0
+        )
+        stats = monitor.run()
+
+    return {
+        "items": stats["processed"],
+        "items_per_s": stats["items_per_s"],
+        "lag_s": stats["lag_s"] or 0.0,
+        "blocked_s": stats["blocked_s"],
+    }
+
+# Metrics where a higher value is better; everything else is a latency
+HIGHER_IS_BETTER = ("texts_per_s", "items_per_s", "users_per_s")
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(current, baseline, tolerance):
+    """
+    Compare two result files
+    Returns: list of (metric, baseline, current, change) regressions
+    """
+    regressions = []
+    now = flatten(current["results"])
+    before = flatten(baseline["results"])
+    for name, old in before.items():
+        new = now.get(name)
+        if new is None or not old:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (old - new) / old
+        elif name.endswith("_ms"):
+            change = (new - old) / old
+        else:
+            continue
+        if change > tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="securedm component benchmarks")
+    parser.add_argument("--model", choices=["stub", "tiny", "full"], default="stub")
+    parser.add_argument("--size", type=int, default=2000, help="corpus size")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--latency-samples", type=int, default=200)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--max-posts", type=int, default=25)
+    parser.add_argument("--reddit-latency-ms", type=float, default=50.0)
+    parser.add_argument("--bulk-users", type=int, default=40, help="users in the bulk analysis section")
+    parser.add_argument("--bulk-rpm", type=float, default=6000, help="token bucket rate for the bulk section")
+    parser.add_argument("--skip", default="", help="comma separated sections to skip")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    from securedm import model
+
+    model_obj = load_model(args.model)
+    if model_obj is not None:
+        model.set_model(model_obj, version=f"bench-{args.model}")
+    model.warmup()
+
+    corpus = generate_corpus(args.size, args.seed)
+    skip = set(filter(None, args.skip.split(",")))
+    results = {}
+
+    sections = [
+        ("import", bench_import),
+        ("clean_text", lambda: bench_clean_text(corpus)),
+        ("classify_dm", lambda: bench_classify_dm(corpus, args.latency_samples)),
+        ("batch", lambda: bench_batches(corpus, [int(b) for b in args.batch_sizes.split(",")])),
+        ("analyze_user", lambda: bench_analyze_user(args.users, args.max_posts, args.reddit_latency_ms / 1000.0, args.max_posts)),
+        ("bulk_analyze", lambda: bench_bulk_analyze(args.bulk_users, args.max_posts, args.reddit_latency_ms / 1000.0, args.max_posts, args.bulk_rpm)),
+        ("monitor", lambda: bench_monitor(corpus)),
+    ]
+    for name, bench in sections:
+        if name in skip:
+            continue
+        print(f"⏱️ {name}...", file=sys.stderr)
+        results[name] = bench()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "corpus_size": args.size,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"💾 Results saved to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions over {args.tolerance * 100:.0f}%:", file=sys.stderr)
+            for name, old, new, change in regressions:
+                print(f"   {name}: {old:.2f} -> {new:.2f} ({change * 100:+.1f}%)", file=sys.stderr)
+            sys.exit(1)
+        print("✅ No regressions", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
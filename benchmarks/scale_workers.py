@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Scaling report for multi-process bulk scoring
+
+Scores the same corpus with 1, 2, 4, ... N worker processes and reports
+throughput and parallel efficiency against the single-worker run:
+
+    python benchmarks/scale_workers.py --model full --max-workers 32 --output scaling.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every run must pay for inference, not hit predictions from the previous one
+os.environ.setdefault("SECUREDM_CACHE_SIZE", "0")
+os.environ["SECUREDM_CACHE_DB"] = ""
+
+from corpus import generate_corpus
+from stub_model import load_model
+
+def score_chunk(payload):
+    # Same work as testclassifier.score_rows: clean, then length-bucketed batches
+    from securedm.model import classify_cleaned
+    from securedm.textcleaner import clean_many
+    texts, batch_size = payload
+    return classify_cleaned(clean_many(texts), batch_size=batch_size, empty_label="EMPTY", sort_by_length=True)
+
+def worker_counts(max_workers):
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+def run(texts, workers, chunk_size, batch_size, threads_per_worker):
+    from securedm.workerpool import WorkerPool
+
+    chunks = [(texts[i:i + chunk_size], batch_size) for i in range(0, len(texts), chunk_size)]
+    with WorkerPool(score_chunk, workers, threads_per_worker) as pool:
+        threads = pool.threads_per_worker
+        # Untimed chunk per worker so process start-up isn't measured
+        list(pool.imap(chunks[:workers]))
+        start = time.perf_counter()
+        results = [prediction for chunk in pool.imap(chunks) for prediction in chunk]
+        elapsed = time.perf_counter() - start
+    return results, elapsed, threads
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk scoring throughput from 1 to N workers")
+    parser.add_argument("--model", choices=["stub", "tiny", "full"], default="stub")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, help="default cores / workers")
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="write the report JSON here")
+    args = parser.parse_args()
+
+    from securedm import model
+
+    model_obj = load_model(args.model)
+    if model_obj is not None:
+        model.set_model(model_obj, version=f"bench-{args.model}")
+    # Load before forking so workers share the weights
+    model.warmup()
+
+    texts = [text for _, text in generate_corpus(args.size, args.seed)]
+    report = {"model": args.model, "texts": len(texts), "cpu_count": os.cpu_count(), "runs": {}}
+    reference = None
+    base = None
+
+    for workers in worker_counts(args.max_workers):
+        print(f"⏱️ {workers} workers...", file=sys.stderr)
+        results, elapsed, threads = run(texts, workers, args.chunk_size, args.batch_size, args.threads_per_worker)
+        rate = len(texts) / elapsed if elapsed else 0.0
+        base = base or rate
+        reference = reference or results
+        report["runs"][str(workers)] = {
+            "threads_per_worker": threads,
+            "seconds": elapsed,
+            "texts_per_s": rate,
+            "speedup": rate / base,
+            "efficiency": rate / base / workers,
+            # Output must not depend on how the work was split
+            "matches_single_worker": results == reference,
+        }
+
+    print(f"\n{'workers':>7} {'threads':>7} {'texts/s':>10} {'speedup':>8} {'eff.':>6}", file=sys.stderr)
+    for workers, entry in report["runs"].items():
+        print(
+            f"{workers:>7} {entry['threads_per_worker']:>7} {entry['texts_per_s']:>10.1f} "
+            f"{entry['speedup']:>7.2f}x {entry['efficiency'] * 100:>5.0f}%",
+            file=sys.stderr
+        )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if not all(entry["matches_single_worker"] for entry in report["runs"].values()):
+        print("❌ Predictions differ between worker counts", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# stub_model.py
+"""
+Offline stand-ins for the toxic-bert pipeline
+
+StubPipeline costs no weights and no network. It simulates a model with a
+fixed per-call overhead plus a per-token cost, so batching and caching
+behave like they would with the real model, only faster.
+"""
+import time
+
+TOXIC_WORDS = {"idiot", "stupid", "moron", "trash", "hate", "garbage", "pathetic", "loser", "dumb", "shut"}
+
+class StubPipeline:
+    """
+    Callable with the transformers text-classification pipeline interface
+
+    Args:
+        call_overhead_ms (float): Simulated fixed cost of one forward pass
+        token_cost_us (float): Simulated cost per token in the batch
+        busy (bool): Spin on the CPU (holding the GIL) instead of sleeping,
+            so a process can only run one forward pass at a time, like a
+            model that keeps its cores busy
+    """
+
+    def __init__(self, call_overhead_ms=5.0, token_cost_us=20.0, busy=False):
+        self.call_overhead = call_overhead_ms / 1000.0
+        self.token_cost = token_cost_us / 1e6
+        self.busy = busy
+        self.calls = 0
+
+    def score(self, text, max_length=512):
+        words = text.split()[:max_length]
+        hits = sum(1 for w in words if w in TOXIC_WORDS)
+        return min(1.0, 0.05 + hits / max(len(words), 1) * 4)
+
+    def __call__(self, inputs, batch_size=None, truncation=True, max_length=512, **kwargs):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+
+        # Padded batch cost: every row pays for the longest row
+        longest = max((min(len(t.split()), max_length) for t in texts), default=0)
+        cost = self.call_overhead + self.token_cost * longest * len(texts)
+        if self.busy:
+            deadline = time.perf_counter() + cost
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(cost)
+        self.calls += 1
+
+        results = []
+        for text in texts:
+            score = self.score(text, max_length)
+            results.append({"label": "toxic" if score >= 0.5 else "non_toxic", "score": score})
+        return results[0] if single else results
+
+def load_model(kind, **kwargs):
+    """
+    Build the pipeline used by a benchmark run
+
+    Args:
+        kind (str): "stub" (no weights), "tiny" (hf-internal-testing tiny BERT,
+            random weights, real tokenizer and forward pass) or "full" (toxic-bert)
+
+    Returns: pipeline-compatible callable, or None to use securedm.model's own loader
+    """
+    if kind == "stub":
+        return StubPipeline(**kwargs)
+    if kind == "tiny":
+        from transformers import pipeline
+        return pipeline("text-classification", model="hf-internal-testing/tiny-random-BertForSequenceClassification", truncation=True, max_length=512)
+    if kind == "full":
+        return None
+    raise ValueError(f"unknown model kind {kind}")
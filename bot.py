@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Reddit toxicity bot: watches subreddit comments and the bot's inbox
+
+    python bot.py --subreddits news,worldnews --inbox
+    python bot.py --jsonl firehose.jsonl          # offline replay
+"""
+
+import argparse
+import json
+import os
+import sys
+from securedm.model import warmup, is_toxic
+from securedm.redditclient import get_reddit, get_user_reddit
+from securedm.monitor import Monitor, SubredditCommentSource, InboxSource, JSONLSource
+
+USER_AGENT = "ToxicityBot/1.0"
+
+def build_sources(args):
+    sources = []
+    if args.subreddits:
+        sources.append(SubredditCommentSource(get_reddit(USER_AGENT), args.subreddits.split(",")))
+    if args.inbox:
+        sources.append(InboxSource(get_user_reddit(USER_AGENT)))
+    for path in args.jsonl or []:
+        sources.append(JSONLSource(path, rate=args.rate))
+    return sources
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify Reddit comments and messages as they arrive")
+    parser.add_argument("--subreddits", default=os.getenv("BOT_SUBREDDITS"), help="comma separated subreddits to watch")
+    parser.add_argument("--inbox", action="store_true", help="watch the bot account's inbox (needs REDDIT_USERNAME/REDDIT_PASSWORD)")
+    parser.add_argument("--jsonl", action="append", help="replay a local JSONL firehose instead of Reddit")
+    parser.add_argument("--rate", type=float, help="items per second for --jsonl replays")
+    parser.add_argument("--checkpoint", default=os.getenv("BOT_CHECKPOINT", "bot_checkpoint.json"))
+    parser.add_argument("--queue-size", type=int, default=1000, help="items buffered before sources are paused")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--report-interval", type=float, default=10, help="seconds between throughput/lag lines")
+    parser.add_argument("--output", help="append toxic items to this JSONL file")
+    parser.add_argument("--max-items", type=int, help="stop after this many items")
+    args = parser.parse_args()
+
+    sources = build_sources(args)
+    if not sources:
+        parser.error("nothing to watch: pass --subreddits, --inbox or --jsonl")
+
+    print("🤖 Starting toxicity bot...")
+    warmup(args.batch_size)
+
+    handler = None
+    output = open(args.output, "a", encoding="utf-8") if args.output else None
+    if output:
+        def handler(item, label, score):
+            if is_toxic(label, score):
+                output.write(json.dumps(dict(item, label=label, score=float(score))) + "\n")
+                output.flush()
+
+    monitor = Monitor(
+        sources,
+        handler=handler,
+        checkpoint_path=args.checkpoint,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        max_wait_ms=args.max_wait_ms,
+        report_interval=args.report_interval
+    )
+    print(f"👀 Watching {', '.join(source.name for source in sources)}")
+    try:
+        monitor.run(max_items=args.max_items)
+    finally:
+        if output:
+            output.close()
+    monitor.report()
+    print("✅ Bot stopped")
+
+if __name__ == "__main__":
+    sys.exit(main())
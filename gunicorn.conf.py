@@ -0,0 +1,51 @@
+# gunicorn.conf.py
+"""
+Production serving for webapp.py: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app (and the model) is loaded in the master before workers fork.
+Each worker pins its own torch thread count so workers don't oversubscribe
+the cores, and is recycled after max_requests. Recycled workers fork from
+the master again, so they start with the model already loaded.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Processes; each gets cores // workers intra-op threads unless overridden
+workers = int(os.getenv("SECUREDM_WEB_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+threads_per_worker = int(os.getenv("SECUREDM_THREADS_PER_WORKER", "0")) or max(1, (os.cpu_count() or 1) // workers)
+
+# Request threads per worker: Reddit fetches wait on the network, and the
+# micro-batcher merges their model calls
+worker_class = "gthread"
+threads = int(os.getenv("SECUREDM_WEB_THREADS", "8"))
+
+# Load securedm.model once in the master, share it copy-on-write
+preload_app = True
+
+# Recycle workers gracefully to bound memory growth; jitter keeps them
+# from all restarting at once
+max_requests = int(os.getenv("SECUREDM_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+graceful_timeout = 30
+# SSE streams and bulk analyses stay open for as long as Reddit takes
+timeout = 120
+keepalive = 5
+
+def post_fork(server, worker):
+    from securedm.backends import set_num_threads
+    try:
+        set_num_threads(threads_per_worker)
+    except Exception as e:
+        server.log.warning(f"Could not pin worker threads: {e}")
+    server.log.info(f"Worker {worker.pid}: {threads_per_worker} intra-op threads")
+
+def post_worker_init(worker):
+    # One small batch on this worker's own thread pool before it takes traffic
+    from securedm.model import warmup
+    warmup(batch_size=1)
+
+def when_ready(server):
+    from securedm.model import is_ready
+    if not is_ready():
+        server.log.warning("Model failed to load; /readyz will report 503")
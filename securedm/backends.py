@@ -0,0 +1,255 @@
+# backends.py
+import os
+import tempfile
+import threading
+
+# Backends selectable with SECUREDM_BACKEND
+BACKENDS = ("eager", "int8", "torchscript", "onnx")
+
+def set_num_threads(num_threads):
+    """Pin the intra-op thread count used by torch on this process"""
+    import torch
+    if num_threads and num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+def load_pretrained(source, offline):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=offline)
+    model = AutoModelForSequenceClassification.from_pretrained(source, local_files_only=offline)
+    model.eval()
+    return tokenizer, model
+
+def build_pipeline(model, tokenizer, device_index=-1):
+    from transformers import pipeline
+    return pipeline(
+        "text-classification",
+        model=model,
+        tokenizer=tokenizer,
+        device=device_index,
+        truncation=True,
+        max_length=512
+    )
+
+def postprocess(logits, config):
+    """
+    Turn logits into pipeline-style {"label", "score"} dicts
+
+    Uses the same activation the transformers pipeline picks: sigmoid for
+    multi-label models or a single logit, softmax otherwise.
+    """
+    import torch
+    if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+        scores = torch.sigmoid(logits)
+    else:
+        scores = torch.softmax(logits, dim=-1)
+    best_scores, best_ids = scores.max(dim=-1)
+    return [
+        {"label": config.id2label[int(i)], "score": float(s)}
+        for s, i in zip(best_scores.tolist(), best_ids.tolist())
+    ]
+
+class GraphBackend:
+    """
+    Pipeline-compatible wrapper around an exported graph
+
+    Tokenizes with dynamic padding (each batch is padded to its own longest
+    text), runs the graph and applies the pipeline's postprocessing, so it
+    can replace the transformers pipeline anywhere in securedm.model.
+    """
+
+    def __init__(self, tokenizer, config, run_fn):
+        self.tokenizer = tokenizer
+        self.model = type("GraphModel", (), {"config": config})()
+        self.config = config
+        self.run_fn = run_fn
+        # Exported graphs aren't guaranteed to be re-entrant
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs, batch_size=None, truncation=True, max_length=512, **kwargs):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=truncation,
+                max_length=max_length,
+                return_tensors="pt"
+            )
+            with self._lock:
+                logits = self.run_fn(encoded["input_ids"], encoded["attention_mask"])
+            results.extend(postprocess(logits, self.config))
+
+        return results[0] if single else results
+
+def run_token_ids(classifier, batch_ids):
+    """
+    Classify texts that are already tokenized, skipping the tokenizer
+
+    Args:
+        classifier: Pipeline or GraphBackend from build_backend
+        batch_ids (list): One 1-D integer array of input ids per text,
+            produced by the classifier's own tokenizer
+
+    Returns: list of {"label", "score"} dicts, or None if the classifier
+        can't take token ids (e.g. a stub), so the caller passes text instead
+    """
+    tokenizer = getattr(classifier, "tokenizer", None)
+    model = getattr(classifier, "model", None)
+    config = getattr(model, "config", None)
+    if tokenizer is None or config is None:
+        return None
+
+    import numpy as np
+    import torch
+
+    # Dynamic padding, like the pipeline does for a batch
+    longest = max(len(ids) for ids in batch_ids)
+    input_ids = np.full((len(batch_ids), longest), tokenizer.pad_token_id or 0, dtype=np.int64)
+    attention_mask = np.zeros((len(batch_ids), longest), dtype=np.int64)
+    for row, ids in enumerate(batch_ids):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    input_ids = torch.from_numpy(input_ids)
+    attention_mask = torch.from_numpy(attention_mask)
+
+    if isinstance(classifier, GraphBackend):
+        with classifier._lock:
+            logits = classifier.run_fn(input_ids, attention_mask)
+    elif isinstance(model, torch.nn.Module):
+        device = next(model.parameters()).device
+        with torch.inference_mode():
+            logits = model(input_ids=input_ids.to(device), attention_mask=attention_mask.to(device)).logits
+    else:
+        return None
+
+    return postprocess(logits.float().cpu(), config)
+
+def _example_inputs(tokenizer):
+    encoded = tokenizer(["example input for tracing", "a second and somewhat longer example input"], padding=True, return_tensors="pt")
+    return encoded["input_ids"], encoded["attention_mask"]
+
+def build_torchscript(tokenizer, model):
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    with torch.inference_mode():
+        traced = torch.jit.trace(LogitsOnly(model), _example_inputs(tokenizer), check_trace=False, strict=False)
+        traced = torch.jit.freeze(traced.eval())
+
+    def run(input_ids, attention_mask):
+        with torch.inference_mode():
+            return traced(input_ids, attention_mask)
+
+    return GraphBackend(tokenizer, model.config, run)
+
+def export_fingerprint(model, source, max_length=None, version=None):
+    """
+    Key of an exported graph: everything that would make an old export stale
+
+    Covers the source, the size and mtime of every file in the weights
+    directory (or the hub revision for a model id), the torch, transformers
+    and onnxruntime versions, max_length and the model version.
+    """
+    import hashlib
+    import torch
+    import transformers
+    import onnxruntime
+
+    parts = [os.path.abspath(source) if os.path.isdir(source) else source]
+    if os.path.isdir(source):
+        for root, _, files in sorted(os.walk(source)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                parts.append(f"{os.path.relpath(os.path.join(root, name), source)}:{stat.st_size}:{stat.st_mtime_ns}")
+    else:
+        parts.append(str(getattr(model.config, "_commit_hash", None)))
+    parts += [torch.__version__, transformers.__version__, onnxruntime.__version__, str(max_length), str(version)]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+def build_onnx(tokenizer, model, source, num_threads=0, export_dir=None, max_length=None, version=None):
+    import torch
+    import onnxruntime
+
+    # Exports are reused across restarts when SECUREDM_ONNX_DIR is set
+    export_dir = export_dir or os.getenv("SECUREDM_ONNX_DIR") or tempfile.mkdtemp(prefix="securedm-onnx-")
+    os.makedirs(export_dir, exist_ok=True)
+    fingerprint = export_fingerprint(model, source, max_length, version)
+    onnx_path = os.path.join(export_dir, f"model-{fingerprint}.onnx")
+
+    if not os.path.exists(onnx_path):
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                _example_inputs(tokenizer),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=17,
+                dynamo=False
+            )
+
+    options = onnxruntime.SessionOptions()
+    if num_threads and num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def run(input_ids, attention_mask):
+        logits = session.run(["logits"], {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy(),
+        })[0]
+        return torch.from_numpy(logits)
+
+    return GraphBackend(tokenizer, model.config, run)
+
+def build_backend(name, source, offline=False, device_index=-1, num_threads=0, max_length=None, version=None):
+    """
+    Build a pipeline-compatible classifier for the requested backend
+
+    Args:
+        name (str): "eager" (float32 transformers pipeline), "int8" (dynamic
+            int8 quantization of the Linear layers), "torchscript" or "onnx"
+            (exported graph run through TorchScript / onnxruntime)
+        source (str): Hugging Face model id or local directory
+        offline (bool): Only load weights from disk
+        device_index (int): Pipeline device, only used by the eager backend
+        num_threads (int): Intra-op threads, 0 keeps the library default
+        max_length (int): Token cap, part of the ONNX export key
+        version (str): Model version, part of the ONNX export key
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}")
+
+    set_num_threads(num_threads)
+    tokenizer, model = load_pretrained(source, offline)
+
+    if name == "eager":
+        return build_pipeline(model, tokenizer, device_index)
+
+    if name == "int8":
+        # Dynamic quantization only targets CPU kernels
+        import torch
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return build_pipeline(quantized, tokenizer, -1)
+
+    if name == "torchscript":
+        return build_torchscript(tokenizer, model)
+
+    return build_onnx(tokenizer, model, source, num_threads, max_length=max_length, version=version)
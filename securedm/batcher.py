@@ -0,0 +1,150 @@
+# batcher.py
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+class MicroBatcher:
+    """
+    Background inference worker that merges concurrent requests into batches
+
+    Any thread can submit cleaned texts. The worker waits up to max_wait_ms
+    after the first queued text for more to arrive, runs one model call for
+    up to max_batch texts and resolves each caller's Future with its
+    (label, score). The worker thread starts on first use and is restarted
+    after a fork, so it is safe to create before pre-forking servers fork.
+    """
+
+    def __init__(self, classify_fn, max_batch=32, max_wait_ms=5):
+        self.classify_fn = classify_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="securedm-batcher", daemon=True)
+            self._thread.start()
+
+    def in_worker(self):
+        """True when called from the worker thread itself"""
+        return threading.current_thread() is self._thread
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, cleaned):
+        """
+        Queue one cleaned text
+        Returns: Future resolving to (label, score)
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((cleaned, future))
+        return future
+
+    def submit_many(self, cleaned_texts):
+        """Queue many cleaned texts, returns one Future per text"""
+        self._ensure_started()
+        futures = []
+        for cleaned in cleaned_texts:
+            future = Future()
+            self._queue.put((cleaned, future))
+            futures.append(future)
+        return futures
+
+    def classify(self, cleaned, timeout=None):
+        """Submit a cleaned text and wait for its (label, score)"""
+        return self.submit(cleaned).result(timeout)
+
+    def classify_many(self, cleaned_texts, timeout=None):
+        """Submit cleaned texts and wait for all results, in input order"""
+        return [future.result(timeout) for future in self.submit_many(cleaned_texts)]
+
+    async def aclassify(self, cleaned):
+        """Async variant of classify for asyncio callers"""
+        return await asyncio.wrap_future(self.submit(cleaned))
+
+    async def aclassify_many(self, cleaned_texts):
+        """Async variant of classify_many for asyncio callers"""
+        return await asyncio.gather(*(asyncio.wrap_future(f) for f in self.submit_many(cleaned_texts)))
+
+    def stop(self, timeout=None):
+        """Finish queued work and stop the worker thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _collect(self):
+        # Block for the first item, then gather more until the window closes
+        first = self._queue.get()
+        if first[0] is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] is _STOP:
+                # Put it back so the loop exits after this batch
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Callers that cancelled while queued don't need a result
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.classify_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queue_depth": self.queue_depth,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
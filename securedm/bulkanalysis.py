@@ -0,0 +1,408 @@
+# bulkanalysis.py
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from .batcher import MicroBatcher
+    from .redditclient import fetch_user_pages
+    from .metrics import inc, observe, gauge
+except ImportError:
+    from batcher import MicroBatcher
+    from redditclient import fetch_user_pages
+    from metrics import inc, observe, gauge
+
+try:
+    from prawcore.exceptions import NotFound, Forbidden
+except ImportError:
+    # Without praw only FakeReddit's LookupError can come up
+    class NotFound(Exception):
+        pass
+
+    class Forbidden(Exception):
+        pass
+
+# Reddit allows 100 requests per minute per OAuth client; stay a little under
+REQUESTS_PER_MINUTE = float(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "90"))
+# Users fetched at once by a bulk analysis
+BULK_CONCURRENCY = int(os.getenv("SECUREDM_BULK_CONCURRENCY", "8"))
+# Usernames accepted per bulk request
+BULK_MAX_USERS = int(os.getenv("SECUREDM_BULK_MAX_USERS", "500"))
+# Items praw asks for per listing request
+REDDIT_PAGE_SIZE = 100
+
+class TokenBucket:
+    """
+    Thread-safe token bucket pacing requests to a per-minute quota
+
+    Starts full, so a burst of up to `burst` requests goes out at once and
+    the rest are spread evenly over the minute.
+
+    Args:
+        rate_per_minute (float): Sustained requests per minute
+        burst (int): Bucket size, defaults to a tenth of the per-minute rate
+    """
+
+    def __init__(self, rate_per_minute=REQUESTS_PER_MINUTE, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 10)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.granted = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` requests may be sent
+        Returns: seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.granted += tokens
+                    self.waited += waited
+                    return waited
+                delay = max(self.paused_until - now, (tokens - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def update_limits(self, limits):
+        """
+        Respect the quota Reddit reports, which also counts other clients
+
+        Args:
+            limits (dict): praw's reddit.auth.limits ("remaining", "reset_timestamp")
+        """
+        remaining = limits.get("remaining")
+        reset = limits.get("reset_timestamp")
+        if remaining is None or reset is None or remaining >= 1:
+            return
+        with self._lock:
+            # Nothing left in this window: stop everyone until Reddit resets it
+            self.paused_until = max(self.paused_until, time.monotonic() + max(0.0, reset - time.time()))
+            self.tokens = 0.0
+
+    def stats(self):
+        return {"granted": self.granted, "waited_s": self.waited, "rate_per_minute": self.rate * 60.0}
+
+class _ThrottledListing:
+    # Takes a token before every listing request praw (or FakeReddit) makes
+    def __init__(self, reddit, listing, bucket, page_size):
+        self.reddit = reddit
+        self.listing = listing
+        self.bucket = bucket
+        self.page_size = page_size
+
+    def new(self, limit=100, params=None):
+        return self._throttled(self.listing.new(limit=limit, params=params), limit)
+
+    def _throttled(self, items, limit):
+        items = iter(items)
+        count = 0
+        while limit is None or count < limit:
+            new_page = count % self.page_size == 0
+            if new_page:
+                # The next item starts a new page, i.e. a new request
+                self.bucket.acquire()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            if new_page:
+                limits = getattr(getattr(self.reddit, "auth", None), "limits", None)
+                if limits:
+                    self.bucket.update_limits(limits)
+            count += 1
+            yield item
+
+class _ThrottledRedditor:
+    def __init__(self, reddit, redditor, bucket, page_size):
+        self.name = redditor.name
+        self.comments = _ThrottledListing(reddit, redditor.comments, bucket, page_size)
+        self.submissions = _ThrottledListing(reddit, redditor.submissions, bucket, page_size)
+
+class ThrottledReddit:
+    """
+    Reddit client wrapper whose user listings draw from a TokenBucket
+
+    Only requests that are actually sent are paced: users served from the
+    UserStore within its TTL cost no tokens.
+
+    Args:
+        reddit: praw.Reddit (or FakeReddit)
+        bucket (TokenBucket): Shared quota
+    """
+
+    def __init__(self, reddit, bucket):
+        self._reddit = reddit
+        self._bucket = bucket
+        self._page_size = getattr(reddit, "page_size", REDDIT_PAGE_SIZE)
+
+    def redditor(self, name):
+        return _ThrottledRedditor(self._reddit, self._reddit.redditor(name), self._bucket, self._page_size)
+
+    def __getattr__(self, name):
+        return getattr(self._reddit, name)
+
+def user_summary(username, result, max_items=3):
+    """
+    Per-user aggregate of an analyze_user style result
+
+    Args:
+        username (str): Reddit username
+        result: (toxic_count, total_count, details, toxic_items), or None
+
+    Returns: JSON-serializable dict
+    """
+    if not result:
+        return {"username": username, "status": "not_found", "total_count": 0, "toxic_count": 0, "toxicity_rate": 0.0}
+
+    toxic_count, total_count, details, toxic_items = result
+    toxic_items = sorted(toxic_items, key=lambda d: -d['toxicity_score'])
+    return {
+        "username": username,
+        "status": "ok",
+        "total_count": total_count,
+        "toxic_count": toxic_count,
+        "toxicity_rate": toxic_count / total_count if total_count else 0.0,
+        "max_score": max((d['toxicity_score'] for d in toxic_items), default=0.0),
+        "toxic_items": [
+            {"type": d['type'], "content": d['content'], "subreddit": d['subreddit'], "toxicity_score": float(d['toxicity_score'])}
+            for d in toxic_items[:max_items]
+        ],
+    }
+
+class BulkAnalyzer:
+    """
+    Analyzes many users at once under Reddit's request quota
+
+    Users are fetched `concurrency` at a time, every listing request takes
+    a token from a shared TokenBucket, and the comments of all users go
+    through one MicroBatcher so the model sees full batches instead of one
+    small page per user. Results are yielded as each user finishes.
+
+    Args:
+        reddit: praw.Reddit (or FakeReddit)
+        classify_fn: Callable taking a list of texts and returning (label, score) tuples
+        long_classify_fn: Same for submissions, defaults to classify_long_many
+            if classify_fn isn't given, else to classify_fn
+        store (UserStore): Persist results and only fetch what's new; None
+            fetches every user's window from scratch
+        bucket (TokenBucket): Quota shared with other analyzers, e.g. all
+            requests of a web server
+        concurrency (int): Users fetched at once
+        batch_size (int): Largest batch of comments sent to classify_fn
+        max_wait_ms (float): How long the batcher waits for other users' pages
+    """
+
+    def __init__(self, reddit, classify_fn=None, long_classify_fn=None, store=None, bucket=None,
+                 concurrency=BULK_CONCURRENCY, batch_size=64, max_wait_ms=20):
+        if classify_fn is None:
+            try:
+                from .model import classify_batch, classify_long_many
+            except ImportError:
+                from model import classify_batch, classify_long_many
+            classify_fn = classify_batch
+            long_classify_fn = long_classify_fn or classify_long_many
+
+        self.bucket = bucket or TokenBucket()
+        self.reddit = ThrottledReddit(reddit, self.bucket)
+        self.long_classify_fn = long_classify_fn or classify_fn
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.batcher = MicroBatcher(classify_fn, max_batch=batch_size, max_wait_ms=max_wait_ms)
+
+    def classify(self, texts):
+        """Classify a page of comments in the shared batch stream"""
+        return self.batcher.classify_many(texts)
+
+    def analyze_user(self, username, max_posts=10, include_submissions=True):
+        """Returns: (toxic_count, total_count, details, toxic_items), or None"""
+        if self.store:
+            return self.store.analyze(self.reddit, username, max_posts, include_submissions,
+                                      classify_fn=self.classify, long_classify_fn=self.long_classify_fn)
+
+        details = []
+        for source, page in fetch_user_pages(self.reddit, username, max_posts, include_submissions):
+            classify = self.long_classify_fn if source == "submissions" else self.classify
+            for (_, detail), (label, score) in zip(page, classify([text for text, _ in page])):
+                detail['toxicity_label'] = label
+                detail['toxicity_score'] = score
+                details.append(detail)
+
+        if not details:
+            return None
+        details.sort(key=lambda d: d['type'] != 'comment')
+        try:
+            from .model import is_toxic
+        except ImportError:
+            from model import is_toxic
+        toxic_items = [d for d in details if is_toxic(d['toxicity_label'], d['toxicity_score'])]
+        return len(toxic_items), len(details), details, toxic_items
+
+    def _summarize(self, username, max_posts, include_submissions):
+        started = time.perf_counter()
+        try:
+            summary = user_summary(username, self.analyze_user(username, max_posts, include_submissions))
+        except (LookupError, NotFound):
+            summary = user_summary(username, None)
+        except Forbidden:
+            # Reddit answers 403 for suspended accounts
+            summary = dict(user_summary(username, None), status="suspended")
+        except Exception as e:
+            inc("securedm_errors_total", stage="bulk_user")
+            summary = {"username": username, "status": "error", "error": str(e)}
+        elapsed = time.perf_counter() - started
+        observe("securedm_stage_seconds", elapsed, stage="bulk_user")
+        summary["seconds"] = elapsed
+        return summary
+
+    def analyze_many(self, usernames, max_posts=10, include_submissions=True):
+        """
+        Analyze every user, yielding each summary as soon as it is ready
+
+        Duplicate usernames (case-insensitive) are analyzed once.
+
+        Returns: generator of user_summary dicts, in completion order
+        """
+        unique = list(dict((name.strip().lower(), name.strip()) for name in usernames if name and name.strip()).values())
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bulk-user") as pool:
+            futures = [pool.submit(self._summarize, name, max_posts, include_submissions) for name in unique]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # A client that stops reading shouldn't keep the quota busy
+                for future in futures:
+                    future.cancel()
+
+    def stats(self):
+        return {"bucket": self.bucket.stats(), "batcher": self.batcher.stats()}
+
+    def close(self):
+        self.batcher.stop()
+
+def totals(summaries):
+    """Aggregate over all analyzed users"""
+    ok = [s for s in summaries if s.get("status") == "ok"]
+    total = sum(s["total_count"] for s in ok)
+    toxic = sum(s["toxic_count"] for s in ok)
+    return {
+        "users": len(summaries),
+        "found": len(ok),
+        "suspended": sum(1 for s in summaries if s.get("status") == "suspended"),
+        "errors": sum(1 for s in summaries if s.get("status") == "error"),
+        "total_count": total,
+        "toxic_count": toxic,
+        "toxicity_rate": toxic / total if total else 0.0,
+        "users_with_toxic": sum(1 for s in ok if s["toxic_count"]),
+    }
+
+def summary_text(summaries):
+    """Plain-text report of bulk results, most toxic users first"""
+    overall = totals(summaries)
+    lines = [
+        f"Users: {overall['users']} ({overall['found']} found, {overall['suspended']} suspended, {overall['errors']} errors)",
+        f"Posts: {overall['total_count']}, toxic: {overall['toxic_count']} ({overall['toxicity_rate'] * 100:.1f}%)",
+        "",
+    ]
+    for s in sorted(summaries, key=lambda s: (-s.get("toxicity_rate", 0.0), s["username"].lower())):
+        if s.get("status") == "ok":
+            lines.append(f"u/{s['username']}: {s['toxic_count']}/{s['total_count']} toxic ({s['toxicity_rate'] * 100:.1f}%)")
+        else:
+            lines.append(f"u/{s['username']}: {s.get('error', s['status'])}")
+    return "\n".join(lines)
+
+def parse_usernames(value):
+    """Usernames from a JSON list or a comma / whitespace separated string"""
+    if isinstance(value, str):
+        value = value.replace(",", " ").split()
+    names = []
+    for name in value or []:
+        name = str(name).strip()
+        if name.startswith(("u/", "/u/")):
+            name = name.split("u/", 1)[1]
+        if name:
+            names.append(name)
+    return names
+
+_bucket_lock = threading.Lock()
+_shared_bucket = None
+
+def get_bucket():
+    """Return the process-wide TokenBucket for REDDIT_REQUESTS_PER_MINUTE"""
+    global _shared_bucket
+    if _shared_bucket is None:
+        with _bucket_lock:
+            if _shared_bucket is None:
+                _shared_bucket = TokenBucket(REQUESTS_PER_MINUTE)
+                gauge("securedm_reddit_quota", lambda: _shared_bucket.stats())
+    return _shared_bucket
+
+def main():
+    """Analyze a list of users, one JSON line per user as they finish"""
+    parser = argparse.ArgumentParser(description="Analyze many Reddit users under the API quota")
+    parser.add_argument("usernames", nargs="*", help="usernames, or - / --file to read them one per line")
+    parser.add_argument("--file", help="file with one username per line")
+    parser.add_argument("--max-posts", type=int, default=10)
+    parser.add_argument("--comments-only", action="store_true")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="Reddit requests per minute")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    parser.add_argument("--fake-users", type=int, help="analyze N generated users on a local FakeReddit instead")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="seconds per FakeReddit listing page")
+    args = parser.parse_args()
+
+    usernames = list(args.usernames)
+    if args.file:
+        with open(args.file) as f:
+            usernames += [line.strip() for line in f if line.strip()]
+
+    if args.fake_users:
+        try:
+            from .fakereddit import synthetic_reddit
+        except ImportError:
+            from fakereddit import synthetic_reddit
+        reddit = synthetic_reddit(args.fake_users, 10, latency=args.fake_latency, page_size=5)
+        usernames = usernames or list(reddit.users)
+    else:
+        try:
+            from .redditclient import get_reddit
+        except ImportError:
+            from redditclient import get_reddit
+        reddit = get_reddit()
+
+    if not usernames:
+        parser.error("no usernames given")
+
+    analyzer = BulkAnalyzer(reddit, bucket=TokenBucket(args.rpm), concurrency=args.concurrency)
+    print(f"👥 Analyzing {len(usernames)} users at {args.rpm:.0f} requests/min, {analyzer.concurrency} at a time", file=sys.stderr)
+
+    started = time.perf_counter()
+    summaries = []
+    for summary in analyzer.analyze_many(usernames, args.max_posts, not args.comments_only):
+        summaries.append(summary)
+        print(json.dumps(summary, default=str), flush=True)
+    analyzer.close()
+
+    stats = analyzer.stats()
+    print(f"📊 {json.dumps(totals(summaries))}", file=sys.stderr)
+    print(f"⏱️ {time.perf_counter() - started:.1f}s, {stats['bucket']['granted']} requests, "
+          f"{stats['bucket']['waited_s']:.1f}s spent waiting for quota (summed over users), "
+          f"mean batch {stats['batcher']['mean_batch_size']:.1f}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class ClassificationCache:
+    """
+    Content-addressed cache of (label, score) predictions
+
+    Keys are a hash of the cleaned text plus the model id and version, so
+    the same text is only classified once per model. Entries live in a
+    bounded in-process LRU and, if db_path is set, in a SQLite file that
+    survives restarts and can be shared by several worker processes.
+    """
+
+    def __init__(self, model_id, model_version="1", max_entries=10000, db_path=None):
+        self.model_id = model_id
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._local = threading.local()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._connection()
+
+    def key(self, cleaned):
+        """Cache key for a cleaned text under the current model version"""
+        data = f"{self.model_id}\0{self.model_version}\0{cleaned}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def _connection(self):
+        # SQLite connections can't be shared across threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, label TEXT, score REAL, model TEXT, created REAL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, keys):
+        """
+        Look up many keys at once
+
+        Returns: dict of key -> (label, score) for the keys that were found
+        """
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = value
+            self.memory_hits += len(found)
+
+        if missing and self.db_path:
+            disk_found = {}
+            try:
+                conn = self._connection()
+                # Stay below SQLite's limit on bound parameters
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, label, score FROM predictions WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, label, score in rows:
+                        disk_found[key] = (label, score)
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache read failed: {e}")
+
+            if disk_found:
+                with self._lock:
+                    for key, value in disk_found.items():
+                        self._store(key, value)
+                    self.disk_hits += len(disk_found)
+                found.update(disk_found)
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items):
+        """
+        Store predictions
+
+        Args:
+            items (list): (key, (label, score)) pairs
+        """
+        if not items:
+            return
+
+        with self._lock:
+            for key, value in items:
+                self._store(key, value)
+
+        if self.db_path:
+            now = time.time()
+            model = f"{self.model_id}@{self.model_version}"
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO predictions (key, label, score, model, created) VALUES (?, ?, ?, ?, ?)",
+                        [(key, label, float(score), model, now) for key, (label, score) in items]
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache write failed: {e}")
+
+    def _store(self, key, value):
+        # Caller holds self._lock
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, model_version=None, purge_disk=False, model_id=None):
+        """
+        Drop cached predictions, e.g. after the model changed
+
+        Args:
+            model_version (str): New model version; old entries stop matching
+            purge_disk (bool): Also delete entries of other versions from SQLite
+            model_id (str): New model id, e.g. after a configuration change
+        """
+        with self._lock:
+            if model_version is not None:
+                self.model_version = model_version
+            if model_id is not None:
+                self.model_id = model_id
+            self._entries.clear()
+
+        if purge_disk and self.db_path:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "DELETE FROM predictions WHERE model != ?",
+                        (f"{self.model_id}@{self.model_version}",)
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️ Cache purge failed: {e}")
+
+    def stats(self):
+        """Hit/miss counters and sizes"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "model": f"{self.model_id}@{self.model_version}",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "db_path": self.db_path,
+            }
+
+def cache_from_env(model_id, model_version):
+    """
+    Build the cache configured by SECUREDM_CACHE_SIZE and SECUREDM_CACHE_DB
+    Returns: ClassificationCache, or None if caching is disabled
+    """
+    max_entries = int(os.getenv("SECUREDM_CACHE_SIZE", "10000"))
+    db_path = os.getenv("SECUREDM_CACHE_DB") or None
+    if max_entries <= 0 and not db_path:
+        return None
+    return ClassificationCache(model_id, model_version, max_entries=max(max_entries, 0), db_path=db_path)
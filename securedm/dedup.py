@@ -0,0 +1,122 @@
+# dedup.py
+import hashlib
+import numpy as np
+
+# Mersenne prime for the shingle hashes and the MinHash permutations
+_PRIME = (1 << 31) - 1
+_BASE = 257
+
+def _shingle_hashes(text, size):
+    """Rolling hashes of every size-character window of text"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < size:
+        size = len(codes)
+    hashes = np.zeros(len(codes) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        hashes = (hashes * _BASE + codes[offset:len(codes) - size + 1 + offset]) % _PRIME
+    return np.unique(hashes)
+
+class Deduplicator:
+    """
+    Groups cleaned texts so each group is classified once
+
+    Exact duplicates share a hash of the cleaned text. With near=True,
+    texts whose character shingles have an estimated Jaccard similarity
+    of at least threshold (MinHash signatures, LSH banding to find
+    candidates) join the group of the first such text. Members of a near
+    group take the representative's prediction, so this trades a little
+    accuracy for skipping copypasta variants; exact grouping never
+    changes a result.
+
+    Args:
+        near (bool): Also group near-duplicates
+        threshold (float): Minimum estimated Jaccard similarity for near groups
+        num_perm (int): MinHash signature length
+        bands (int): LSH bands, num_perm must be a multiple of it
+        shingle_size (int): Characters per shingle
+    """
+
+    def __init__(self, near=False, threshold=0.8, num_perm=64, bands=16, shingle_size=5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.near = near
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Fixed seed so every worker (and every run) groups the same way
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, text):
+        """MinHash signature of text's character shingles"""
+        hashes = _shingle_hashes(text, self.shingle_size)
+        return ((hashes[:, None] * self._a + self._b) % _PRIME).min(axis=0)
+
+    def group(self, texts):
+        """
+        Assign every text to a group
+
+        Empty texts are left out (-1), the classifier short-circuits them.
+
+        Returns: (representatives, assignment, near_count) where
+            representatives are indices into texts, assignment[i] is the
+            position of text i's representative (or -1) and near_count is
+            how many texts joined a group without being an exact duplicate
+        """
+        representatives = []
+        assignment = [-1] * len(texts)
+        exact = {}
+        buckets = {}
+        signatures = []
+        near_count = 0
+
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            if digest in exact:
+                assignment[i] = exact[digest]
+                continue
+
+            group = None
+            if self.near:
+                sig = self.signature(text)
+                keys = [(band, sig[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+                for candidate in dict.fromkeys(g for key in keys for g in buckets.get(key, ())):
+                    if np.mean(signatures[candidate] == sig) >= self.threshold:
+                        group = candidate
+                        near_count += 1
+                        break
+
+            if group is None:
+                group = len(representatives)
+                representatives.append(i)
+                if self.near:
+                    signatures.append(sig)
+                    for key in keys:
+                        buckets.setdefault(key, []).append(group)
+
+            exact[digest] = group
+            assignment[i] = group
+
+        return representatives, assignment, near_count
+
+def dedup_report(stats):
+    """
+    One-line summary of accumulated dedup stats
+
+    Args:
+        stats (dict): "texts", "classified", "near" and "model_seconds"
+            summed over the run
+    """
+    texts = stats.get("texts", 0)
+    classified = stats.get("classified", 0)
+    collapsed = texts - classified
+    ratio = collapsed / texts if texts else 0.0
+    # Collapsed texts would have cost what the classified ones did on average
+    saved = stats.get("model_seconds", 0.0) / classified * collapsed if classified else 0.0
+    return (f"{collapsed} of {texts} texts collapsed ({ratio * 100:.1f}%, {stats.get('near', 0)} near-duplicates), "
+            f"~{saved:.1f}s inference saved")
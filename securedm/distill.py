@@ -0,0 +1,468 @@
+# distill.py
+import argparse
+import array
+import json
+import math
+import os
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+try:
+    from .textcleaner import URL_RE, MENTION_RE, PUNCT_RE, TOKEN_RE
+    from .metrics import percentile
+except ImportError:
+    from textcleaner import URL_RE, MENTION_RE, PUNCT_RE, TOKEN_RE
+    from metrics import percentile
+
+# Bump when the artifact layout or the features change
+ARTIFACT_FORMAT = 1
+MAGIC = b"SDMD"
+
+DEFAULT_ARTIFACT = os.getenv("SECUREDM_DISTILLED", "toxicity_distilled.bin")
+
+# Long submissions are scored from their first words, like the model's token cap
+MAX_WORDS = 256
+
+def _model():
+    try:
+        from . import model
+    except ImportError:
+        import model
+    return model
+
+def normalize(text):
+    """
+    The regex half of clean_text: URLs, mentions and punctuation removed, lowercased
+
+    Stopword removal and lemmatization are left out so scoring never needs
+    the NLTK data; character n-grams cover the inflections instead.
+    """
+    if not text or not isinstance(text, str):
+        return ""
+    text = URL_RE.sub("", text)
+    text = MENTION_RE.sub("", text)
+    text = PUNCT_RE.sub("", text)
+    return text.lower().strip()
+
+def features(text, bits, word_ngrams=2, char_ngrams=(3, 5)):
+    """
+    Hashed word and character n-grams of a text
+
+    Word n-grams up to word_ngrams long, and character n-grams of every
+    space-padded word, are hashed (CRC32, stable across processes) into
+    2**bits buckets.
+
+    Returns: sorted list of distinct bucket indices
+    """
+    words = TOKEN_RE.findall(normalize(text))[:MAX_WORDS]
+    mask = (1 << bits) - 1
+    crc32 = zlib.crc32
+    buckets = set()
+    for n in range(1, word_ngrams + 1):
+        for i in range(len(words) - n + 1):
+            buckets.add(crc32(("w " + " ".join(words[i:i + n])).encode("utf-8")) & mask)
+    low, high = char_ngrams
+    for word in words:
+        padded = f" {word} ".encode("utf-8")
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                buckets.add(crc32(b"c" + padded[i:i + n]) & mask)
+    return sorted(buckets)
+
+class DistilledModel:
+    """
+    Linear toxicity scorer distilled from the transformer
+
+    A logistic regression over hashed n-gram features (see features()),
+    each present feature weighted 1/sqrt(feature count). Weights are stored
+    as int8 with one scale factor. Scoring is plain Python, so serving needs
+    neither numpy nor torch.
+
+    Args:
+        weights (array.array): int8 weights, one per bucket
+        meta (dict): Artifact header: bits, n-gram settings, scale, bias,
+            threshold and training details
+        fingerprint (str): CRC32 of the artifact, identifies its predictions
+    """
+
+    def __init__(self, weights, meta, fingerprint=None):
+        self.weights = weights
+        self.meta = meta
+        self.fingerprint = fingerprint
+        self.bits = meta["bits"]
+        self.word_ngrams = meta["word_ngrams"]
+        self.char_ngrams = tuple(meta["char_ngrams"])
+        self.scale = meta["scale"]
+        self.bias = meta["bias"]
+        self.threshold = meta["threshold"]
+
+    def score(self, text):
+        """Estimated probability that the full model calls text toxic"""
+        buckets = features(text, self.bits, self.word_ngrams, self.char_ngrams)
+        if not buckets:
+            return 1.0 / (1.0 + math.exp(-self.bias))
+        weights = self.weights
+        logit = self.bias + self.scale * sum(weights[i] for i in buckets) / math.sqrt(len(buckets))
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def classify(self, text):
+        """Returns: (label, score) like classify_dm, TOXIC when score reaches the threshold"""
+        score = self.score(text)
+        return ("TOXIC" if score >= self.threshold else "NON_TOXIC"), score
+
+    def classify_many(self, texts):
+        return [self.classify(text) for text in texts]
+
+def save_distilled(path, weights, meta):
+    """
+    Write an artifact: magic, header length, JSON header, int8 weights
+
+    Written to a temporary file first so a reader never sees half an artifact.
+    """
+    header = json.dumps(dict(meta, format=ARTIFACT_FORMAT)).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(weights.tobytes())
+    os.replace(tmp_path, path)
+
+def load_distilled(path=None):
+    """
+    Load an artifact written by save_distilled
+
+    Returns: DistilledModel
+    """
+    path = path or DEFAULT_ARTIFACT
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a distilled model")
+    (header_length,) = struct.unpack_from("<I", data, 4)
+    meta = json.loads(data[8:8 + header_length].decode("utf-8"))
+    if meta.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} has artifact format {meta.get('format')}, expected {ARTIFACT_FORMAT}")
+    weights = array.array("b")
+    weights.frombytes(data[8 + header_length:])
+    if len(weights) != 1 << meta["bits"]:
+        raise ValueError(f"{path} is truncated")
+    return DistilledModel(weights, meta, f"{zlib.crc32(data):08x}")
+
+def is_holdout(text, holdout):
+    """Hash split, so duplicate texts always land on the same side"""
+    return zlib.crc32(str(text).encode("utf-8")) % 1000 < holdout * 1000
+
+def load_training_data(processed_path, predictions_path, text_column="comment_text"):
+    """
+    Pair preprocessing output with the full model's predictions on it
+
+    testclassifier writes one prediction per input row, in input order, so
+    rows are matched by position. Rows the model did not score (EMPTY,
+    ERROR, or UNKNOWN when it wasn't loaded) are dropped. The target is the model's toxic score, 0 when its
+    top label is not TOXIC, the same rule as is_toxic.
+
+    Args:
+        processed_path (str): CSV written by preprocessing.py
+        predictions_path (str): testclassifier output (csv, parquet or npy)
+            for that CSV
+        text_column (str): Raw text column; features are built from the
+            raw text, not cleaned_text, so serving needs no NLTK
+
+    Returns: (texts, targets) with targets a float32 numpy array
+    """
+    import numpy as np
+    import pandas as pd
+
+    try:
+        from .predictions import read_columns
+    except ImportError:
+        from predictions import read_columns
+
+    texts = pd.read_csv(processed_path, usecols=[text_column], dtype=str, keep_default_na=False)[text_column].tolist()
+    labels, scores = read_columns(predictions_path)
+    if len(labels) != len(texts):
+        raise ValueError(f"{predictions_path} has {len(labels)} rows but {processed_path} has {len(texts)}; "
+                         f"score the processed file with testclassifier.py first")
+
+    labels = np.asarray(labels, dtype=object)
+    upper = np.array([str(label).upper() for label in labels], dtype=object)
+    keep = ~np.isin(upper, ["EMPTY", "ERROR", "UNKNOWN"])
+    targets = np.where(upper == "TOXIC", np.asarray(scores, dtype=np.float32), 0.0).astype(np.float32)
+    return [text for text, k in zip(texts, keep) if k], targets[keep]
+
+def _feature_matrix(texts, bits, word_ngrams, char_ngrams):
+    """CSR arrays (indptr, indices, values) of the hashed features"""
+    import numpy as np
+
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    chunks = []
+    for row, text in enumerate(texts):
+        buckets = features(text, bits, word_ngrams, char_ngrams)
+        chunks.append(np.asarray(buckets, dtype=np.int32))
+        indptr[row + 1] = indptr[row] + len(buckets)
+    indices = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+    counts = np.diff(indptr)
+    values = np.where(counts > 0, 1.0 / np.sqrt(np.maximum(counts, 1)), 0.0)
+    return indptr, indices, values
+
+def train_distilled(texts, targets, bits=18, word_ngrams=2, char_ngrams=(3, 5), epochs=5, batch_size=256,
+                    learning_rate=0.5, l2=1e-6, threshold=None, seed=1):
+    """
+    Fit the linear student to the teacher's scores
+
+    Logistic loss against the soft targets, minibatch AdaGrad with L2 on
+    the weights a batch touches.
+
+    Args:
+        texts (list): Raw training texts
+        targets (array): Teacher toxic score per text, 0..1
+        bits (int): log2 of the number of feature buckets
+        threshold (float): Decision threshold saved in the artifact,
+            defaults to TOXIC_THRESHOLD
+
+    Returns: (weights, meta) ready for save_distilled
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    indptr, indices, values = _feature_matrix(texts, bits, word_ngrams, char_ngrams)
+    print(f"🔢 {len(texts)} texts featurized ({len(indices) / max(1, len(texts)):.0f} features/text, "
+          f"{time.perf_counter() - started:.1f}s)")
+
+    targets = np.asarray(targets, dtype=np.float64)
+    dim = 1 << bits
+    weights = np.zeros(dim)
+    accum = np.full(dim, 1e-8)
+    base_rate = float(np.clip(targets.mean(), 1e-4, 1 - 1e-4)) if len(targets) else 0.5
+    bias = math.log(base_rate / (1 - base_rate))
+    bias_accum = 1e-8
+    rng = np.random.RandomState(seed)
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(texts))
+        loss = 0.0
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            starts = indptr[rows]
+            lengths = indptr[rows + 1] - starts
+            # Positions of every feature of every row in the batch
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            buckets = indices[positions]
+            segment = np.repeat(np.arange(len(rows)), lengths)
+            row_values = values[rows][segment]
+
+            logits = bias + np.bincount(segment, weights=weights[buckets] * row_values, minlength=len(rows))
+            probs = 1.0 / (1.0 + np.exp(-logits))
+            y = targets[rows]
+            loss += float(-(y * np.log(probs + 1e-12) + (1 - y) * np.log(1 - probs + 1e-12)).sum())
+
+            errors = (probs - y) / len(rows)
+            touched, inverse = np.unique(buckets, return_inverse=True)
+            grad = np.bincount(inverse, weights=errors[segment] * row_values, minlength=len(touched)) + l2 * weights[touched]
+            accum[touched] += grad * grad
+            weights[touched] -= learning_rate * grad / np.sqrt(accum[touched])
+
+            bias_grad = float(errors.sum())
+            bias_accum += bias_grad * bias_grad
+            bias -= learning_rate * bias_grad / math.sqrt(bias_accum)
+        print(f"📉 Epoch {epoch + 1}/{epochs}: loss {loss / max(1, len(texts)):.4f}")
+
+    # int8 with one scale factor; the largest weight maps to 127
+    scale = float(np.abs(weights).max()) / 127 if weights.any() else 1.0
+    quantized = array.array("b", np.clip(np.round(weights / scale), -127, 127).astype(np.int8).tobytes())
+    meta = {
+        "bits": bits,
+        "word_ngrams": word_ngrams,
+        "char_ngrams": list(char_ngrams),
+        "scale": scale,
+        "bias": bias,
+        "threshold": _model().TOXIC_THRESHOLD if threshold is None else threshold,
+        "teacher": _model().MODEL_PATH or _model().MODEL_NAME,
+        "rows": len(texts),
+        "epochs": epochs,
+        "train_seconds": round(time.perf_counter() - started, 1),
+    }
+    return quantized, meta
+
+def cold_start_ms(path):
+    """Import this module and load the artifact in a fresh interpreter, like a serverless cold start"""
+    code = (
+        "import time; start = time.perf_counter(); import distill; "
+        f"distill.load_distilled({os.path.abspath(path)!r}); print((time.perf_counter() - start) * 1000)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+def teacher_latency(texts):
+    """
+    Load time and per-text latency of the full classify_dm path
+
+    The prediction caches are turned off so every call runs the model.
+    """
+    os.environ["SECUREDM_CACHE_SIZE"] = "0"
+    os.environ["SECUREDM_CACHE_DB"] = ""
+    model = _model()
+    started = time.perf_counter()
+    model.load_model()
+    model.warmup()
+    load_ms = (time.perf_counter() - started) * 1000
+    seconds = []
+    for text in texts:
+        started = time.perf_counter()
+        model.classify_dm(text)
+        seconds.append(time.perf_counter() - started)
+    return load_ms, seconds
+
+def distill_report(student, texts, targets, threshold=None, latency_sample=2000, teacher_sample=0, artifact_path=None):
+    """
+    Agreement and latency of the student against the full model
+
+    Args:
+        student (DistilledModel): Model as loaded from its artifact, so the
+            int8 weights are what gets measured
+        texts (list): Held-out raw texts
+        targets (array): Teacher toxic scores for texts
+        threshold (float): Toxic threshold of the teacher, defaults to the
+            student's
+        latency_sample (int): Texts timed one at a time for the student
+        teacher_sample (int): Texts timed through classify_dm; 0 skips
+            loading the full model
+        artifact_path (str): Artifact to measure a fresh-process cold start on
+
+    Returns: dict
+    """
+    threshold = student.threshold if threshold is None else threshold
+    scores = [student.score(text) for text in texts]
+    teacher_toxic = [float(t) >= threshold for t in targets]
+    student_toxic = [s >= student.threshold for s in scores]
+    both = sum(1 for t, s in zip(teacher_toxic, student_toxic) if t and s)
+    agree = sum(1 for t, s in zip(teacher_toxic, student_toxic) if t == s)
+    n = len(texts)
+
+    report = {
+        "rows": n,
+        "teacher_toxic": sum(teacher_toxic),
+        "agreement": agree / n if n else 0.0,
+        "toxic_precision": both / sum(student_toxic) if any(student_toxic) else 0.0,
+        "toxic_recall": both / sum(teacher_toxic) if any(teacher_toxic) else 0.0,
+        "score_mae": sum(abs(s - float(t)) for s, t in zip(scores, targets)) / n if n else 0.0,
+    }
+
+    sample = texts[:latency_sample]
+    seconds = []
+    for text in sample:
+        started = time.perf_counter()
+        student.classify(text)
+        seconds.append(time.perf_counter() - started)
+    report["student"] = {
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "texts_per_s": len(seconds) / sum(seconds) if seconds else 0.0,
+    }
+    if artifact_path:
+        report["student"]["artifact_bytes"] = os.path.getsize(artifact_path)
+        report["student"]["cold_start_ms"] = cold_start_ms(artifact_path)
+
+    if teacher_sample:
+        load_ms, seconds = teacher_latency(texts[:teacher_sample])
+        report["teacher"] = {
+            "load_ms": load_ms,
+            "p50_ms": percentile(seconds, 50) * 1000,
+            "p95_ms": percentile(seconds, 95) * 1000,
+            "texts_per_s": len(seconds) / sum(seconds) if seconds else 0.0,
+        }
+        report["speedup_p50"] = report["teacher"]["p50_ms"] / report["student"]["p50_ms"] if report["student"]["p50_ms"] else 0.0
+    return report
+
+def print_report(report):
+    print("\n📊 Distilled model vs full model (held-out rows):")
+    print(f"   Rows: {report['rows']} ({report['teacher_toxic']} toxic per the full model)")
+    print(f"   Agreement: {report['agreement'] * 100:.2f}%")
+    print(f"   Toxic precision / recall: {report['toxic_precision'] * 100:.1f}% / {report['toxic_recall'] * 100:.1f}%")
+    print(f"   Score MAE: {report['score_mae']:.4f}")
+    student = report["student"]
+    print(f"   Student: p50 {student['p50_ms']:.3f} ms, p95 {student['p95_ms']:.3f} ms, {student['texts_per_s']:.0f} texts/s")
+    if "cold_start_ms" in student:
+        print(f"   Student artifact: {student['artifact_bytes'] / 1024:.0f} KiB, cold start {student['cold_start_ms']:.1f} ms")
+    if "teacher" in report:
+        teacher = report["teacher"]
+        print(f"   Full model: load {teacher['load_ms']:.0f} ms, p50 {teacher['p50_ms']:.2f} ms, "
+              f"p95 {teacher['p95_ms']:.2f} ms, {teacher['texts_per_s']:.0f} texts/s")
+        print(f"   Speedup (p50): {report['speedup_p50']:.0f}x")
+
+def _holdout_rows(texts, targets, holdout):
+    import numpy as np
+
+    mask = np.array([is_holdout(text, holdout) for text in texts], dtype=bool)
+    return mask, [text for text, m in zip(texts, mask) if m], targets[mask]
+
+def main():
+    """Train, evaluate or try out a distilled model"""
+    parser = argparse.ArgumentParser(description="Distill the toxicity model into a hashed n-gram linear model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="fit on preprocessing output and the full model's predictions for it")
+    train.add_argument("processed_file", help="CSV written by preprocessing.py")
+    train.add_argument("predictions_file", help="testclassifier.py output for processed_file")
+    train.add_argument("--output", default=DEFAULT_ARTIFACT)
+    train.add_argument("--text-column", default="comment_text")
+    train.add_argument("--bits", type=int, default=18, help="log2 of the hashed feature buckets")
+    train.add_argument("--epochs", type=int, default=5)
+    train.add_argument("--holdout", type=float, default=0.1, help="fraction of texts kept out of training for the report")
+
+    report = sub.add_parser("report", help="agreement and latency of an artifact on the held-out rows")
+    report.add_argument("artifact")
+    report.add_argument("processed_file")
+    report.add_argument("predictions_file")
+    report.add_argument("--text-column", default="comment_text")
+
+    for command in (train, report):
+        command.add_argument("--teacher-sample", type=int, default=0, help="also time N texts through the full model")
+        command.add_argument("--report-output", help="write the report as JSON")
+
+    classify = sub.add_parser("classify", help="score texts with an artifact")
+    classify.add_argument("texts", nargs="+")
+    classify.add_argument("--artifact", default=DEFAULT_ARTIFACT)
+    args = parser.parse_args()
+
+    if args.command == "classify":
+        student = load_distilled(args.artifact)
+        for text in args.texts:
+            label, score = student.classify(text)
+            print(f"{label:9s} {score:.3f}  {text[:80]}")
+        return
+
+    print(f"📂 Loading {args.processed_file} and {args.predictions_file}...")
+    texts, targets = load_training_data(args.processed_file, args.predictions_file, args.text_column)
+    print(f"✅ {len(texts)} scored rows")
+
+    if args.command == "train":
+        mask, _, _ = _holdout_rows(texts, targets, args.holdout)
+        train_texts = [text for text, m in zip(texts, mask) if not m]
+        weights, meta = train_distilled(train_texts, targets[~mask], bits=args.bits, epochs=args.epochs)
+        meta["holdout"] = args.holdout
+        save_distilled(args.output, weights, meta)
+        print(f"💾 Distilled model saved to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+        artifact = args.output
+    else:
+        artifact = args.artifact
+
+    student = load_distilled(artifact)
+    _, held_texts, held_targets = _holdout_rows(texts, targets, student.meta.get("holdout", 0.1))
+    if not held_texts:
+        print("⚠️ No held-out rows to report on")
+        return
+    result = distill_report(student, held_texts, held_targets, teacher_sample=args.teacher_sample, artifact_path=artifact)
+    print_report(result)
+    if args.report_output:
+        with open(args.report_output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Report saved to {args.report_output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# fakereddit.py
+import threading
+import time
+
+class FakeThing:
+    """Minimal stand-in for praw Comment/Submission objects"""
+
+    def __init__(self, kind, index, **fields):
+        self.id = fields.pop("id", f"{index:x}")
+        self.fullname = f"{kind}_{self.id}"
+        self.subreddit = fields.pop("subreddit", "test")
+        # Lower index means newer, matching listing order
+        self.created_utc = fields.pop("created_utc", 1700000000 - index)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+class FakeListing:
+    """Serves items newest first, sleeping `latency` seconds per page like a network fetch"""
+
+    def __init__(self, reddit, items):
+        self.reddit = reddit
+        self.items = items
+
+    def new(self, limit=100, params=None):
+        params = params or {}
+        items = self.items
+        before = params.get("before")
+        if before:
+            # Like Reddit: nothing when the anchor is gone (deleted or removed),
+            # otherwise the `limit` items just newer than it, not the newest ones
+            names = [item.fullname for item in items]
+            if before not in names:
+                return self._paged([])
+            items = items[:names.index(before)]
+            return self._paged(items[-limit:] if limit is not None and items else items)
+        return self._paged(items[:limit] if limit is not None else items)
+
+    def _paged(self, items):
+        # Even an empty listing costs one request
+        if not items:
+            self.reddit._request()
+        for start in range(0, len(items), self.reddit.page_size):
+            self.reddit._request()
+            for item in items[start:start + self.reddit.page_size]:
+                yield item
+
+class FakeRedditor:
+    def __init__(self, reddit, name, data):
+        self.name = name
+        self.comments = FakeListing(reddit, data.get("comments", []))
+        self.submissions = FakeListing(reddit, data.get("submissions", []))
+
+class FakeReddit:
+    """
+    Offline praw.Reddit stand-in for tests and benchmarks
+
+    Args:
+        users (dict): username -> {"comments": [...], "submissions": [...]},
+            items as dicts with body / title / selftext fields, newest first
+        latency (float): Seconds each listing page takes to "download"
+        page_size (int): Items per listing page (Reddit uses 100)
+    """
+
+    def __init__(self, users=None, latency=0.0, page_size=100):
+        self.latency = latency
+        self.page_size = page_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        # Prepended ids never repeat, even after removals
+        self._serial = 0
+        self.users = {}
+        for name, data in (users or {}).items():
+            self.add_user(name, data.get("comments", []), data.get("submissions", []))
+
+    def add_user(self, name, comments=(), submissions=()):
+        self.users[name.lower()] = {
+            "comments": [FakeThing("t1", i, **c) for i, c in enumerate(comments)],
+            "submissions": [FakeThing("t3", i, **s) for i, s in enumerate(submissions)],
+        }
+
+    def prepend(self, name, comments=(), submissions=()):
+        """Add newer items to the front of a user's listings"""
+        data = self.users[name.lower()]
+        for key, kind, new_items in (("comments", "t1", comments), ("submissions", "t3", submissions)):
+            existing = data[key]
+            newest = existing[0].created_utc if existing else 1700000000
+            self._serial += len(new_items)
+            data[key][:0] = [
+                FakeThing(kind, 0, id=f"n{self._serial - i:x}",
+                          created_utc=newest + len(new_items) - i, **item)
+                for i, item in enumerate(new_items)
+            ]
+
+    def remove(self, name, fullname):
+        """Delete an item, like a user deleting a comment or a mod removing it"""
+        data = self.users[name.lower()]
+        for key in ("comments", "submissions"):
+            data[key] = [item for item in data[key] if item.fullname != fullname]
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def redditor(self, name):
+        data = self.users.get(name.lower())
+        if data is None:
+            raise LookupError(f"user {name} not found")
+        return FakeRedditor(self, name, data)
+
+def synthetic_reddit(user_count=1, items_per_user=10, latency=0.0, page_size=100):
+    """
+    Build a FakeReddit with generated users user0..userN
+
+    Every fifth comment contains an insult so results aren't all clean.
+    """
+    reddit = FakeReddit(latency=latency, page_size=page_size)
+    for u in range(user_count):
+        comments = [
+            {"body": f"you are a stupid idiot number {i}" if i % 5 == 0 else f"thanks for sharing, comment {i} from user {u}"}
+            for i in range(items_per_user)
+        ]
+        submissions = [
+            {"title": f"Post {i} by user {u}", "selftext": "Some longer text about the topic. " * (i % 4)}
+            for i in range(items_per_user)
+        ]
+        reddit.add_user(f"user{u}", comments, submissions)
+    return reddit
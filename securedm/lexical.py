@@ -0,0 +1,298 @@
+# lexical.py
+import math
+import os
+import re
+import sys
+import threading
+from functools import lru_cache
+
+# Weights are summed per text and mapped to a score with 1 - exp(-total):
+# one strong term (or two medium ones) is enough to skip the model
+STRONG, MEDIUM, MILD = 2.5, 1.2, 0.5
+
+LEXICON = {
+    "fuck": STRONG, "fucking": STRONG, "fucker": STRONG, "motherfucker": STRONG, "fck": STRONG,
+    "cunt": STRONG, "bitch": STRONG, "asshole": STRONG, "retard": STRONG, "retarded": STRONG,
+    "kys": STRONG, "stfu": STRONG, "dickhead": STRONG, "shithead": STRONG,
+    "idiot": MEDIUM, "idiotic": MEDIUM, "stupid": MEDIUM, "moron": MEDIUM, "moronic": MEDIUM,
+    "dumb": MEDIUM, "dumbass": MEDIUM, "shit": MEDIUM, "dick": MEDIUM, "bastard": MEDIUM,
+    "loser": MEDIUM, "pathetic": MEDIUM, "scum": MEDIUM, "kill": MEDIUM, "die": MEDIUM,
+    "hate": MEDIUM, "ugly": MEDIUM, "suck": MEDIUM, "trash": MEDIUM, "garbage": MEDIUM,
+    "shut": MILD, "worst": MILD, "crap": MILD, "damn": MILD, "hell": MILD, "jerk": MILD,
+    "lame": MILD, "clown": MILD, "disgusting": MILD, "freak": MILD,
+}
+
+# Inflections the lemmatizer leaves behind (e.g. verbs lemmatized as nouns)
+SUFFIXES = ("s", "es", "ed", "ing", "er", "ers", "y")
+
+# Undo common obfuscation before the fuzzy lookup
+LEET = str.maketrans("0134578", "oieastb")
+REPEAT_RE = re.compile(r"(.)\1+")
+
+def load_lexicon(path=None):
+    """
+    Default lexicon, extended by a "term weight" file if one is configured
+
+    Args:
+        path (str): File with one term and optional weight per line,
+            defaults to SECUREDM_LEXICON
+    """
+    lexicon = dict(LEXICON)
+    path = path or os.getenv("SECUREDM_LEXICON")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if parts and not parts[0].startswith("#"):
+                    lexicon[parts[0].lower()] = float(parts[1]) if len(parts) > 1 else MEDIUM
+    return lexicon
+
+def _one_edit(a, b):
+    """True if a and b differ by exactly one insertion, deletion or substitution"""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:] or (len(a) == len(b) and a[i + 1:] == b[i + 1:])
+
+def _trigrams(word):
+    padded = f"#{word}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LexicalScorer:
+    """
+    Cheap first stage in front of the transformer
+
+    Scores cleaned text (output of clean_text) from lexicon hits and
+    decides the confident cases on its own: clearly toxic texts and
+    English texts with no hit at all. Everything else, including near-miss
+    spellings of lexicon terms found by character trigram overlap and
+    non-English text, is left for the model.
+
+    Args:
+        toxic_threshold (float): Lexical score at or above which a text is TOXIC
+        clean_threshold (float): Lexical score at or below which a text is NON_TOXIC
+        fuzzy_threshold (float): Trigram Jaccard similarity at which a token
+            counts as an obfuscated lexicon term; terms of five or more
+            letters also match one edit away (stupld, st00pid)
+        lexicon (dict): term -> weight, defaults to load_lexicon()
+    """
+
+    def __init__(self, toxic_threshold=0.9, clean_threshold=0.05, fuzzy_threshold=0.5, lexicon=None):
+        self.toxic_threshold = toxic_threshold
+        self.clean_threshold = clean_threshold
+        self.fuzzy_threshold = fuzzy_threshold
+        self.lexicon = lexicon if lexicon is not None else load_lexicon()
+
+        # One regex pass per text finds every exact hit
+        terms = sorted(self.lexicon, key=len, reverse=True)
+        suffixes = "|".join(SUFFIXES)
+        self._term_re = re.compile(rf"\b({'|'.join(map(re.escape, terms))})(?:{suffixes})?\b")
+
+        self._collapsed = {REPEAT_RE.sub(r"\1", term): term for term in self.lexicon}
+        self._trigram_index = {}
+        for term in self.lexicon:
+            for gram in _trigrams(term):
+                self._trigram_index.setdefault(gram, set()).add(term)
+        self._fuzzy = lru_cache(maxsize=100000)(self._fuzzy_term)
+
+        self._lock = threading.Lock()
+        self.counts = {"toxic": 0, "clean": 0, "deferred": 0}
+
+    def _fuzzy_term(self, token):
+        """Lexicon term an unknown token is probably spelling, or None"""
+        if len(token) < 3:
+            return None
+        normalized = token.translate(LEET)
+        collapsed = REPEAT_RE.sub(r"\1", normalized)
+        if collapsed in self._collapsed:
+            return self._collapsed[collapsed]
+        if len(token) < 4 or not token.isascii():
+            return None
+        grams = _trigrams(normalized)
+        candidates = set()
+        for gram in grams:
+            candidates |= self._trigram_index.get(gram, set())
+        best, best_similarity = None, 0.0
+        for term in candidates:
+            # Ordinary words that merely contain a term (hello, diet, skill) aren't obfuscation
+            if normalized.startswith(term) or normalized.endswith(term):
+                continue
+            # Short words are too close to each other for a single edit to mean anything
+            if len(term) >= 5 and collapsed[0] == term[0] and _one_edit(collapsed, REPEAT_RE.sub(r"\1", term)):
+                return term
+            term_grams = _trigrams(term)
+            similarity = len(grams & term_grams) / len(grams | term_grams)
+            if similarity > best_similarity:
+                best, best_similarity = term, similarity
+        return best if best_similarity >= self.fuzzy_threshold else None
+
+    def analyze(self, cleaned):
+        """
+        Returns: (score, fuzzy_hits, ascii_only) for one cleaned text
+        """
+        total = 0.0
+        exact = set()
+        for match in self._term_re.finditer(cleaned):
+            total += self.lexicon[match.group(1)]
+            exact.add(match.group(0))
+
+        fuzzy_hits = 0
+        ascii_only = True
+        for token in cleaned.split():
+            if token in exact:
+                continue
+            if not token.isascii():
+                ascii_only = False
+                continue
+            term = self._fuzzy(token)
+            if term:
+                fuzzy_hits += 1
+                total += self.lexicon[term] * 0.5
+
+        return 1.0 - math.exp(-total), fuzzy_hits, ascii_only
+
+    def decide(self, cleaned):
+        """
+        Returns: (label, score) if the lexical stage is confident, otherwise None
+        """
+        if not cleaned:
+            return None
+        score, fuzzy_hits, ascii_only = self.analyze(cleaned)
+        if score >= self.toxic_threshold:
+            return "TOXIC", score
+        # Obfuscated terms and non-English text always get the model
+        if score <= self.clean_threshold and not fuzzy_hits and ascii_only:
+            return "NON_TOXIC", score
+        return None
+
+    def decide_many(self, cleaned_texts):
+        """
+        decide() for each text, counting how much traffic skipped the model
+        Returns: list of (label, score) or None in input order
+        """
+        decisions = [self.decide(text) for text in cleaned_texts]
+        toxic = sum(1 for d in decisions if d and d[0] == "TOXIC")
+        clean = sum(1 for d in decisions if d and d[0] == "NON_TOXIC")
+        with self._lock:
+            self.counts["toxic"] += toxic
+            self.counts["clean"] += clean
+            self.counts["deferred"] += sum(1 for text in cleaned_texts if text) - toxic - clean
+        return decisions
+
+    def stats(self):
+        """Decision counters and the fraction of texts that skipped the model"""
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        counts["skip_rate"] = (counts["toxic"] + counts["clean"]) / total if total else 0.0
+        return counts
+
+def scorer_from_env():
+    """
+    Build the cascade's lexical stage from SECUREDM_CASCADE_* settings
+    Returns: LexicalScorer, or None if SECUREDM_CASCADE is off
+    """
+    if os.getenv("SECUREDM_CASCADE", "").lower() not in ("1", "true", "yes"):
+        return None
+    return LexicalScorer(
+        toxic_threshold=float(os.getenv("SECUREDM_CASCADE_TOXIC", "0.9")),
+        clean_threshold=float(os.getenv("SECUREDM_CASCADE_CLEAN", "0.05")),
+        fuzzy_threshold=float(os.getenv("SECUREDM_CASCADE_FUZZY", "0.5"))
+    )
+
+def cascade_report(cleaned_texts, model_toxic, toxic_thresholds, clean_thresholds):
+    """
+    Skip rate and recall cost of the cascade against full-model labels
+
+    Args:
+        cleaned_texts (list): Cleaned texts
+        model_toxic (list): True where the full model called the text toxic
+        toxic_thresholds (list): Lexical TOXIC thresholds to try
+        clean_thresholds (list): Lexical NON_TOXIC thresholds to try
+
+    Returns: list of result dicts, one per threshold pair
+    """
+    scorer = LexicalScorer()
+    analyzed = [scorer.analyze(text) if text else None for text in cleaned_texts]
+    total = sum(1 for a in analyzed if a)
+    positives = sum(1 for a, toxic in zip(analyzed, model_toxic) if a and toxic)
+
+    results = []
+    for toxic_threshold in toxic_thresholds:
+        for clean_threshold in clean_thresholds:
+            decided_toxic = decided_clean = missed = false_toxic = 0
+            for a, toxic in zip(analyzed, model_toxic):
+                if not a:
+                    continue
+                score, fuzzy_hits, ascii_only = a
+                if score >= toxic_threshold:
+                    decided_toxic += 1
+                    false_toxic += not toxic
+                elif score <= clean_threshold and not fuzzy_hits and ascii_only:
+                    decided_clean += 1
+                    missed += bool(toxic)
+            results.append({
+                "toxic_threshold": toxic_threshold,
+                "clean_threshold": clean_threshold,
+                "texts": total,
+                "skip_rate": (decided_toxic + decided_clean) / total if total else 0.0,
+                "decided_toxic": decided_toxic,
+                "decided_clean": decided_clean,
+                # Toxic texts (per the model) the cascade would call clean
+                "recall_lost": missed / positives if positives else 0.0,
+                "toxic_precision": (decided_toxic - false_toxic) / decided_toxic if decided_toxic else 1.0,
+            })
+    return results
+
+def main():
+    """Report what a cascade would skip on a predictions CSV from testclassifier.py"""
+    import argparse
+    import json
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Lexical cascade skip rate and recall report")
+    parser.add_argument("csv", help="predictions CSV with cleaned_text, label and score (testclassifier.py output)")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--model-threshold", type=float, default=float(os.getenv("SECUREDM_TOXIC_THRESHOLD", "0.5")),
+                        help="score at which a model TOXIC label counts")
+    parser.add_argument("--label-column", help="0/1 ground truth column to use instead of the model labels")
+    parser.add_argument("--toxic-thresholds", default="0.8,0.9,0.95")
+    parser.add_argument("--clean-thresholds", default="0.0,0.05,0.2")
+    parser.add_argument("--output", help="write the report JSON here")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, nrows=args.limit)
+    cleaned = df["cleaned_text"].fillna("").astype(str).tolist()
+    if args.label_column:
+        model_toxic = df[args.label_column].fillna(0).astype(int).astype(bool).tolist()
+    else:
+        model_toxic = [
+            str(label).upper() == "TOXIC" and float(score) >= args.model_threshold
+            for label, score in zip(df["label"], df["score"])
+        ]
+
+    results = cascade_report(
+        cleaned, model_toxic,
+        [float(t) for t in args.toxic_thresholds.split(",")],
+        [float(t) for t in args.clean_thresholds.split(",")]
+    )
+
+    print(f"📊 {len(cleaned)} texts, {sum(model_toxic)} toxic per {'labels' if args.label_column else 'model'}")
+    print(f"{'toxic>=':>8} {'clean<=':>8} {'skipped':>8} {'recall lost':>12} {'precision':>10}")
+    for r in results:
+        print(
+            f"{r['toxic_threshold']:>8.2f} {r['clean_threshold']:>8.2f} {r['skip_rate'] * 100:>7.1f}% "
+            f"{r['recall_lost'] * 100:>11.2f}% {r['toxic_precision'] * 100:>9.1f}%"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
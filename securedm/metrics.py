@@ -0,0 +1,229 @@
+# metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Instrumentation is cheap enough to leave on; SECUREDM_METRICS=0 turns it off
+ENABLED = os.getenv("SECUREDM_METRICS", "1").lower() not in ("0", "false", "no")
+
+# Seconds, from sub-millisecond cache hits to slow Reddit pages
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Texts per model call
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class Histogram:
+    """Fixed-bucket histogram, like a Prometheus histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        target = q * total
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= target:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+class _Timer:
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe("securedm_stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            self.registry.inc("securedm_errors_total", stage=self.stage)
+        return False
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class Registry:
+    """
+    Process-wide counters, histograms and gauges
+
+    Counters and histograms are updated in place; gauges are callbacks
+    read when metrics are rendered, so values like cache hit rate and
+    queue depth cost nothing between scrapes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def inc(self, name, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not ENABLED:
+            return
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        histogram.observe(value)
+
+    def timer(self, stage):
+        """
+        Context manager timing one stage into securedm_stage_seconds
+
+        Exceptions raised inside count towards securedm_errors_total.
+        """
+        return _Timer(self, stage) if ENABLED else _NULL_TIMER
+
+    def gauge(self, name, fn):
+        """
+        Register a callback returning the current value (or None to skip it)
+        or a dict of label value -> value
+        """
+        with self._lock:
+            self._gauges[name] = fn
+
+    def _read_gauges(self):
+        with self._lock:
+            gauges = list(self._gauges.items())
+        values = {}
+        for name, fn in gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is not None:
+                values[name] = value
+        return values
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        seen = set()
+        for (name, key), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for (name, key), histogram in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for label, v in sorted(value.items()):
+                    lines.append(f'{name}{{kind="{label}"}} {v}')
+            else:
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Metrics as plain JSON-friendly data, with approximate percentiles
+        Returns: dict with "counters", "stages" and "gauges"
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+
+        stages = {}
+        for (name, key), histogram in histograms.items():
+            label = ",".join(f"{k}={v}" for k, v in key)
+            entry = {
+                "count": histogram.count,
+                "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+            }
+            stages[f"{name}{{{label}}}" if label else name] = entry
+
+        return {
+            "counters": {
+                f"{name}{{{','.join(f'{k}={v}' for k, v in key)}}}" if key else name: value
+                for (name, key), value in sorted(counters.items())
+            },
+            "stages": stages,
+            "gauges": self._read_gauges(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+REGISTRY = Registry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+gauge = REGISTRY.gauge
+render = REGISTRY.render
+snapshot = REGISTRY.snapshot
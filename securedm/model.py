@@ -1,107 +1,606 @@
 # model.py
-from transformers import pipeline
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import torch
-import re
-
-# Download NLTK resources
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+import os
+import sys
+import threading
 
+# Preprocessing is handled by the shared TextCleaner engine
 try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+    from .textcleaner import clean_text, clean_many
+    from .cache import cache_from_env
+    from .batcher import MicroBatcher
+    from .backends import build_backend, run_token_ids
+    from .lexical import scorer_from_env
+    from .metrics import timer, observe, gauge, SIZE_BUCKETS
+except ImportError:
+    from textcleaner import clean_text, clean_many
+    from cache import cache_from_env
+    from batcher import MicroBatcher
+    from backends import build_backend, run_token_ids
+    from lexical import scorer_from_env
+    from metrics import timer, observe, gauge, SIZE_BUCKETS
 
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
+# Model configuration
+MODEL_NAME = os.getenv("SECUREDM_MODEL", "unitary/toxic-bert")
+# Directory with local weights, used instead of the Hugging Face hub when set
+MODEL_PATH = os.getenv("SECUREDM_MODEL_PATH")
+# Never touch the network, weights must already be cached or in MODEL_PATH
+OFFLINE = os.getenv("SECUREDM_OFFLINE", "").lower() in ("1", "true", "yes")
+# Bump when the weights change so cached predictions are not reused
+MODEL_VERSION = os.getenv("SECUREDM_MODEL_VERSION", "1")
+# Inference runtime: eager, int8, torchscript or onnx (see backends.py)
+BACKEND = os.getenv("SECUREDM_BACKEND", "eager")
+# Intra-op threads for torch/onnxruntime, 0 keeps the library default
+NUM_THREADS = int(os.getenv("SECUREDM_NUM_THREADS", "0"))
+# Token cap per text; comment-only deployments can run at 128
+MAX_LENGTH = int(os.getenv("SECUREDM_MAX_LENGTH", "512"))
+# Score at which a TOXIC prediction counts, also used to stop long documents early
+TOXIC_THRESHOLD = float(os.getenv("SECUREDM_TOXIC_THRESHOLD", "0.5"))
+# Most tokens of one long document that are ever classified
+LONG_TOKEN_BUDGET = int(os.getenv("SECUREDM_LONG_TOKEN_BUDGET", "2048"))
+# Tokens shared by consecutive windows of a long document
+LONG_STRIDE = int(os.getenv("SECUREDM_LONG_STRIDE", "64"))
+# Raw characters kept per token of budget, bounds cleaning time as well
+CHARS_PER_TOKEN = 8
+
+# The pipeline is loaded on first use (or by warmup), not at import time
+_model_lock = threading.Lock()
+_model_loaded = False
+_toxic_model = None
+device = None
+# Set once warmup has run a batch through the model
+_ready = False
+
+# Prediction cache shared by every caller in this process
+_cache_lock = threading.Lock()
+_cache = None
+_cache_created = False
+
+# Optional background worker merging concurrent requests into batches
+_batcher = None
+
+# Optional lexical stage deciding confident texts without the model
+_cascade_lock = threading.Lock()
+_cascade = None
+_cascade_created = False
+
+def _numeric(stats):
+    return {k: v for k, v in stats.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+# Read when metrics are scraped, never on the classification path
+gauge("securedm_cache", lambda: _numeric(_cache.stats()) if _cache else None)
+gauge("securedm_cascade", lambda: _numeric(_cascade.stats()) if _cascade else None)
+gauge("securedm_batcher_queue_depth", lambda: _batcher.queue_depth if _batcher else None)
+
+def load_model():
+    """
+    Load the toxicity pipeline once per process
+    Returns: the pipeline, or None if loading failed
+    """
+    global _model_loaded, _toxic_model, device
+    
+    if _model_loaded:
+        return _toxic_model
+    
+    with _model_lock:
+        if _model_loaded:
+            return _toxic_model
+        
+        offline = OFFLINE or bool(MODEL_PATH)
+        if offline:
+            # Must be set before transformers/huggingface_hub are imported
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        
+        try:
+            import torch
+            
+            # Device setup for Mac M1/MPS or fallback to CPU; only the eager backend uses MPS
+            use_mps = BACKEND == "eager" and torch.backends.mps.is_available()
+            device = torch.device("mps" if use_mps else "cpu")
+            print(f"Device set to use {device}")
+            device_index = 0 if device.type != "cpu" else -1
+            
+            _toxic_model = build_backend(BACKEND, MODEL_PATH or MODEL_NAME, offline, device_index, NUM_THREADS, MAX_LENGTH, MODEL_VERSION)
+            print(f"✅ Toxicity model loaded successfully ({BACKEND} backend)")
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            _toxic_model = None
+        
+        _model_loaded = True
+        return _toxic_model
+
+def get_model():
+    """Return the shared toxicity pipeline, loading it on first use"""
+    if _model_loaded:
+        return _toxic_model
+    return load_model()
+
+def set_model(model, version="custom"):
+    """
+    Replace the shared pipeline, e.g. with a stub for offline benchmarks
+    
+    Args:
+        model: Callable with the transformers text-classification pipeline interface
+        version (str): Model version used for cache keys
+    """
+    global _model_loaded, _toxic_model
+    with _model_lock:
+        _toxic_model = model
+        _model_loaded = True
+    set_model_version(version)
+
+def get_cache():
+    """Return the shared prediction cache, or None if caching is disabled"""
+    global _cache, _cache_created
+    if not _cache_created:
+        with _cache_lock:
+            if not _cache_created:
+                # Backends produce slightly different scores, so each gets its own keys
+                _cache = cache_from_env(_cache_model_id(), MODEL_VERSION)
+                _cache_created = True
+    return _cache
 
-# Device setup for Mac M1/MPS or fallback to CPU
-device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
-print(f"Device set to use {device}")
+def get_cascade():
+    """Return the lexical first stage, or None if the cascade is disabled"""
+    global _cascade, _cascade_created
+    if not _cascade_created:
+        with _cascade_lock:
+            if not _cascade_created:
+                _cascade = scorer_from_env()
+                _cascade_created = True
+    return _cascade
 
-# Preprocessing function
-def clean_text(text):
-    if not text or not isinstance(text, str):
-        return ""
+def set_cascade(scorer):
+    """
+    Replace the lexical first stage
     
-    # Remove URLs, mentions, and special characters
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'@\w+|#\w+', '', text)
-    text = re.sub(r'[^\w\s]', '', text)
+    Args:
+        scorer: LexicalScorer, or None to send every text to the model
+    """
+    global _cascade, _cascade_created
+    with _cascade_lock:
+        _cascade = scorer
+        _cascade_created = True
+
+def cascade_stats():
+    """Counters of texts the lexical stage decided without the model"""
+    cascade = get_cascade()
+    return cascade.stats() if cascade else {"enabled": False}
+
+def _cache_model_id():
+    # Backend and truncation length both change scores, so they are part of the key
+    return f"{MODEL_PATH or MODEL_NAME}:{BACKEND}:{MAX_LENGTH}"
+
+def model_id():
+    """Identity of the current model's predictions, for results stored outside the process"""
+    return f"{_cache_model_id()}:v{MODEL_VERSION}"
+
+def set_max_length(max_length):
+    """
+    Change the per-deployment token cap
     
-    # Lowercase
-    text = text.lower().strip()
+    Args:
+        max_length (int): Longest tokenized input sent to the model
+    """
+    global MAX_LENGTH
+    MAX_LENGTH = int(max_length)
+    cache = get_cache()
+    if cache:
+        cache.invalidate(model_id=_cache_model_id())
+
+def set_model_version(version):
+    """
+    Invalidate cached predictions because the model changed
     
-    if not text:
-        return ""
+    Args:
+        version (str): New model version
+    """
+    global MODEL_VERSION
+    MODEL_VERSION = version
+    cache = get_cache()
+    if cache:
+        cache.invalidate(version)
+
+def cache_stats():
+    """Hit/miss counters of the prediction cache"""
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+def warmup(batch_size=8):
+    """
+    Load the model and run a dummy batch so the first real request is fast
+    Returns: True if the model is ready
+    """
+    global _ready
+    toxic_model = get_model()
+    if not toxic_model:
+        return False
     
     try:
-        # Tokenize
-        words = nltk.word_tokenize(text)
-        # Remove stopwords and non-alphanumeric
-        stop_words = set(stopwords.words('english'))
-        words = [w for w in words if w.isalnum() and w not in stop_words and len(w) > 2]
-        
-        # Lemmatize
-        lemmatizer = WordNetLemmatizer()
-        words = [lemmatizer.lemmatize(w) for w in words]
-        
-        return " ".join(words)
+        toxic_model(["warmup message for the toxicity model"] * batch_size, batch_size=batch_size, truncation=True, max_length=MAX_LENGTH)
+        clean_text("Warming up the text cleaner https://example.com")
+        _ready = True
+        return True
     except Exception as e:
-        print(f"Error processing text: {e}")
-        return text
+        print(f"❌ Error during warmup: {e}")
+        return False
 
-# Load toxicity detection model
-device_index = 0 if device.type != "cpu" else -1
+def is_ready():
+    """True once warmup has succeeded, e.g. for readiness probes"""
+    return _ready
 
-try:
-    toxic_model = pipeline(
-        "text-classification",
-        model="unitary/toxic-bert",
-        tokenizer="unitary/toxic-bert",
-        device=device_index,
-        truncation=True,
-        max_length=512
-    )
-    print("✅ Toxicity model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    toxic_model = None
+def __getattr__(name):
+    # Keep `from model import toxic_model` working without loading at import
+    if name == "toxic_model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def classify_dm(message):
     """
     Classify a direct message for toxicity
     Returns: (label, score) tuple
     """
-    if not toxic_model:
+    return classify_batch([message], batch_size=1)[0]
+
+def classify_batch(texts, batch_size=32, empty_label="NON_TOXIC"):
+    """
+    Classify many messages for toxicity using real model batches
+    
+    Args:
+        texts (list): Messages to classify
+        batch_size (int): Number of texts sent through the model at once
+        empty_label (str): Label returned for texts that are empty after cleaning
+    
+    Returns: list of (label, score) tuples in the same order as texts
+    """
+    with timer("clean"):
+        cleaned_texts = clean_many(texts)
+    return classify_cleaned(cleaned_texts, batch_size=batch_size, empty_label=empty_label)
+
+def classify_cleaned(cleaned_texts, batch_size=32, empty_label="NON_TOXIC", sort_by_length=False, token_ids=None):
+    """
+    Classify texts that already went through clean_text
+    
+    Args:
+        cleaned_texts (list): Output of clean_text for each message
+        batch_size (int): Number of texts sent through the model at once
+        empty_label (str): Label returned for empty texts
+        sort_by_length (bool): Pre-tokenize and batch texts of similar token
+            length together, so short texts aren't padded to a long one
+        token_ids (list): Input ids of each text from the model's tokenizer
+            (e.g. a TokenStore), so nothing is tokenized again
+    
+    Returns: list of (label, score) tuples in the same order as cleaned_texts
+    """
+    cascade = get_cascade()
+    if cascade is None:
+        return _classify_model(cleaned_texts, batch_size, empty_label, sort_by_length, token_ids)
+    
+    # Confident lexical decisions skip the model, only ambiguous texts go on
+    decisions = cascade.decide_many(cleaned_texts)
+    if any(decisions):
+        names = _cascade_labels(get_model(), empty_label)
+        decisions = [(names[decision[0]], decision[1]) if decision else None for decision in decisions]
+    results = [decision or (empty_label, 0.0) for decision in decisions]
+    ambiguous = [i for i, text in enumerate(cleaned_texts) if text and decisions[i] is None]
+    if ambiguous:
+        ambiguous_ids = [token_ids[i] for i in ambiguous] if token_ids is not None else None
+        predictions = _classify_model([cleaned_texts[i] for i in ambiguous], batch_size, empty_label, sort_by_length, ambiguous_ids)
+        for i, prediction in zip(ambiguous, predictions):
+            results[i] = prediction
+    return results
+
+def _cascade_labels(toxic_model, empty_label):
+    """
+    Map the lexical stage's TOXIC / NON_TOXIC to the model's own label names,
+    so cascade and model results land in the same label buckets
+    
+    Returns: dict of lexical label -> label to report
+    """
+    config = getattr(getattr(toxic_model, "model", None), "config", None)
+    names = [str(name) for name in (getattr(config, "id2label", None) or {}).values()]
+    toxic = next((name for name in names if name.upper() == "TOXIC"), "TOXIC")
+    # Models without a clean class (toxic-bert) report clean text like an empty one
+    clean = next((name for name in names if name.upper().replace("-", "_") in ("NON_TOXIC", "NOT_TOXIC", "NEUTRAL")), empty_label)
+    return {"TOXIC": toxic, "NON_TOXIC": clean}
+
+def _classify_model(cleaned_texts, batch_size, empty_label, sort_by_length, token_ids=None):
+    batcher = _batcher
+    # The batching worker takes text; pre-tokenized bulk input is batched already
+    if batcher is None or batcher.in_worker() or token_ids is not None:
+        return _classify_cleaned_direct(cleaned_texts, batch_size, empty_label, sort_by_length, token_ids)
+    
+    # Hand non-empty texts to the micro-batching worker, which shares
+    # model calls with every other thread classifying at the same time
+    results = [(empty_label, 0.0)] * len(cleaned_texts)
+    indices = [i for i, text in enumerate(cleaned_texts) if text]
+    predictions = batcher.classify_many([cleaned_texts[i] for i in indices])
+    for i, prediction in zip(indices, predictions):
+        results[i] = prediction
+    return results
+
+def is_toxic(label, score, threshold=None):
+    """True if a (label, score) prediction crosses the toxic threshold"""
+    threshold = TOXIC_THRESHOLD if threshold is None else threshold
+    return bool(label) and label.upper() == "TOXIC" and score >= threshold
+
+def split_windows(cleaned, window=None, stride=None, token_budget=None, toxic_model=None):
+    """
+    Split a cleaned document into overlapping token windows
+    
+    Args:
+        cleaned (str): Output of clean_text
+        window (int): Tokens per window, defaults to MAX_LENGTH minus special tokens
+        stride (int): Tokens shared by consecutive windows
+        token_budget (int): Tokens of the document considered at all
+    
+    Returns: list of window texts, in document order
+    """
+    window = window or MAX_LENGTH - 2
+    stride = LONG_STRIDE if stride is None else stride
+    token_budget = token_budget or LONG_TOKEN_BUDGET
+    step = max(1, window - stride)
+    
+    toxic_model = toxic_model or get_model()
+    tokenizer = getattr(toxic_model, "tokenizer", None)
+    
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        # Slice the original string by character offsets instead of decoding
+        # word pieces, so each window re-tokenizes to the same tokens
+        offsets = tokenizer(cleaned, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"][:token_budget]
+        return [
+            cleaned[offsets[start][0]:offsets[min(start + window, len(offsets)) - 1][1]]
+            for start in range(0, len(offsets), step)
+            if start == 0 or start + stride < len(offsets)
+        ]
+    
+    # Without a fast tokenizer, count whitespace words as tokens
+    words = cleaned.split()[:token_budget]
+    return [
+        " ".join(words[start:start + window])
+        for start in range(0, len(words), step)
+        if start == 0 or start + stride < len(words)
+    ]
+
+def _aggregate(predictions, aggregate, threshold):
+    if aggregate == "max":
+        toxic = [p for p in predictions if is_toxic(*p, threshold=threshold)]
+        return max(toxic or predictions, key=lambda p: p[1])
+    
+    # Mean toxic score over the windows, a non-toxic window counts as 0
+    toxic_scores = [score if label and label.upper() == "TOXIC" else 0.0 for label, score in predictions]
+    mean = sum(toxic_scores) / len(toxic_scores)
+    if mean >= threshold:
+        return next(label for label, _ in predictions if label and label.upper() == "TOXIC"), mean
+    labels = [label for label, _ in predictions]
+    label = max(set(labels), key=labels.count)
+    scores = [score for l, score in predictions if l == label]
+    return label, sum(scores) / len(scores)
+
+def classify_long(message, aggregate="max", threshold=None, token_budget=None, window=None, stride=None, batch_size=8, early_stop=None):
+    """
+    Classify a document longer than the model's token limit
+    
+    The document is split into overlapping token windows that are classified
+    batch_size windows at a time. Raw text past the token budget is dropped
+    before cleaning, so the cost of one document is bounded.
+    
+    Args:
+        message (str): Raw document, e.g. a submission title and selftext
+        aggregate (str): "max" (most toxic window) or "mean" over the windows
+        threshold (float): Toxic score threshold, defaults to TOXIC_THRESHOLD
+        token_budget (int): Tokens of the document classified at most
+        window (int): Tokens per window
+        stride (int): Tokens shared by consecutive windows
+        batch_size (int): Windows classified per model call
+        early_stop (bool): Stop once a window is toxic, defaults to True for "max"
+    
+    Returns: (label, score) tuple
+    """
+    if aggregate not in ("max", "mean"):
+        raise ValueError(f"Unknown aggregate '{aggregate}', expected 'max' or 'mean'")
+    threshold = TOXIC_THRESHOLD if threshold is None else threshold
+    token_budget = token_budget or LONG_TOKEN_BUDGET
+    # Stopping early would bias a mean, so it is only the default for max
+    early_stop = aggregate == "max" if early_stop is None else early_stop
+    
+    with timer("clean"):
+        cleaned = clean_text((message or "")[:token_budget * CHARS_PER_TOKEN])
+    if not cleaned:
+        return classify_cleaned([cleaned])[0]
+    if not get_model():
         return "UNKNOWN", 0.0
     
-    if not message or not isinstance(message, str):
-        return "NON_TOXIC", 0.0
+    windows = split_windows(cleaned, window, stride, token_budget)
+    predictions = []
+    for start in range(0, len(windows), batch_size):
+        batch = classify_cleaned(windows[start:start + batch_size], batch_size=batch_size)
+        predictions.extend(p for p in batch if p[0] not in ("ERROR", "UNKNOWN"))
+        if early_stop and any(is_toxic(label, score, threshold) for label, score in batch):
+            break
     
-    try:
-        cleaned = clean_text(message)
-        if not cleaned:
-            return "NON_TOXIC", 0.0
-            
-        result = toxic_model(cleaned, truncation=True, max_length=512)
-        
-        # Handle both single prediction and batch prediction formats
-        if isinstance(result, list) and len(result) > 0:
-            result = result[0]
-        
-        label = result.get('label', 'UNKNOWN')
-        score = result.get('score', 0.0)
+    if not predictions:
+        return "ERROR", 0.0
+    return _aggregate(predictions, aggregate, threshold)
+
+def classify_long_many(texts, **kwargs):
+    """
+    classify_long for each text
+    Returns: list of (label, score) tuples in the same order as texts
+    """
+    return [classify_long(text, **kwargs) for text in texts]
+
+def enable_micro_batching(max_batch=None, max_wait_ms=None):
+    """
+    Route all classification through a shared background batching worker
+    
+    Args:
+        max_batch (int): Largest batch the worker sends to the model
+        max_wait_ms (float): How long the worker waits for more requests
+    
+    Returns: the MicroBatcher
+    """
+    global _batcher
+    if max_batch is None:
+        max_batch = int(os.getenv("SECUREDM_BATCH_MAX", "32"))
+    if max_wait_ms is None:
+        max_wait_ms = float(os.getenv("SECUREDM_BATCH_WAIT_MS", "5"))
+    
+    disable_micro_batching()
+    _batcher = MicroBatcher(
+        lambda texts: _classify_cleaned_direct(texts, batch_size=max_batch),
+        max_batch=max_batch,
+        max_wait_ms=max_wait_ms
+    )
+    return _batcher
+
+def disable_micro_batching():
+    """Stop the batching worker, callers go back to calling the model directly"""
+    global _batcher
+    batcher, _batcher = _batcher, None
+    if batcher:
+        batcher.stop()
+
+def get_batcher():
+    """Return the active MicroBatcher, or None"""
+    return _batcher
+
+def token_lengths(texts, toxic_model=None):
+    """
+    Token count of each text after truncation to MAX_LENGTH
+    
+    Falls back to whitespace word counts if the model has no tokenizer.
+    """
+    toxic_model = toxic_model or get_model()
+    tokenizer = getattr(toxic_model, "tokenizer", None)
+    if tokenizer is None:
+        return [min(len(text.split()), MAX_LENGTH) for text in texts]
+    encoded = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def _classify_cleaned_direct(cleaned_texts, batch_size=32, empty_label="NON_TOXIC", sort_by_length=False, token_ids=None):
+    toxic_model = get_model()
+    if not toxic_model:
+        return [("UNKNOWN", 0.0)] * len(cleaned_texts)
+    
+    results = [(empty_label, 0.0)] * len(cleaned_texts)
+    
+    # Only non-empty texts go through the model
+    indices = [i for i, text in enumerate(cleaned_texts) if text]
+    
+    # Serve repeated texts from the cache, the rest are classified once per distinct text
+    cache = get_cache()
+    if cache:
+        with timer("cache_lookup"):
+            keys = {i: cache.key(cleaned_texts[i]) for i in indices}
+            cached = cache.get_many(list(set(keys.values())))
+        pending = {}
+        for i in indices:
+            if keys[i] in cached:
+                results[i] = cached[keys[i]]
+            else:
+                pending.setdefault(keys[i], []).append(i)
+        indices = [rows[0] for rows in pending.values()]
+    
+    if sort_by_length and len(indices) > batch_size:
+        # Each batch is padded only to its own longest text; results are
+        # written back by index, so input order is preserved
+        if token_ids is not None:
+            lengths = [len(token_ids[i]) for i in indices]
+        else:
+            lengths = token_lengths([cleaned_texts[i] for i in indices], toxic_model)
+        indices = [i for _, i in sorted(zip(lengths, indices))]
+    
+    new_entries = []
+    
+    for start in range(0, len(indices), batch_size):
+        chunk = indices[start:start + batch_size]
+        chunk_texts = [cleaned_texts[i] for i in chunk]
         
-        return label, score
+        try:
+            observe("securedm_batch_size", len(chunk_texts), buckets=SIZE_BUCKETS)
+            with timer("model_forward"):
+                predictions = run_token_ids(toxic_model, [token_ids[i] for i in chunk]) if token_ids is not None else None
+                if predictions is None:
+                    predictions = toxic_model(chunk_texts, batch_size=len(chunk_texts), truncation=True, max_length=MAX_LENGTH)
+            predictions = [_parse_prediction(p) for p in predictions]
+        except Exception as e:
+            print(f"Error classifying batch: {e}")
+            # Retry one by one so a single bad text doesn't fail the whole batch
+            predictions = [_classify_one(toxic_model, text) for text in chunk_texts]
         
+        for i, prediction in zip(chunk, predictions):
+            results[i] = prediction
+            if cache and prediction[0] not in ("ERROR", "UNKNOWN"):
+                new_entries.append((keys[i], prediction))
+    
+    if cache:
+        cache.put_many(new_entries)
+        # Copy results to rows that shared a text with a classified row
+        for rows in pending.values():
+            for i in rows[1:]:
+                results[i] = results[rows[0]]
+    
+    return results
+
+def _classify_one(toxic_model, cleaned):
+    try:
+        return _parse_prediction(toxic_model(cleaned, truncation=True, max_length=MAX_LENGTH))
     except Exception as e:
         print(f"Error classifying message: {e}")
-        return "ERROR", 0.0
\ No newline at end of file
+        return "ERROR", 0.0
+
+def _parse_prediction(result):
+    # Handle both single prediction and batch prediction formats
+    if isinstance(result, list) and len(result) > 0:
+        result = result[0]
+    
+    label = result.get('label', 'UNKNOWN')
+    score = result.get('score', 0.0)
+    
+    return label, score
+
+def check_import_time(budget_ms=None):
+    """
+    Import securedm.model in a fresh interpreter and compare against a budget
+    Returns: (import_ms, budget_ms)
+    """
+    import subprocess
+    
+    if budget_ms is None:
+        budget_ms = float(os.getenv("SECUREDM_IMPORT_BUDGET_MS", "500"))
+    
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import time; start = time.perf_counter(); import securedm.model; "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    import_ms = float(output.stdout.strip().splitlines()[-1])
+    return import_ms, budget_ms
+
+def main():
+    """Report import cost, model load time and warmup time"""
+    import time
+    
+    import_ms, budget_ms = check_import_time()
+    print(f"📦 Import securedm.model: {import_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    
+    start = time.perf_counter()
+    load_model()
+    print(f"🧠 Model load: {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    start = time.perf_counter()
+    ready = warmup()
+    print(f"🔥 Warmup: {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    if import_ms > budget_ms:
+        print("❌ Import time over budget")
+        sys.exit(1)
+    if not ready:
+        print("❌ Model not ready")
+        sys.exit(1)
+    print("✅ Model ready")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+# monitor.py
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Oldest items Reddit streams replay on start-up are skipped by fullname,
+# so a restart only reprocesses what came after the last checkpoint
+
+def _is_newer(fullname, after):
+    """True if fullname was created after the checkpointed fullname"""
+    if not after:
+        return True
+    kind, _, base36 = fullname.partition("_")
+    after_kind, _, after_base36 = after.partition("_")
+    if kind != after_kind:
+        # Ids of different kinds (comments, messages) aren't comparable
+        return True
+    try:
+        return int(base36, 36) > int(after_base36, 36)
+    except ValueError:
+        return True
+
+class Source:
+    """
+    Something that yields items for the monitor to classify
+
+    Subclasses implement items(), yielding dicts with "id" (fullname),
+    "text", "kind", "subreddit", "author" and "created" (epoch seconds).
+    Yielding None tells the monitor the source is idle, so it can check
+    for shutdown between polls.
+    """
+
+    name = "source"
+
+    def items(self, after=None, stop=None):
+        """
+        Args:
+            after (str): Fullname of the last processed item, resume after it
+            stop (threading.Event): Set when the monitor shuts down
+        """
+        raise NotImplementedError
+
+def _reddit_item(thing, kind):
+    return {
+        "id": thing.fullname,
+        "text": thing.body,
+        "kind": kind,
+        "subreddit": str(thing.subreddit) if getattr(thing, "subreddit", None) else None,
+        "author": str(thing.author) if thing.author else None,
+        "created": thing.created_utc,
+    }
+
+class SubredditCommentSource(Source):
+    """
+    New comments in one or more subreddits
+
+    Args:
+        reddit: praw.Reddit (see redditclient.get_reddit)
+        subreddits (list): Subreddit names
+    """
+
+    def __init__(self, reddit, subreddits):
+        self.reddit = reddit
+        self.subreddits = list(subreddits)
+        self.name = "comments:" + "+".join(sorted(self.subreddits))
+
+    def items(self, after=None, stop=None):
+        stream = self.reddit.subreddit("+".join(self.subreddits)).stream.comments(pause_after=0)
+        for comment in stream:
+            if comment is None:
+                yield None
+                continue
+            if comment.body and comment.body != "[deleted]" and _is_newer(comment.fullname, after):
+                yield _reddit_item(comment, "comment")
+
+class InboxSource(Source):
+    """
+    Messages and comment replies sent to the bot account
+
+    Args:
+        reddit: praw.Reddit logged in as the bot (see redditclient.get_user_reddit)
+    """
+
+    name = "inbox"
+
+    def __init__(self, reddit):
+        self.reddit = reddit
+
+    def items(self, after=None, stop=None):
+        for message in self.reddit.inbox.stream(pause_after=0):
+            if message is None:
+                yield None
+                continue
+            if message.body and _is_newer(message.fullname, after):
+                kind = "comment" if message.fullname.startswith("t1_") else "message"
+                yield _reddit_item(message, kind)
+
+class JSONLSource(Source):
+    """
+    Replay a local firehose file, one JSON object per line
+
+    Lines need an "id" and a "text" (or "body"); other item fields are
+    optional. Used for offline tests and load runs.
+
+    Args:
+        path (str): JSONL file
+        rate (float): Items per second, None replays as fast as the monitor accepts
+        name (str): Checkpoint key, defaults to "jsonl:" + file name
+    """
+
+    def __init__(self, path, rate=None, name=None):
+        self.path = path
+        self.rate = rate
+        self.name = name or "jsonl:" + os.path.basename(path)
+
+    def _contains(self, item_id):
+        with open(self.path, encoding="utf-8") as f:
+            return any(line.strip() and str(json.loads(line)["id"]) == item_id for line in f)
+
+    def items(self, after=None, stop=None):
+        if after and not self._contains(after):
+            # At-least-once: a checkpoint we can't find means replaying everything
+            print(f"⚠️ {after} not found in {self.path}, replaying from the start", file=sys.stderr)
+            after = None
+        # The file is replayed in order, so resuming means skipping up to the checkpoint
+        skipping = bool(after)
+        started = time.perf_counter()
+        sent = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                item_id = str(data["id"])
+                if skipping:
+                    skipping = item_id != after
+                    continue
+                if self.rate:
+                    delay = started + sent / self.rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                sent += 1
+                yield {
+                    "id": item_id,
+                    "text": data.get("text", data.get("body", "")),
+                    "kind": data.get("kind", "comment"),
+                    "subreddit": data.get("subreddit"),
+                    "author": data.get("author"),
+                    "created": float(data.get("created", time.time())),
+                }
+
+def load_checkpoint(path):
+    """
+    Returns: dict of source name -> last processed fullname
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f).get("sources", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error reading checkpoint {path}: {e}", file=sys.stderr)
+        return {}
+
+def save_checkpoint(path, sources, processed):
+    """Atomically replace the checkpoint so a crash never leaves it half written"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"sources": sources, "processed": processed, "updated": datetime.now().isoformat()}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Monitor:
+    """
+    Long-running classifier for Reddit streams
+
+    One producer thread per source feeds a bounded queue; the consumer
+    takes up to batch_size items at a time and classifies them in one call.
+    When the consumer falls behind the queue fills up and producers block,
+    which stops them polling Reddit until there is room (backpressure).
+    The checkpoint only moves past items whose handler has returned, so
+    after a crash items are processed again rather than lost
+    (at-least-once).
+
+    Args:
+        sources (list): Source instances
+        classify_fn: Callable taking a list of texts and returning (label, score)
+            tuples, defaults to securedm.model.classify_batch
+        handler: Called as handler(item, label, score) for every item,
+            defaults to printing toxic items
+        checkpoint_path (str): JSON file with the last processed fullname per source
+        queue_size (int): Items buffered between producers and the consumer
+        batch_size (int): Largest batch handed to classify_fn
+        max_wait_ms (float): How long a partial batch waits for more items
+        report_interval (float): Seconds between throughput/lag readouts, 0 disables
+        checkpoint_interval (float): Seconds between checkpoint writes
+    """
+
+    def __init__(self, sources, classify_fn=None, handler=None, checkpoint_path=None, queue_size=1000,
+                 batch_size=32, max_wait_ms=50, report_interval=10, checkpoint_interval=1.0):
+        try:
+            from .model import classify_batch, is_toxic
+            from .metrics import gauge
+        except ImportError:
+            from model import classify_batch, is_toxic
+            from metrics import gauge
+        self._is_toxic = is_toxic
+
+        self.sources = list(sources)
+        self.classify_fn = classify_fn or classify_batch
+        self.handler = handler or self._log_toxic
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.report_interval = report_interval
+        self.checkpoint_interval = checkpoint_interval
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.checkpoint = load_checkpoint(checkpoint_path)
+
+        self._lock = threading.Lock()
+        self._producers = []
+        self._finished = 0
+        self.counters = {
+            "processed": 0,
+            "toxic": 0,
+            "batches": 0,
+            "blocked_s": 0.0,
+            "blocked_puts": 0,
+            "source_errors": 0,
+        }
+        self._last_created = None
+        self._started = None
+
+        gauge("securedm_monitor", lambda: {
+            k: v for k, v in self.stats().items()
+            if k in ("processed", "items_per_s", "queue_depth", "lag_s", "blocked_s") and v is not None
+        })
+
+    def _log_toxic(self, item, label, score):
+        if self._is_toxic(label, score):
+            where = f"r/{item['subreddit']}" if item.get("subreddit") else item.get("kind", "item")
+            print(f"🚨 {item['id']} in {where} by {item.get('author')}: {label} ({score:.3f}) {item['text'][:80]!r}")
+
+    def _put(self, entry):
+        # Block while the queue is full, checking for shutdown every 100ms
+        try:
+            self.queue.put(entry, block=False)
+            return True
+        except queue.Full:
+            pass
+        blocked = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            with self._lock:
+                self.counters["blocked_s"] += time.perf_counter() - blocked
+                self.counters["blocked_puts"] += 1
+
+    def _produce(self, source):
+        after = self.checkpoint.get(source.name)
+        backoff = 1.0
+        while not self.stop_event.is_set():
+            try:
+                for item in source.items(after, self.stop_event):
+                    if self.stop_event.is_set():
+                        break
+                    if item is None:
+                        continue
+                    if not self._put((source.name, item)):
+                        break
+                    after = item["id"]
+                    backoff = 1.0
+                else:
+                    # Finite sources (replays) end here; Reddit streams never do
+                    break
+            except Exception as e:
+                with self._lock:
+                    self.counters["source_errors"] += 1
+                print(f"⚠️ {source.name} failed: {e}, retrying in {backoff:.0f}s", file=sys.stderr)
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+        with self._lock:
+            self._finished += 1
+
+    def _collect(self):
+        """Wait for one item, then take more until the batch is full or max_wait passes"""
+        try:
+            batch = [self.queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(block=remaining > 0, timeout=remaining if remaining > 0 else None))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch):
+        predictions = self.classify_fn([item["text"] for _, item in batch])
+        toxic = 0
+        for (name, item), (label, score) in zip(batch, predictions):
+            try:
+                self.handler(item, label, score)
+            except Exception as e:
+                print(f"⚠️ Handler failed on {item['id']}: {e}", file=sys.stderr)
+            toxic += self._is_toxic(label, score)
+            # Items of one source are queued in order, the last one is the newest
+            self.checkpoint[name] = item["id"]
+        with self._lock:
+            self.counters["processed"] += len(batch)
+            self.counters["toxic"] += toxic
+            self.counters["batches"] += 1
+        self._last_created = batch[-1][1].get("created")
+
+    def _save(self):
+        if self.checkpoint_path:
+            save_checkpoint(self.checkpoint_path, self.checkpoint, self.counters["processed"])
+
+    def stats(self):
+        """Throughput, queue depth, lag and backpressure counters"""
+        with self._lock:
+            stats = dict(self.counters)
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        stats["elapsed_s"] = elapsed
+        stats["items_per_s"] = stats["processed"] / elapsed if elapsed else 0.0
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_size"] = self.queue.maxsize
+        # How far behind real time the newest processed item is
+        stats["lag_s"] = max(0.0, time.time() - self._last_created) if self._last_created else None
+        return stats
+
+    def report(self):
+        s = self.stats()
+        lag = f"{s['lag_s']:.1f}s" if s["lag_s"] is not None else "-"
+        print(
+            f"📈 {s['processed']} items | {s['items_per_s']:.1f}/s | queue {s['queue_depth']}/{s['queue_size']} | "
+            f"lag {lag} | blocked {s['blocked_s']:.1f}s | toxic {s['toxic']}",
+            file=sys.stderr
+        )
+
+    def run(self, max_items=None, duration=None):
+        """
+        Process items until stopped, the sources run dry, max_items or duration
+
+        Returns: final stats()
+        """
+        self._started = time.perf_counter()
+        self.stop_event.clear()
+        for source in self.sources:
+            thread = threading.Thread(target=self._produce, args=(source,), name=f"monitor-{source.name}", daemon=True)
+            thread.start()
+            self._producers.append(thread)
+
+        last_report = last_save = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                batch = self._collect()
+                if batch:
+                    self._process(batch)
+                elif self._finished == len(self.sources) and self.queue.empty():
+                    break
+
+                now = time.perf_counter()
+                if now - last_save >= self.checkpoint_interval:
+                    self._save()
+                    last_save = now
+                if self.report_interval and now - last_report >= self.report_interval:
+                    self.report()
+                    last_report = now
+                if max_items and self.counters["processed"] >= max_items:
+                    break
+                if duration and now - self._started >= duration:
+                    break
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping...", file=sys.stderr)
+        finally:
+            self.stop()
+            self._save()
+        return self.stats()
+
+    def stop(self):
+        """Ask producers to stop; items still queued are left for the next run"""
+        self.stop_event.set()
+        for thread in self._producers:
+            thread.join(timeout=2)
+        self._producers = []
@@ -0,0 +1,322 @@
+# predictions.py
+import json
+import os
+import sys
+
+OUTPUT_COLUMNS = ["original_text", "cleaned_text", "label", "score", "timestamp"]
+
+# csv: one text file; parquet: directory of parts, one row group per chunk
+# (needs pyarrow); npy: directory of raw float32 scores and uint8 label codes
+FORMATS = ("csv", "parquet", "npy")
+
+def infer_format(path):
+    """Output format implied by the output path's extension"""
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".npy"):
+        return "npy"
+    return "csv"
+
+def _fsync_dir(path):
+    # Make renames in the directory durable before the checkpoint points at them
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class CsvOutput:
+    """Predictions appended to a single CSV file"""
+
+    format = "csv"
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def resume(self, manifest):
+        """Drop anything appended after the last checkpoint (e.g. a crash mid-write)"""
+        committed_bytes = manifest.get("output_bytes", 0)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > committed_bytes:
+            with open(self.path, "r+b") as f:
+                f.truncate(committed_bytes)
+            print(f"✂️ Trimmed uncommitted rows from {self.path}")
+
+    def adopt(self, manifest):
+        """Count an existing file written before checkpoints existed"""
+        import pandas as pd
+        labels = pd.read_csv(self.path, usecols=["label"])["label"]
+        manifest["rows"] = len(labels)
+        manifest["output_bytes"] = os.path.getsize(self.path)
+        manifest["label_counts"] = {str(k): int(v) for k, v in labels.value_counts().items()}
+
+    def append(self, rows, manifest):
+        import pandas as pd
+        if self._file is None:
+            self._file = open(self.path, "a", newline="", encoding="utf-8")
+        # Header only for a brand new file
+        pd.DataFrame(rows, columns=OUTPUT_COLUMNS).to_csv(self._file, header=manifest.get("output_bytes", 0) == 0, index=False)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        manifest["output_bytes"] = os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class ParquetOutput:
+    """
+    Predictions as a directory of Parquet parts
+
+    Every committed chunk becomes one part file holding one row group, so
+    resuming never rewrites data: parts past the checkpoint are deleted.
+    Labels are dictionary encoded, scores are float32 and timestamps are
+    stored as timestamps rather than ISO strings.
+    """
+
+    format = "parquet"
+
+    def __init__(self, path):
+        self.path = path
+
+    def _part(self, index):
+        return os.path.join(self.path, f"part-{index:05d}.parquet")
+
+    def _parts(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if name.startswith("part-") and name.endswith(".parquet"))
+
+    def exists(self):
+        return bool(self._parts())
+
+    def remove(self):
+        for name in self._parts():
+            os.remove(os.path.join(self.path, name))
+
+    def resume(self, manifest):
+        os.makedirs(self.path, exist_ok=True)
+        committed = manifest.get("parts", 0)
+        # A crash between writing a part and renaming it leaves its .tmp behind
+        stale = [name for name in os.listdir(self.path) if name.startswith("part-") and name.endswith(".tmp")]
+        stale += [name for name in self._parts() if int(name[5:10]) >= committed]
+        for name in stale:
+            os.remove(os.path.join(self.path, name))
+        if stale:
+            print(f"✂️ Removed {len(stale)} uncommitted parts from {self.path}")
+
+    def adopt(self, manifest):
+        """Count existing parts from their footers, no column data is read"""
+        import pyarrow.parquet as pq
+        parts = self._parts()
+        manifest["rows"] = sum(pq.read_metadata(os.path.join(self.path, name)).num_rows for name in parts)
+        manifest["parts"] = len(parts)
+        manifest["label_counts"] = summarize(self.path, self.format)["label_counts"]
+
+    def append(self, rows, manifest):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from datetime import datetime
+
+        os.makedirs(self.path, exist_ok=True)
+        table = pa.table({
+            "original_text": pa.array([row["original_text"] for row in rows], pa.string()),
+            "cleaned_text": pa.array([row["cleaned_text"] for row in rows], pa.string()),
+            "label": pa.array([row["label"] for row in rows], pa.string()).dictionary_encode(),
+            "score": pa.array([row["score"] for row in rows], pa.float32()),
+            "timestamp": pa.array([datetime.fromisoformat(row["timestamp"]) if row["timestamp"] else None for row in rows], pa.timestamp("us")),
+        })
+
+        index = manifest.get("parts", 0)
+        path = self._part(index)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, row_group_size=len(rows) or 1)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(self.path)
+        manifest["parts"] = index + 1
+
+    def close(self):
+        pass
+
+class NpyOutput:
+    """
+    Predictions as memory-mappable NumPy columns
+
+    scores.f32 holds raw little-endian float32 scores and labels.u8 one
+    uint8 code per row, both row-aligned with the input CSV; label names
+    live in labels.json. Texts aren't stored, join with the input by row.
+    """
+
+    format = "npy"
+
+    def __init__(self, path):
+        self.path = path
+        self.scores_path = os.path.join(path, "scores.f32")
+        self.labels_path = os.path.join(path, "labels.u8")
+        self.names_path = os.path.join(path, "labels.json")
+
+    def exists(self):
+        return os.path.exists(self.scores_path)
+
+    def remove(self):
+        for path in (self.scores_path, self.labels_path, self.names_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def resume(self, manifest):
+        os.makedirs(self.path, exist_ok=True)
+        rows = manifest.get("rows", 0)
+        trimmed = False
+        for path, width in ((self.scores_path, 4), (self.labels_path, 1)):
+            if os.path.exists(path) and os.path.getsize(path) > rows * width:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * width)
+                trimmed = True
+        if trimmed:
+            print(f"✂️ Trimmed uncommitted rows from {self.path}")
+
+    def adopt(self, manifest):
+        rows = min(os.path.getsize(self.scores_path) // 4, os.path.getsize(self.labels_path))
+        manifest["rows"] = rows
+        self.resume(manifest)
+        manifest["label_names"] = _read_names(self.path)
+        manifest["label_counts"] = summarize(self.path, self.format)["label_counts"]
+
+    def append(self, rows, manifest):
+        import numpy as np
+
+        os.makedirs(self.path, exist_ok=True)
+        names = manifest.setdefault("label_names", [])
+        codes = {name: i for i, name in enumerate(names)}
+        for row in rows:
+            if row["label"] not in codes:
+                if len(names) >= 255:
+                    raise ValueError("npy output supports at most 255 distinct labels")
+                codes[row["label"]] = len(names)
+                names.append(row["label"])
+
+        with open(self.names_path + ".tmp", "w") as f:
+            json.dump(names, f)
+        os.replace(self.names_path + ".tmp", self.names_path)
+
+        columns = (
+            (self.scores_path, np.asarray([row["score"] for row in rows], dtype="<f4")),
+            (self.labels_path, np.asarray([codes[row["label"]] for row in rows], dtype=np.uint8)),
+        )
+        for path, values in columns:
+            with open(path, "ab") as f:
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+OUTPUTS = {"csv": CsvOutput, "parquet": ParquetOutput, "npy": NpyOutput}
+
+def make_output(path, fmt=None):
+    """
+    Writer for the given format
+
+    Args:
+        path (str): Output file (csv) or directory (parquet, npy)
+        fmt (str): One of FORMATS, inferred from the extension if omitted
+    """
+    fmt = fmt or infer_format(path)
+    if fmt not in OUTPUTS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {', '.join(FORMATS)}")
+    return OUTPUTS[fmt](path)
+
+def _read_names(path):
+    with open(os.path.join(path, "labels.json")) as f:
+        return json.load(f)
+
+def read_columns(path, fmt=None):
+    """
+    Load only the label and score columns, without parsing any text
+
+    npy columns are memory-mapped (zero-copy). Parquet columns are read
+    with memory mapping; parts are concatenated into one array.
+
+    Returns: (labels, scores) where labels is a pandas Categorical and
+        scores a float32 numpy array
+    """
+    import numpy as np
+    import pandas as pd
+
+    fmt = fmt or infer_format(path)
+    if fmt == "npy":
+        names = _read_names(path)
+        rows = min(os.path.getsize(os.path.join(path, "scores.f32")) // 4, os.path.getsize(os.path.join(path, "labels.u8")))
+        if not rows:
+            return pd.Categorical.from_codes([], names), np.empty(0, dtype=np.float32)
+        scores = np.memmap(os.path.join(path, "scores.f32"), dtype="<f4", mode="r", shape=(rows,))
+        codes = np.memmap(os.path.join(path, "labels.u8"), dtype=np.uint8, mode="r", shape=(rows,))
+        return pd.Categorical.from_codes(codes, names), scores
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        # Only committed parts, never a .tmp left by a crash
+        parts = [os.path.join(path, name) for name in ParquetOutput(path)._parts()]
+        if not parts:
+            return pd.Categorical([]), np.empty(0, dtype=np.float32)
+        table = pq.read_table(parts, columns=["label", "score"], memory_map=True)
+        labels = table.column("label").to_pandas()
+        return pd.Categorical(labels), table.column("score").to_numpy()
+
+    # CSV has no column index, only the two columns are parsed
+    df = pd.read_csv(path, usecols=["label", "score"], dtype={"label": "category", "score": np.float32})
+    return df["label"].values, df["score"].to_numpy()
+
+def summarize(path, fmt=None):
+    """
+    Label counts and score statistics of a predictions output
+    Returns: dict with "rows", "label_counts" and "score" (mean, p50, p95)
+    """
+    import numpy as np
+
+    fmt = fmt or infer_format(path)
+    if fmt == "npy":
+        names = _read_names(path)
+        labels, scores = read_columns(path, fmt)
+        counts = np.bincount(np.asarray(labels.codes, dtype=np.int64), minlength=len(names))
+        label_counts = {name: int(count) for name, count in zip(names, counts) if count}
+    else:
+        labels, scores = read_columns(path, fmt)
+        label_counts = {str(k): int(v) for k, v in labels.value_counts().items() if v}
+
+    return {
+        "rows": int(len(scores)),
+        "label_counts": label_counts,
+        "score": {
+            "mean": float(np.mean(scores)) if len(scores) else 0.0,
+            "p50": float(np.percentile(scores, 50)) if len(scores) else 0.0,
+            "p95": float(np.percentile(scores, 95)) if len(scores) else 0.0,
+        },
+    }
+
+def main():
+    """Print label counts and score stats of a predictions file or directory"""
+    if len(sys.argv) < 2:
+        print("Usage: python predictions.py <predictions.csv|.parquet|.npy> [format]")
+        sys.exit(1)
+    summary = summarize(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 import pandas as pd
+import argparse
 import os
 import sys
+import tempfile
+import time
+from collections import deque
 from pathlib import Path
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from model import clean_text
-    print("✅ Model imported successfully")
+    from textcleaner import clean_text
+    from workerpool import WorkerPool
+    print("✅ Text cleaner imported successfully")
 except ImportError as e:
-    print(f"❌ Error importing model: {e}")
+    print(f"❌ Error importing text cleaner: {e}")
     sys.exit(1)
 
 def preprocess_dataset(csv_path="train.csv", output_path="processed_dataset.csv", text_column="comment_text"):
@@ -77,22 +82,215 @@ def preprocess_dataset(csv_path="train.csv", output_path="processed_dataset.csv"
         print(f"❌ Error processing dataset: {e}")
         return False
 
+def _clean_texts(texts):
+    # Runs inside a pool worker
+    return [clean_text(str(x)) for x in texts]
+
+def _clean_chunks(chunks, text_column, workers):
+    """
+    Yield (chunk, cleaned texts) for every chunk, in input order
+
+    Only the text column is sent to the workers; the rest of each chunk
+    waits in the parent. At most a few chunks per worker are in flight.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, _clean_texts(chunk[text_column].tolist())
+        return
+
+    pending = deque()
+
+    def payloads():
+        for chunk in chunks:
+            pending.append(chunk)
+            yield chunk[text_column].tolist()
+
+    # Build the cleaner before forking so workers share the NLTK data
+    clean_text("warm up the text cleaner")
+    with WorkerPool(_clean_texts, workers, pin_threads=False) as pool:
+        for cleaned in pool.imap(payloads()):
+            yield pending.popleft(), cleaned
+
+def preprocess_dataset_chunked(csv_path="train.csv", output_path="processed_dataset.csv", text_column="comment_text", chunk_size=10000, workers=None):
+    """
+    Preprocess a dataset without loading it into memory
+
+    Produces the same rows and statistics as preprocess_dataset, but reads
+    chunk_size rows at a time, cleans them in worker processes and appends
+    each chunk to the output as soon as it is done. Columns are read as
+    strings (no per-chunk type inference) with pandas' default missing
+    value markers, so "NA" or "null" texts are dropped like in memory.
+
+    Args:
+        csv_path (str): Path to input CSV file
+        output_path (str): Path to save processed CSV
+        text_column (str): Name of the column containing text data
+        chunk_size (int): Rows read, cleaned and written per step
+        workers (int): Cleaning processes, defaults to the number of cores
+    """
+    if not os.path.exists(csv_path):
+        print(f"❌ Error: File '{csv_path}' not found")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+
+    try:
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        if text_column not in columns:
+            print(f"❌ Error: Column '{text_column}' not found in CSV")
+            print(f"Available columns: {columns}")
+            return False
+
+        print(f"📂 Streaming dataset from {csv_path} ({chunk_size} rows per chunk, {workers} workers)...")
+        reader = pd.read_csv(csv_path, chunksize=chunk_size, dtype=str)
+
+        initial_count = 0
+        missing_count = 0
+        final_count = 0
+        original_chars = 0
+        cleaned_chars = 0
+        header = True
+
+        def dropped_missing(chunks):
+            nonlocal initial_count, missing_count
+            for chunk in chunks:
+                initial_count += len(chunk)
+                kept = chunk.dropna(subset=[text_column])
+                missing_count += len(chunk) - len(kept)
+                if len(kept):
+                    yield kept
+
+        print("🧹 Cleaning text data...")
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            for chunk, cleaned in _clean_chunks(dropped_missing(reader), text_column, workers):
+                chunk = chunk.assign(cleaned_text=cleaned)
+                chunk = chunk[chunk['cleaned_text'].str.len() > 0]
+                chunk = chunk.assign(
+                    original_length=chunk[text_column].str.len(),
+                    cleaned_length=chunk['cleaned_text'].str.len()
+                )
+
+                chunk.to_csv(out, header=header, index=False)
+                header = False
+
+                final_count += len(chunk)
+                original_chars += int(chunk['original_length'].sum())
+                cleaned_chars += int(chunk['cleaned_length'].sum())
+                print(f"✅ {initial_count} rows read, {final_count} kept")
+
+            if header:
+                # Nothing survived cleaning, still write the header like the in-memory mode
+                pd.DataFrame(columns=columns + ['cleaned_text', 'original_length', 'cleaned_length']).to_csv(out, index=False)
+
+        if missing_count:
+            print(f"⚠️ Removed {missing_count} rows with missing text")
+        print(f"✅ Processed {final_count} rows with valid cleaned text")
+        print(f"💾 Saved processed dataset to {output_path}")
+
+        print("\n📊 Processing Statistics:")
+        print(f"   Original rows: {initial_count}")
+        print(f"   Final rows: {final_count}")
+        print(f"   Average original length: {original_chars / final_count if final_count else float('nan'):.1f} characters")
+        print(f"   Average cleaned length: {cleaned_chars / final_count if final_count else float('nan'):.1f} characters")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Error processing dataset: {e}")
+        return False
+
+# Texts pandas reads as missing, plus blank and punctuation-only ones
+PARITY_EDGE_CASES = ["null", "None", "NA", "N/A", "nan", "", "   ", "!!!", "0", "Keep this comment", "NULL values are fine here"]
+
+def _run_modes(csv_path, tmp, text_column, chunk_size, workers):
+    """Run every mode on csv_path; returns ({mode: output path}, {mode: seconds}) or None on failure"""
+    runs = [
+        ("in-memory", lambda path: preprocess_dataset(csv_path, path, text_column)),
+        ("chunked x1", lambda path: preprocess_dataset_chunked(csv_path, path, text_column, chunk_size, 1)),
+    ]
+    if workers > 1:
+        runs.append((f"chunked x{workers}", lambda path: preprocess_dataset_chunked(csv_path, path, text_column, chunk_size, workers)))
+
+    outputs = {}
+    timings = {}
+    for name, run in runs:
+        path = os.path.join(tmp, name.replace(" ", "_") + ".csv")
+        start = time.perf_counter()
+        if not run(path):
+            print(f"❌ {name} failed")
+            return None
+        timings[name] = time.perf_counter() - start
+        outputs[name] = path
+    return outputs, timings
+
+def _outputs_match(outputs, label):
+    # Compare parsed values, the in-memory mode reformats numbers it inferred
+    reference = pd.read_csv(outputs["in-memory"])
+    matches = True
+    for name, path in outputs.items():
+        if name == "in-memory":
+            continue
+        try:
+            pd.testing.assert_frame_equal(reference, pd.read_csv(path), check_dtype=False)
+            print(f"✅ {name} matches the in-memory output on {label} ({len(reference)} rows)")
+        except AssertionError as e:
+            print(f"❌ {name} differs from the in-memory output on {label}: {e}")
+            matches = False
+    return matches
+
+def compare_modes(csv_path, text_column="comment_text", chunk_size=10000, workers=None):
+    """
+    Run the in-memory and streaming modes on the same input
+
+    Checks that both produce the same rows, on the input and on a small
+    file of missing-looking texts ("null", "NA", blanks), and reports the
+    speedup on the input.
+    Returns: True if the outputs match
+    """
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        edge_path = os.path.join(tmp, "edge_cases.csv")
+        pd.DataFrame({"id": range(len(PARITY_EDGE_CASES)), text_column: PARITY_EDGE_CASES}).to_csv(edge_path, index=False)
+        edge_dir = os.path.join(tmp, "edge")
+        os.makedirs(edge_dir)
+        result = _run_modes(edge_path, edge_dir, text_column, 2, workers)
+        if result is None:
+            return False
+        matches = _outputs_match(result[0], "edge cases")
+
+        result = _run_modes(csv_path, tmp, text_column, chunk_size, workers)
+        if result is None:
+            return False
+        outputs, timings = result
+        matches = _outputs_match(outputs, csv_path) and matches
+
+    base = timings["in-memory"]
+    print("\n⏱️ Speedup:")
+    for name, seconds in timings.items():
+        print(f"   {name}: {seconds:.2f}s ({base / seconds if seconds else 0.0:.2f}x)")
+    return matches
+
 def main():
     """Main function for preprocessing"""
+    parser = argparse.ArgumentParser(description="Clean the text column of a dataset")
+    parser.add_argument("input_file", nargs="?", default="train.csv")
+    parser.add_argument("output_file", nargs="?", default="processed_dataset.csv")
+    parser.add_argument("--text-column", default="comment_text")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per chunk in streaming mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="cleaning processes")
+    parser.add_argument("--in-memory", action="store_true", help="load the whole file and clean on one core")
+    parser.add_argument("--compare", action="store_true", help="check streaming output against --in-memory and report the speedup")
+    args = parser.parse_args()
+    
     print("🔄 Starting dataset preprocessing...")
     print("="*50)
     
-    # Default file paths
-    input_file = "train.csv"
-    output_file = "processed_dataset.csv"
-    
-    # Check if custom paths are provided via command line
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    
-    success = preprocess_dataset(input_file, output_file)
+    if args.compare:
+        success = compare_modes(args.input_file, args.text_column, args.chunk_size, args.workers)
+    elif args.in_memory:
+        success = preprocess_dataset(args.input_file, args.output_file, args.text_column)
+    else:
+        success = preprocess_dataset_chunked(args.input_file, args.output_file, args.text_column, args.chunk_size, args.workers)
     
     if success:
         print("\n✅ Preprocessing completed successfully!")
@@ -101,4 +299,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
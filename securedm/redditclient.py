@@ -0,0 +1,195 @@
+# redditclient.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    from .metrics import observe, inc
+except ImportError:
+    from metrics import observe, inc
+
+# Reddit credentials
+REDDIT_CONFIG = {
+    "client_id": os.getenv("REDDIT_CLIENT_ID", "8GP0nJUPDOfiht-FUS7Cig"),
+    "client_secret": os.getenv("REDDIT_CLIENT_SECRET", "6wzYEv5IZJFTJjh-o3iW5mRZ-GT-gw"),
+    "user_agent": "ToxicityAnalyzer/1.0"
+}
+
+# HTTP connections kept open per host by the shared session
+POOL_SIZE = int(os.getenv("REDDIT_POOL_SIZE", "16"))
+
+_client_lock = threading.Lock()
+_clients = {}
+_override = None
+
+# Listing fetches run here so comments and submissions download concurrently
+_fetch_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="reddit-fetch")
+
+def get_reddit(user_agent=None):
+    """
+    Return the process-wide read-only Reddit client
+
+    The client is created once per user agent and reuses a pooled HTTP
+    session, so requests share keep-alive connections instead of doing a
+    new TLS handshake per request.
+
+    Args:
+        user_agent (str): Overrides the default user agent
+    """
+    if _override is not None:
+        return _override
+
+    config = dict(REDDIT_CONFIG)
+    if user_agent:
+        config["user_agent"] = user_agent
+
+    key = (config["client_id"], config["user_agent"], os.getpid())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            import praw
+            client = praw.Reddit(**config, requestor_kwargs={"session": _pooled_session()})
+            _clients[key] = client
+        return client
+
+def _pooled_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_user_reddit(user_agent=None):
+    """
+    Return a Reddit client logged in as the bot account
+
+    Needed for the inbox, which the read-only client can't see. Uses
+    REDDIT_USERNAME and REDDIT_PASSWORD on top of the app credentials.
+
+    Returns: praw.Reddit, or the client passed to set_reddit
+    """
+    if _override is not None:
+        return _override
+
+    username = os.getenv("REDDIT_USERNAME")
+    password = os.getenv("REDDIT_PASSWORD")
+    if not username or not password:
+        raise RuntimeError("REDDIT_USERNAME and REDDIT_PASSWORD must be set to read the inbox")
+
+    import praw
+    config = dict(REDDIT_CONFIG)
+    if user_agent:
+        config["user_agent"] = user_agent
+    return praw.Reddit(**config, username=username, password=password, requestor_kwargs={"session": _pooled_session()})
+
+def set_reddit(client):
+    """
+    Make get_reddit return the given client, e.g. a FakeReddit in tests
+
+    Args:
+        client: Object with the praw.Reddit interface, or None to restore praw
+    """
+    global _override
+    _override = client
+
+def _comment_item(comment):
+    if not comment.body or comment.body == "[deleted]":
+        return None
+    return comment.body, {
+        'type': 'comment',
+        'id': comment.fullname,
+        'content': comment.body[:100] + "..." if len(comment.body) > 100 else comment.body,
+        'subreddit': str(comment.subreddit),
+        'created': datetime.fromtimestamp(comment.created_utc)
+    }
+
+def _submission_item(submission):
+    content = submission.title
+    if submission.selftext:
+        content += " " + submission.selftext
+    return content, {
+        'type': 'submission',
+        'id': submission.fullname,
+        'content': content[:100] + "..." if len(content) > 100 else content,
+        'subreddit': str(submission.subreddit),
+        'created': datetime.fromtimestamp(submission.created_utc)
+    }
+
+def _fetch_listing(listing, to_item, source, page_size, pages, params):
+    # Push pages of (text, detail) pairs as the listing yields them
+    started = time.perf_counter()
+    try:
+        page = []
+        for thing in listing(params=params):
+            item = to_item(thing)
+            if item is None:
+                continue
+            page.append(item)
+            if len(page) >= page_size:
+                pages.put((source, page, None))
+                page = []
+        if page:
+            pages.put((source, page, None))
+    except Exception as e:
+        inc("securedm_errors_total", stage="reddit_fetch")
+        pages.put((source, None, e))
+    finally:
+        observe("securedm_stage_seconds", time.perf_counter() - started, stage="reddit_fetch")
+        pages.put((source, None, None))
+
+def fetch_user_pages(reddit, username, max_posts=10, include_submissions=True, page_size=25, params=None, before=None):
+    """
+    Fetch a user's recent comments and submissions concurrently
+
+    Yields pages of items as soon as they arrive from either listing, so
+    callers can classify the first page while later pages are still
+    downloading.
+
+    Args:
+        reddit: praw.Reddit (or compatible) client
+        username (str): Reddit username
+        max_posts (int): Items fetched per listing
+        include_submissions (bool): Also fetch submissions
+        page_size (int): Items per yielded page
+        params (dict): Extra listing parameters for both listings
+        before (dict): Per-listing watermark, e.g. {"comments": "t1_abc"};
+            only items newer than the watermark are fetched
+
+    Yields: (source, [(text, detail), ...]) where source is "comments" or "submissions"
+    """
+    user = reddit.redditor(username)
+    pages = queue.Queue()
+
+    listings = [("comments", lambda params: user.comments.new(limit=max_posts, params=params), _comment_item)]
+    if include_submissions:
+        listings.append(("submissions", lambda params: user.submissions.new(limit=max_posts, params=params), _submission_item))
+
+    for source, listing, to_item in listings:
+        listing_params = dict(params or {})
+        if before and before.get(source):
+            listing_params["before"] = before[source]
+        _fetch_pool.submit(_fetch_listing, listing, to_item, source, page_size, pages, listing_params)
+
+    running = len(listings)
+    error = None
+    while running:
+        source, page, exc = pages.get()
+        if page is not None:
+            yield source, page
+        elif exc is not None:
+            error = exc
+        else:
+            running -= 1
+
+    if error is not None:
+        raise error
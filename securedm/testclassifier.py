@@ -1,6 +1,10 @@
 import pandas as pd
+import argparse
+import io
+import json
 import os
 import sys
+from collections import deque
 from datetime import datetime
 import time
 
@@ -8,21 +12,328 @@ import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from model import toxic_model, clean_text, classify_dm
+    from model import warmup, clean_text, classify_cleaned, cache_stats, set_max_length
+    from workerpool import WorkerPool
+    from predictions import OUTPUT_COLUMNS, FORMATS, make_output
+    from dedup import Deduplicator, dedup_report
+    from tokenstore import open_token_store, TokenStore
     print("✅ Model imported successfully")
 except ImportError as e:
     print(f"❌ Error importing model: {e}")
     sys.exit(1)
 
-def test_classifier(csv_path="train.csv", output_path="predictions.csv", batch_size=32, text_column="comment_text"):
+def manifest_path_for(output_path):
+    return output_path + ".manifest.json"
+
+def load_manifest(output_path):
+    """
+    Read the checkpoint written next to the predictions file
+    Returns: dict, or None if there is no usable checkpoint
+    """
+    path = manifest_path_for(output_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error reading checkpoint {path}: {e}")
+        return None
+
+def save_manifest(output_path, manifest):
+    """Atomically replace the checkpoint so a crash never leaves it half written"""
+    path = manifest_path_for(output_path)
+    tmp_path = path + ".tmp"
+    manifest["updated"] = datetime.now().isoformat()
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def resume_state(csv_path, output_path, text_column, output=None):
+    """
+    Work out where a previous run stopped
+    
+    Only the checkpoint is read; the output is trimmed back to it without
+    reading any predictions.
+    
+    Returns: manifest dict with the committed row offset and output size
+    """
+    output = output or make_output(output_path)
+    manifest = load_manifest(output_path)
+    
+    if (manifest and manifest.get("input") == os.path.abspath(csv_path) and manifest.get("text_column") == text_column
+            and manifest.get("format", "csv") == output.format):
+        output.resume(manifest)
+        return manifest
+    
+    if manifest:
+        # Checkpoint belongs to a different input or format, its rows don't line up with ours
+        print(f"⚠️ Existing predictions in {output_path} were made from {manifest.get('input')} ({manifest.get('format', 'csv')})")
+        print("🆕 Starting fresh...")
+        os.remove(manifest_path_for(output_path))
+        output.remove()
+    
+    manifest = {
+        "input": os.path.abspath(csv_path),
+        "text_column": text_column,
+        "format": output.format,
+        "rows": 0,
+        "input_offset": 0,
+        "output_bytes": 0,
+        "label_counts": {},
+    }
+    
+    if output.exists():
+        # Predictions from before checkpoints existed: count them once
+        try:
+            output.adopt(manifest)
+            save_manifest(output_path, manifest)
+        except Exception as e:
+            # Never delete predictions we couldn't read, they may be hours of work
+            raise RuntimeError(f"Could not read existing predictions in {output_path} ({e}); "
+                               f"move them aside to start fresh") from e
+    
+    output.resume(manifest)
+    return manifest
+
+def score_rows(original_texts, batch_size, dedup=None, dedup_stats=None, token_store=None, first_row=0):
+    """
+    Clean and classify a chunk of input texts
+    
+    Args:
+        original_texts (list): Raw texts of the chunk
+        batch_size (int): Number of texts per model call
+        dedup (Deduplicator): Classify one text per duplicate group and
+            copy its prediction to the other members
+        dedup_stats (dict): Counters added to when dedup is used
+        token_store (TokenStore): Pre-cleaned, pre-tokenized input; texts
+            are read from it instead of being cleaned and tokenized
+        first_row (int): Input row of original_texts[0] in the token store
+    
+    Returns: list of output row dicts in input order
+    """
+    rows = []
+    to_classify = []
+    token_ids = [] if token_store is not None else None
+    
+    for offset, original_text in enumerate(original_texts):
+        try:
+            # Skip empty or invalid texts
+            if pd.isna(original_text) or not str(original_text).strip():
+                rows.append({
+                    "original_text": str(original_text) if not pd.isna(original_text) else "",
+                    "cleaned_text": "",
+                    "label": "EMPTY",
+                    "score": 0.0,
+                    "timestamp": datetime.now().isoformat()
+                })
+                continue
+            
+            # Clean text, classification happens below for the whole chunk
+            if token_store is not None:
+                cleaned_text = token_store.cleaned(first_row + offset)
+                token_ids.append(token_store.ids(first_row + offset))
+            else:
+                cleaned_text = clean_text(str(original_text))
+            
+            rows.append({
+                "original_text": str(original_text)[:500],  # Limit length for storage
+                "cleaned_text": cleaned_text[:500],
+                "label": "EMPTY",
+                "score": 0.0,
+                "timestamp": None
+            })
+            to_classify.append((len(rows) - 1, cleaned_text))
+            
+        except Exception as e:
+            print(f"⚠️ Error processing text: {e}")
+            rows.append({
+                "original_text": str(original_text)[:500] if not pd.isna(original_text) else "",
+                "cleaned_text": "",
+                "label": "ERROR",
+                "score": 0.0,
+                "timestamp": datetime.now().isoformat()
+            })
+    
+    cleaned_texts = [cleaned for _, cleaned in to_classify]
+    if dedup:
+        representatives, assignment, near_count = dedup.group(cleaned_texts)
+        to_model = [cleaned_texts[i] for i in representatives]
+        if token_ids is not None:
+            token_ids = [token_ids[i] for i in representatives]
+    else:
+        to_model = cleaned_texts
+    
+    # Bucket by token length so short comments aren't padded to a long submission
+    started = time.perf_counter()
+    predictions = classify_cleaned(to_model, batch_size=batch_size, empty_label="EMPTY", sort_by_length=True, token_ids=token_ids)
+    
+    if dedup:
+        # Every member row gets its group's prediction
+        predictions = [predictions[group] if group >= 0 else ("EMPTY", 0.0) for group in assignment]
+        if dedup_stats is not None:
+            for key, value in (("texts", sum(1 for group in assignment if group >= 0)), ("classified", len(representatives)),
+                               ("near", near_count), ("model_seconds", time.perf_counter() - started)):
+                dedup_stats[key] = dedup_stats.get(key, 0) + value
+    
+    for (row, _), (label, score) in zip(to_classify, predictions):
+        rows[row]["label"] = label
+        rows[row]["score"] = float(score)
+        rows[row]["timestamp"] = datetime.now().isoformat()
+    
+    return rows
+
+# Opened before the pool forks, so workers share the mapped files
+_token_store = None
+
+def _worker_token_store(path):
+    global _token_store
+    if path and (_token_store is None or _token_store.path != path):
+        # Spawned workers (no fork) open the store themselves
+        _token_store = TokenStore(path)
+    return _token_store if path else None
+
+def _score_payload(payload):
+    # Runs inside a pool worker, dedup stats travel back with the rows
+    original_texts, batch_size, dedup, store_path, first_row = payload
+    dedup_stats = {}
+    rows = score_rows(original_texts, batch_size, dedup, dedup_stats, _worker_token_store(store_path), first_row)
+    return rows, dedup_stats
+
+def _add_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+
+def _records(f, position):
+    # (record, byte offset just past it); a newline inside a quoted field
+    # doesn't end the record, quotes inside fields are doubled so parity holds
+    parts = []
+    quotes = 0
+    for line in iter(f.readline, b""):
+        position += len(line)
+        parts.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield b"".join(parts), position
+            parts, quotes = [], 0
+    if parts:
+        yield b"".join(parts), position
+
+def read_input(csv_path, text_column, chunk_size, offset=0, skip_rows=0):
+    """
+    Read the input CSV in chunks, with the byte offset after each chunk
+    
+    A resumed run seeks to the committed offset instead of parsing and
+    discarding every row before it.
+    
+    Args:
+        offset (int): Byte offset of the first record to read, 0 for the
+            first record after the header
+        skip_rows (int): Data rows to skip first, for checkpoints that have
+            no offset
+    
+    Yields: (DataFrame with text_column, byte offset just past the chunk)
+    """
+    with open(csv_path, "rb") as f:
+        header, position = next(_records(f, 0), (b"", 0))
+        columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+        if offset:
+            f.seek(offset)
+            position = offset
+        
+        def parse(batch):
+            return pd.read_csv(io.BytesIO(b"".join(batch)), header=None, names=columns, usecols=[text_column])
+        
+        batch = []
+        for record, position in _records(f, position):
+            if skip_rows:
+                # Blank lines aren't rows, the same as for read_csv
+                skip_rows -= bool(record.strip())
+                continue
+            batch.append(record)
+            if len(batch) == chunk_size:
+                yield parse(batch), position
+                batch = []
+        if batch:
+            yield parse(batch), position
+
+def _chunk_texts(reader, text_column, first_row):
+    # (input row of the first text, texts, input offset after them) per non-empty chunk
+    for chunk, offset in reader:
+        if not chunk.empty:
+            yield first_row, chunk[text_column].tolist(), offset
+        first_row += len(chunk)
+
+def score_chunks(reader, text_column, batch_size, workers=1, threads_per_worker=None, dedup=None, dedup_stats=None, token_store=None, first_row=0):
+    """
+    Score each chunk of the reader, across worker processes if workers > 1
+    
+    Duplicates are collapsed within each chunk; repeats across chunks are
+    served by the classification cache instead.
+    
+    Args:
+        reader: Iterable of (DataFrame, input offset), see read_input
+        token_store (TokenStore): Read cleaned texts and input ids from it
+        first_row (int): Input row the reader starts at (when resuming)
+    
+    Returns: generator of (rows, input offset after them), one per non-empty
+    chunk, in input order
+    """
+    global _token_store
+    texts = _chunk_texts(reader, text_column, first_row)
+    if dedup_stats is None:
+        dedup_stats = {}
+    if workers <= 1:
+        for chunk_row, chunk_texts, offset in texts:
+            yield score_rows(chunk_texts, batch_size, dedup, dedup_stats, token_store, chunk_row), offset
+        return
+    
+    # Workers fork from this process after warmup, sharing the loaded weights
+    # and the store's mappings; only its path goes into each payload
+    _token_store = token_store
+    store_path = token_store.path if token_store is not None else None
+    with WorkerPool(_score_payload, workers, threads_per_worker) as pool:
+        print(f"👷 Scoring with {pool.workers} workers x {pool.threads_per_worker} threads")
+        # Results come back in payload order, so offsets queue up alongside
+        offsets = deque()
+        
+        def payloads():
+            for chunk_row, chunk_texts, offset in texts:
+                offsets.append(offset)
+                yield chunk_texts, batch_size, dedup, store_path, chunk_row
+        
+        for rows, stats in pool.imap(payloads()):
+            _add_stats(dedup_stats, stats)
+            yield rows, offsets.popleft()
+
+def test_classifier(csv_path="train.csv", output_path="predictions.csv", batch_size=32, text_column="comment_text", chunk_size=1024, workers=1, threads_per_worker=None, output_format=None, dedup="exact", near_threshold=0.8, token_store=None):
     """
     Test the toxicity classifier on a dataset
     
+    The input is streamed in chunks and each chunk's predictions are appended
+    to the output, followed by a checkpoint (output_path + ".manifest.json")
+    recording the committed row count and input byte offset. Re-running with
+    the same paths seeks right past the last committed chunk.
+    
     Args:
         csv_path (str): Path to input CSV file
         output_path (str): Path to save predictions
         batch_size (int): Number of texts to process at once
         text_column (str): Name of column containing text data
+        chunk_size (int): Number of rows read and committed per step
+        workers (int): Worker processes scoring chunks in parallel; output
+            is still written and checkpointed in input order
+        threads_per_worker (int): Intra-op threads per worker process
+        output_format (str): "csv", "parquet" or "npy" (see predictions.py),
+            inferred from the output path if omitted
+        dedup (str): "off", "exact" (identical cleaned texts are classified
+            once) or "near" (MinHash near-duplicates too, see dedup.py)
+        near_threshold (float): Minimum estimated Jaccard similarity for "near"
+        token_store (str): Directory of a TokenStore for this input (see
+            tokenstore.py), built on first use; later runs skip cleaning
+            and tokenization
     """
     
     # Check if input file exists
@@ -31,111 +342,80 @@ def test_classifier(csv_path="train.csv", output_path="predictions.csv", batch_s
         return False
     
     try:
-        # Load dataset
-        print(f"📂 Loading dataset from {csv_path}...")
-        df = pd.read_csv(csv_path)
-        print(f"✅ Loaded {len(df)} rows")
-        
-        # Validate required column
-        if text_column not in df.columns:
+        # Validate required column without loading the dataset
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        if text_column not in columns:
             print(f"❌ Error: Column '{text_column}' not found")
-            print(f"Available columns: {list(df.columns)}")
+            print(f"Available columns: {columns}")
             return False
         
+        # Load the model once before timing any batches
+        if not warmup(batch_size):
+            print("⚠️ Model not available, predictions will be UNKNOWN")
+        
+        store = None
+        if token_store:
+            store = open_token_store(token_store, csv_path, text_column)
+            print(f"🧾 Reading cleaned, tokenized input from {token_store} ({len(store)} rows)")
+        
         # Handle resuming from previous run
-        start_index = 0
-        if os.path.exists(output_path):
-            try:
-                existing_df = pd.read_csv(output_path)
-                start_index = len(existing_df)
-                print(f"📄 Found existing predictions file with {start_index} rows")
-                print(f"🔄 Resuming from row {start_index}")
-                results_df = existing_df.copy()
-            except Exception as e:
-                print(f"⚠️ Error reading existing file: {e}")
-                print("🆕 Starting fresh...")
-                results_df = pd.DataFrame(columns=["original_text", "cleaned_text", "label", "score", "timestamp"])
-        else:
-            results_df = pd.DataFrame(columns=["original_text", "cleaned_text", "label", "score", "timestamp"])
-        
-        # Process in batches
-        total_rows = len(df)
-        processed_count = start_index
-        
-        print(f"🚀 Starting classification from row {start_index}/{total_rows}")
+        output = make_output(output_path, output_format)
+        manifest = resume_state(csv_path, output_path, text_column, output)
+        start_index = manifest["rows"]
+        if start_index:
+            print(f"📄 Found checkpoint with {start_index} committed rows")
+            print(f"🔄 Resuming from row {start_index}")
+        
+        print(f"🚀 Starting classification from row {start_index} of {csv_path}")
         print("="*50)
         
-        for batch_start in range(start_index, total_rows, batch_size):
-            batch_end = min(batch_start + batch_size, total_rows)
-            batch_texts = df[text_column].iloc[batch_start:batch_end].tolist()
-            
-            batch_results = []
-            
-            for i, original_text in enumerate(batch_texts):
-                try:
-                    # Skip empty or invalid texts
-                    if pd.isna(original_text) or not str(original_text).strip():
-                        batch_results.append({
-                            "original_text": str(original_text) if not pd.isna(original_text) else "",
-                            "cleaned_text": "",
-                            "label": "EMPTY",
-                            "score": 0.0,
-                            "timestamp": datetime.now().isoformat()
-                        })
-                        continue
-                    
-                    # Clean and classify text
-                    cleaned_text = clean_text(str(original_text))
-                    
-                    if not cleaned_text:
-                        label, score = "EMPTY", 0.0
-                    else:
-                        label, score = classify_dm(original_text)
-                    
-                    batch_results.append({
-                        "original_text": str(original_text)[:500],  # Limit length for storage
-                        "cleaned_text": cleaned_text[:500],
-                        "label": label,
-                        "score": float(score),
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    
-                except Exception as e:
-                    print(f"⚠️ Error processing text {batch_start + i}: {e}")
-                    batch_results.append({
-                        "original_text": str(original_text)[:500] if not pd.isna(original_text) else "",
-                        "cleaned_text": "",
-                        "label": "ERROR",
-                        "score": 0.0,
-                        "timestamp": datetime.now().isoformat()
-                    })
-            
-            # Add batch results to main dataframe
-            batch_df = pd.DataFrame(batch_results)
-            results_df = pd.concat([results_df, batch_df], ignore_index=True)
-            
-            # Save progress
-            results_df.to_csv(output_path, index=False)
-            
-            processed_count = batch_end
-            progress = (processed_count / total_rows) * 100
-            
-            print(f"✅ Processed batch {batch_start}-{batch_end-1} | Progress: {progress:.1f}% ({processed_count}/{total_rows})")
-            
-            # Small delay to prevent overwhelming the system
-            time.sleep(0.1)
+        # Checkpoints without an input offset (adopted outputs) skip rows instead
+        input_offset = manifest.get("input_offset", 0)
+        reader = read_input(csv_path, text_column, chunk_size, input_offset, 0 if input_offset else start_index)
+        
+        label_counts = manifest["label_counts"]
+        started = time.perf_counter()
+        processed_this_run = 0
+        deduplicator = Deduplicator(near=dedup == "near", threshold=near_threshold) if dedup != "off" else None
+        dedup_stats = {}
         
+        try:
+            for rows, input_offset in score_chunks(reader, text_column, batch_size, workers, threads_per_worker, deduplicator, dedup_stats, store, start_index):
+                # Append only the new rows, then move the checkpoint past them
+                output.append(rows, manifest)
+                
+                batch_start = manifest["rows"]
+                for row in rows:
+                    label_counts[row["label"]] = label_counts.get(row["label"], 0) + 1
+                manifest["rows"] += len(rows)
+                manifest["input_offset"] = input_offset
+                save_manifest(output_path, manifest)
+                
+                processed_this_run += len(rows)
+                rate = processed_this_run / max(time.perf_counter() - started, 1e-9)
+                print(f"✅ Processed rows {batch_start}-{manifest['rows']-1} | {rate:.1f} rows/s")
+        finally:
+            output.close()
+
         # Final statistics
         print("\n📊 Classification Results:")
         print("="*30)
         
-        label_counts = results_df['label'].value_counts()
-        for label, count in label_counts.items():
-            percentage = (count / len(results_df)) * 100
+        total = manifest["rows"]
+        for label, count in sorted(label_counts.items(), key=lambda item: -item[1]):
+            percentage = (count / total) * 100 if total else 0.0
             print(f"   {label}: {count} ({percentage:.1f}%)")
         
+        if deduplicator:
+            print(f"\n🧬 Dedup: {dedup_report(dedup_stats)}")
+        
+        stats = cache_stats()
+        # Workers keep their own in-memory counters, only this process is reported
+        if stats.get("enabled", True) and workers <= 1:
+            print(f"\n🗃️ Cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses ({stats['hit_rate'] * 100:.1f}% hit rate)")
+        
         print(f"\n💾 Final results saved to {output_path}")
-        print(f"✅ Successfully processed {len(results_df)} texts")
+        print(f"✅ Successfully processed {total} texts")
         
         return True
         
@@ -145,32 +425,49 @@ def test_classifier(csv_path="train.csv", output_path="predictions.csv", batch_s
 
 def main():
     """Main function for testing classifier"""
+    parser = argparse.ArgumentParser(description="Score a CSV dataset with the toxicity classifier")
+    parser.add_argument("input_file", nargs="?", default="train.csv")
+    parser.add_argument("output_file", nargs="?", default="predictions.csv")
+    parser.add_argument("batch_size", nargs="?", default="32")
+    parser.add_argument("--text-column", default="comment_text")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="rows read and committed per step")
+    parser.add_argument("--max-length", type=int, help="token cap per text, e.g. 128 for comment-only data")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SECUREDM_WORKERS", "1")), help="scoring processes")
+    parser.add_argument("--threads-per-worker", type=int, help="intra-op threads per worker, default cores / workers")
+    parser.add_argument("--format", choices=FORMATS, help="output format, default from the output extension (.parquet, .npy)")
+    parser.add_argument("--dedup", choices=("off", "exact", "near"), default=os.getenv("SECUREDM_DEDUP", "exact"),
+                        help="classify duplicate texts once per chunk; near also groups MinHash near-duplicates")
+    parser.add_argument("--near-threshold", type=float, default=0.8, help="minimum Jaccard similarity for --dedup near")
+    parser.add_argument("--token-store", help="pre-tokenized copy of the input (built on first use) so repeat runs skip cleaning and tokenization")
+    args = parser.parse_args()
+    
     print("🧪 Starting toxicity classifier testing...")
     print("="*50)
     
-    # Default parameters
-    input_file = "train.csv"
-    output_file = "predictions.csv"
-    batch_size = 32
-    
-    # Parse command line arguments
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    if len(sys.argv) > 3:
-        try:
-            batch_size = int(sys.argv[3])
-        except ValueError:
-            print("⚠️ Invalid batch size, using default: 32")
+    try:
+        batch_size = int(args.batch_size)
+    except ValueError:
+        print("⚠️ Invalid batch size, using default: 32")
+        batch_size = 32
+    
+    if args.max_length:
+        set_max_length(args.max_length)
     
     print(f"📋 Configuration:")
-    print(f"   Input file: {input_file}")
-    print(f"   Output file: {output_file}")
+    print(f"   Input file: {args.input_file}")
+    print(f"   Output file: {args.output_file}")
     print(f"   Batch size: {batch_size}")
+    if args.max_length:
+        print(f"   Max length: {args.max_length} tokens")
+    if args.workers > 1:
+        print(f"   Workers: {args.workers}")
+    print(f"   Dedup: {args.dedup}")
     print()
     
-    success = test_classifier(input_file, output_file, batch_size)
+    success = test_classifier(
+        args.input_file, args.output_file, batch_size, args.text_column, args.chunk_size,
+        args.workers, args.threads_per_worker, args.format, args.dedup, args.near_threshold, args.token_store
+    )
     
     if success:
         print("\n🎉 Testing completed successfully!")
@@ -179,4 +476,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
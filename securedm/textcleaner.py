@@ -0,0 +1,206 @@
+# textcleaner.py
+import re
+import sys
+import time
+import threading
+from functools import lru_cache
+
+# NLTK is only imported when the first text is cleaned
+_resources_lock = threading.Lock()
+_cleaner_lock = threading.Lock()
+_default_cleaner = None
+
+URL_RE = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+MENTION_RE = re.compile(r'@\w+|#\w+')
+PUNCT_RE = re.compile(r'[^\w\s]')
+TOKEN_RE = re.compile(r'\S+')
+
+# Splits nltk.word_tokenize applies to punctuation-free text
+CONTRACTIONS = {
+    "cannot": ("can", "not"),
+    "gimme": ("gim", "me"),
+    "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"),
+    "lemme": ("lem", "me"),
+    "wanna": ("wan", "na"),
+}
+
+def ensure_nltk_resource(path, name):
+    """Download an NLTK resource if it is not installed yet"""
+    import nltk
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        nltk.download(name)
+
+class TextCleaner:
+    """
+    Text preprocessing engine with all state built once
+
+    Produces the same output as the original nltk based clean_text, but
+    keeps stopwords, the lemmatizer and compiled regexes around and
+    memoizes lemmas in a bounded LRU table.
+    """
+
+    def __init__(self, lemma_cache_size=100000):
+        try:
+            with _resources_lock:
+                ensure_nltk_resource('corpora/stopwords', 'stopwords')
+                ensure_nltk_resource('corpora/wordnet', 'wordnet')
+
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+
+            self.stop_words = frozenset(stopwords.words('english'))
+            self.lemmatizer = WordNetLemmatizer()
+            self.lemmatize = lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+        except Exception as e:
+            # No NLTK data (offline, no download): keep cleaning with the regex
+            # tokenizer alone, without stopword removal or lemmatization
+            print(f"⚠️ NLTK data unavailable ({type(e).__name__}), cleaning without stopwords and lemmas", file=sys.stderr)
+            self.stop_words = frozenset()
+            self.lemmatizer = None
+            self.lemmatize = lambda word: word
+
+    def tokenize(self, text):
+        """Split punctuation-free text the way nltk.word_tokenize would"""
+        words = []
+        for token in TOKEN_RE.findall(text):
+            parts = CONTRACTIONS.get(token)
+            if parts:
+                words.extend(parts)
+            else:
+                words.append(token)
+        return words
+
+    def clean(self, text):
+        """Clean a single text"""
+        if not text or not isinstance(text, str):
+            return ""
+
+        # Remove URLs, mentions, and special characters
+        text = URL_RE.sub('', text)
+        text = MENTION_RE.sub('', text)
+        text = PUNCT_RE.sub('', text)
+
+        # Lowercase
+        text = text.lower().strip()
+
+        if not text:
+            return ""
+
+        try:
+            stop_words = self.stop_words
+            lemmatize = self.lemmatize
+            words = [
+                lemmatize(w) for w in self.tokenize(text)
+                if w.isalnum() and w not in stop_words and len(w) > 2
+            ]
+            return " ".join(words)
+        except Exception as e:
+            print(f"Error processing text: {e}")
+            return text
+
+    def clean_many(self, texts):
+        """
+        Clean an iterable of texts
+
+        Returns: list of cleaned texts in input order
+        """
+        clean = self.clean
+        return [clean(text) for text in texts]
+
+def get_cleaner():
+    """Return the process-wide TextCleaner, creating it on first use"""
+    global _default_cleaner
+    if _default_cleaner is None:
+        with _cleaner_lock:
+            if _default_cleaner is None:
+                _default_cleaner = TextCleaner()
+    return _default_cleaner
+
+def clean_text(text):
+    return get_cleaner().clean(text)
+
+def clean_many(texts):
+    return get_cleaner().clean_many(texts)
+
+def reference_clean_text(text):
+    """The original per-call nltk implementation, kept for parity checks"""
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    if not text or not isinstance(text, str):
+        return ""
+
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'@\w+|#\w+', '', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    text = text.lower().strip()
+
+    if not text:
+        return ""
+
+    try:
+        words = nltk.word_tokenize(text)
+        stop_words = set(stopwords.words('english'))
+        words = [w for w in words if w.isalnum() and w not in stop_words and len(w) > 2]
+        lemmatizer = WordNetLemmatizer()
+        words = [lemmatizer.lemmatize(w) for w in words]
+        return " ".join(words)
+    except Exception as e:
+        print(f"Error processing text: {e}")
+        return text
+
+def check_parity(texts):
+    """
+    Compare TextCleaner output with the original implementation
+
+    Args:
+        texts (list): Texts to compare
+
+    Returns: (mismatches, reference_seconds, engine_seconds)
+    """
+    ensure_nltk_resource('tokenizers/punkt', 'punkt')
+    # NLTK 3.8.2 and later tokenize with punkt_tab instead
+    ensure_nltk_resource('tokenizers/punkt_tab', 'punkt_tab')
+
+    start = time.perf_counter()
+    expected = [reference_clean_text(t) for t in texts]
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = clean_many(texts)
+    engine_seconds = time.perf_counter() - start
+
+    mismatches = [(t, e, a) for t, e, a in zip(texts, expected, actual) if e != a]
+    return mismatches, reference_seconds, engine_seconds
+
+def main():
+    """Parity and throughput check against a CSV column"""
+    import pandas as pd
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "train.csv"
+    text_column = sys.argv[2] if len(sys.argv) > 2 else "comment_text"
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    texts = pd.read_csv(csv_path, nrows=limit)[text_column].dropna().astype(str).tolist()
+    print(f"📂 Checking {len(texts)} texts from {csv_path}")
+
+    mismatches, reference_seconds, engine_seconds = check_parity(texts)
+
+    print(f"   Reference: {len(texts) / reference_seconds:.0f} texts/s")
+    print(f"   TextCleaner: {len(texts) / engine_seconds:.0f} texts/s")
+    print(f"   Speedup: {reference_seconds / engine_seconds:.1f}x")
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatches")
+        for text, expected, actual in mismatches[:5]:
+            print(f"   {text[:60]!r}\n      expected: {expected!r}\n      actual:   {actual!r}")
+        sys.exit(1)
+
+    print("✅ Output identical to reference implementation")
+
+if __name__ == "__main__":
+    main()
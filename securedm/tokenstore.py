@@ -0,0 +1,275 @@
+# tokenstore.py
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Bump when the on-disk layout changes
+STORE_FORMAT = 1
+
+try:
+    from . import textcleaner
+except ImportError:
+    import textcleaner
+
+def _model():
+    try:
+        from . import model
+    except ImportError:
+        import model
+    return model
+
+def input_hash(csv_path):
+    """SHA-256 of the input file's bytes"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(csv_path, text_column, tokenizer_id, max_length, input_digest=None):
+    """
+    Hash of everything a store's contents depend on
+
+    The input bytes, the text column, the tokenizer, the token cap, the
+    cleaner's source and whether it runs without NLTK data, and the store
+    format: changing any of them makes an existing store stale.
+
+    Args:
+        input_digest (str): input_hash(csv_path) if already known
+    """
+    digest = hashlib.sha256()
+    digest.update((input_digest or input_hash(csv_path)).encode("ascii"))
+    with open(textcleaner.__file__, "rb") as f:
+        digest.update(f.read())
+    # Without NLTK data the cleaner keeps stopwords and skips lemmas
+    full_cleaner = bool(textcleaner.get_cleaner().stop_words)
+    digest.update(json.dumps([text_column, tokenizer_id, max_length, STORE_FORMAT, full_cleaner]).encode("utf-8"))
+    return digest.hexdigest()
+
+def tokenizer_id():
+    """Identity of the tokenizer the current model uses"""
+    model = _model()
+    return model.MODEL_PATH or model.MODEL_NAME
+
+def load_tokenizer():
+    """The loaded model's tokenizer, without loading weights if the model isn't up yet"""
+    model = _model()
+    if model._model_loaded and getattr(model._toxic_model, "tokenizer", None) is not None:
+        return model._toxic_model.tokenizer
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(tokenizer_id(), local_files_only=model.OFFLINE)
+
+class TokenStore:
+    """
+    Cleaned and tokenized texts of one CSV column, memory-mapped
+
+    Layout of the store directory:
+        tokens.bin          every row's input ids back to back (uint16, or
+                            uint32 for vocabularies over 65535 entries)
+        offsets.u64         rows + 1 offsets into tokens.bin
+        cleaned.bin         every row's clean_text output, UTF-8
+        cleaned_offsets.u64 rows + 1 byte offsets into cleaned.bin
+        meta.json           rows, dtype, content hash and build settings
+
+    Row i is data row i of the CSV. Rows whose text is missing or blank
+    have no tokens and an empty cleaned text. ids(i) is a view into the
+    mapped file, nothing is parsed or copied.
+
+    Args:
+        path (str): Store directory written by build_token_store
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.tokens = self._map("tokens.bin", self.meta["dtype"])
+        self.offsets = self._map("offsets.u64", "<u8")
+        self.cleaned_bytes = self._map("cleaned.bin", np.uint8)
+        self.cleaned_offsets = self._map("cleaned_offsets.u64", "<u8")
+
+    def _map(self, name, dtype):
+        path = os.path.join(self.path, name)
+        if os.path.getsize(path) == 0:
+            # mmap can't map an empty file
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return self.rows
+
+    def ids(self, row):
+        """Input ids of a row, a zero-copy view"""
+        return self.tokens[self.offsets[row]:self.offsets[row + 1]]
+
+    def cleaned(self, row):
+        """clean_text output of a row"""
+        return self.cleaned_bytes[self.cleaned_offsets[row]:self.cleaned_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def lengths(self, start=0, stop=None):
+        """Token count of rows start..stop"""
+        stop = self.rows if stop is None else stop
+        return np.diff(self.offsets[start:stop + 1])
+
+    def matches(self, csv_path, text_column, max_length):
+        """True if the store was built from this input with the current tokenizer and settings"""
+        # An input with the size and mtime seen at build time isn't read again
+        stat = os.stat(csv_path)
+        unchanged = (self.meta.get("input_size"), self.meta.get("input_mtime_ns")) == (stat.st_size, stat.st_mtime_ns)
+        digest = self.meta.get("input_hash") if unchanged else input_hash(csv_path)
+        if self.meta.get("hash") != content_hash(csv_path, text_column, tokenizer_id(), max_length, digest):
+            return False
+        if not unchanged:
+            # Same bytes (e.g. copied or touched), remember the new size and mtime
+            self.meta.update(input_size=stat.st_size, input_mtime_ns=stat.st_mtime_ns, input_hash=digest)
+            with open(os.path.join(self.path, "meta.json"), "w") as f:
+                json.dump(self.meta, f, indent=2)
+        return True
+
+def build_token_store(csv_path, path, text_column="comment_text", chunk_size=10000, max_length=None):
+    """
+    Clean and tokenize a CSV column once, for repeated scoring runs
+
+    The input is streamed in chunks and appended to a temporary directory
+    that replaces `path` only when complete, so an interrupted build never
+    leaves a store that looks valid.
+
+    Args:
+        csv_path (str): Input CSV
+        path (str): Store directory to write
+        text_column (str): Column to clean and tokenize
+        chunk_size (int): Rows processed per step
+        max_length (int): Token cap, defaults to the model's MAX_LENGTH
+
+    Returns: TokenStore
+    """
+    import pandas as pd
+
+    max_length = max_length or _model().MAX_LENGTH
+    tokenizer = load_tokenizer()
+    dtype = "<u2" if len(tokenizer) <= 65535 else "<u4"
+    started = time.perf_counter()
+
+    print(f"🔐 Hashing {csv_path}...")
+    # Stat before reading, so a write during the build shows up as a change
+    stat = os.stat(csv_path)
+    input_digest = input_hash(csv_path)
+    store_hash = content_hash(csv_path, text_column, tokenizer_id(), max_length, input_digest)
+
+    tmp_path = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    rows = 0
+    token_count = 0
+    cleaned_count = 0
+    files = {name: open(os.path.join(tmp_path, name), "wb") for name in ("tokens.bin", "offsets.u64", "cleaned.bin", "cleaned_offsets.u64")}
+    try:
+        files["offsets.u64"].write(np.zeros(1, dtype="<u8").tobytes())
+        files["cleaned_offsets.u64"].write(np.zeros(1, dtype="<u8").tobytes())
+
+        for chunk in pd.read_csv(csv_path, usecols=[text_column], chunksize=chunk_size):
+            # Same rules as testclassifier.score_rows: missing or blank text is never cleaned
+            cleaned = [
+                "" if pd.isna(text) or not str(text).strip() else textcleaner.clean_text(str(text))
+                for text in chunk[text_column].tolist()
+            ]
+            to_tokenize = [i for i, text in enumerate(cleaned) if text]
+            encoded = tokenizer([cleaned[i] for i in to_tokenize], truncation=True, max_length=max_length)["input_ids"] if to_tokenize else []
+            ids = [[] for _ in cleaned]
+            for i, row_ids in zip(to_tokenize, encoded):
+                ids[i] = row_ids
+
+            lengths = np.fromiter((len(row_ids) for row_ids in ids), dtype=np.int64, count=len(ids))
+            flat = np.fromiter((token for row_ids in ids for token in row_ids), dtype=dtype, count=int(lengths.sum()))
+            files["tokens.bin"].write(flat.tobytes())
+            files["offsets.u64"].write((token_count + np.cumsum(lengths)).astype("<u8").tobytes())
+            token_count += int(lengths.sum())
+
+            encoded_texts = [text.encode("utf-8") for text in cleaned]
+            files["cleaned.bin"].write(b"".join(encoded_texts))
+            byte_lengths = np.fromiter((len(text) for text in encoded_texts), dtype=np.int64, count=len(encoded_texts))
+            files["cleaned_offsets.u64"].write((cleaned_count + np.cumsum(byte_lengths)).astype("<u8").tobytes())
+            cleaned_count += int(byte_lengths.sum())
+
+            rows += len(cleaned)
+            print(f"✅ {rows} rows tokenized ({token_count} tokens)")
+    finally:
+        for f in files.values():
+            f.close()
+
+    meta = {
+        "format": STORE_FORMAT,
+        "rows": rows,
+        "tokens": token_count,
+        "dtype": dtype,
+        "hash": store_hash,
+        "input": os.path.abspath(csv_path),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "input_hash": input_digest,
+        "text_column": text_column,
+        "tokenizer": tokenizer_id(),
+        "max_length": max_length,
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"💾 Token store saved to {path} ({rows} rows, {token_count} tokens, {time.perf_counter() - started:.1f}s)")
+    return TokenStore(path)
+
+def open_token_store(path, csv_path, text_column="comment_text", max_length=None, build=True):
+    """
+    Open the store for an input, building (or rebuilding) it if needed
+
+    Args:
+        build (bool): Build a missing or stale store; otherwise return None
+
+    Returns: TokenStore, or None
+    """
+    max_length = max_length or _model().MAX_LENGTH
+    if os.path.exists(os.path.join(path, "meta.json")):
+        store = TokenStore(path)
+        if store.matches(csv_path, text_column, max_length):
+            return store
+        print(f"⚠️ Token store {path} was built from a different input or settings")
+    if not build:
+        return None
+    return build_token_store(csv_path, path, text_column, max_length=max_length)
+
+def main():
+    """Build or inspect a token store"""
+    parser = argparse.ArgumentParser(description="Pre-clean and pre-tokenize a dataset for repeated scoring runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="clean and tokenize a CSV column")
+    build.add_argument("input_file")
+    build.add_argument("store")
+    build.add_argument("--text-column", default="comment_text")
+    build.add_argument("--chunk-size", type=int, default=10000)
+    build.add_argument("--max-length", type=int, help="token cap, default SECUREDM_MAX_LENGTH")
+    info = sub.add_parser("info", help="print a store's metadata and length distribution")
+    info.add_argument("store")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_token_store(args.input_file, args.store, args.text_column, args.chunk_size, args.max_length)
+        return
+
+    store = TokenStore(args.store)
+    lengths = store.lengths()
+    print(json.dumps(store.meta, indent=2))
+    if len(lengths):
+        print(f"📏 Tokens per row: mean {lengths.mean():.1f}, p50 {np.percentile(lengths, 50):.0f}, "
+              f"p95 {np.percentile(lengths, 95):.0f}, max {lengths.max()}")
+
+if __name__ == "__main__":
+    sys.exit(main())
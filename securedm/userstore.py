@@ -0,0 +1,377 @@
+# userstore.py
+import os
+import sys
+import tempfile
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    from .redditclient import fetch_user_pages
+except ImportError:
+    from redditclient import fetch_user_pages
+
+SOURCES = {"comments": "comment", "submissions": "submission"}
+
+_store_lock = threading.Lock()
+_default_store = None
+_default_created = False
+
+class UserStore:
+    """
+    Persistent per-user analysis state with delta refresh
+
+    For every user the store keeps the classified items and, per listing,
+    the newest fullname seen. A refresh asks Reddit only for items newer
+    than that watermark, classifies just those and merges them into the
+    stored window, so repeat lookups cost one small listing request, or
+    nothing at all within the refresh TTL.
+
+    Reddit answers `before` with nothing when the watermark item was deleted,
+    and with only the items just after it when more than max_posts arrived.
+    So an empty delta (once verify_after has passed since the last full
+    fetch) or a full one is followed by a full fetch. Items already stored
+    are not classified again.
+
+    Every item is stored with the id of the model that classified it.
+    Items from another model (new weights, backend, max_length or
+    SECUREDM_MODEL_VERSION) are not served, and their listing is fetched
+    and classified again on the next refresh.
+
+    Args:
+        db_path (str): SQLite file, shared by all threads and processes
+        classify_fn: Callable taking a list of texts and returning (label, score) tuples
+        long_classify_fn: Same for submissions, which can run far past the
+            model's token limit; defaults to classify_fn if that is given
+        ttl (float): Seconds during which a user is served without asking Reddit
+        full_refresh (float): Seconds after which the watermark is ignored and
+            the whole window is fetched again (catches edits and deletions)
+        verify_after (float): Seconds after a full fetch from which an empty
+            delta is checked with a full fetch, in case the watermark item
+            is gone
+        model_id (str): Identity of classify_fn's model; defaults to the
+            toxicity model's current id when classify_fn is not given
+    """
+
+    def __init__(self, db_path, classify_fn=None, ttl=60, full_refresh=3600, long_classify_fn=None, model_id=None, verify_after=300):
+        self._model_id_fn = lambda: model_id or "custom"
+        if classify_fn is None:
+            try:
+                from .model import classify_batch, classify_long_many, model_id as current_model_id
+            except ImportError:
+                from model import classify_batch, classify_long_many, model_id as current_model_id
+            classify_fn = classify_batch
+            long_classify_fn = long_classify_fn or classify_long_many
+            if model_id is None:
+                # Looked up on every use, set_max_length can change it after startup
+                self._model_id_fn = current_model_id
+
+        self.db_path = db_path
+        self.classify_fn = classify_fn
+        self.long_classify_fn = long_classify_fn or classify_fn
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self.verify_after = verify_after
+
+        self._local = threading.local()
+        self._locks_lock = threading.Lock()
+        self._user_locks = {}
+
+        self._connection()
+
+    def _connection(self):
+        # SQLite connections can't be shared across threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " username TEXT, source TEXT, newest TEXT, window_size INTEGER,"
+                " synced REAL, full_synced REAL, PRIMARY KEY (username, source));"
+                "CREATE TABLE IF NOT EXISTS items ("
+                " username TEXT, id TEXT, type TEXT, content TEXT, subreddit TEXT,"
+                " created REAL, label TEXT, score REAL, model TEXT, PRIMARY KEY (username, id));"
+                "CREATE INDEX IF NOT EXISTS items_by_user ON items (username, type, created);"
+            )
+            if "model" not in [row[1] for row in conn.execute("PRAGMA table_info(items)")]:
+                try:
+                    # Stores from before model ids; their rows count as another model's
+                    conn.execute("ALTER TABLE items ADD COLUMN model TEXT")
+                except sqlite3.OperationalError:
+                    # Another process added it first
+                    pass
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @property
+    def model_id(self):
+        return self._model_id_fn()
+
+    def _user_lock(self, username):
+        with self._locks_lock:
+            lock = self._user_locks.get(username)
+            if lock is None:
+                lock = self._user_locks[username] = threading.Lock()
+            return lock
+
+    def refresh(self, reddit, username, max_posts=10, include_submissions=True, force=False, classify_fn=None, long_classify_fn=None,
+                on_page=None, page_size=25):
+        """
+        Bring a user's stored items up to date
+
+        classify_fn / long_classify_fn override the store's classifiers for
+        this call, e.g. to share batches with other users being refreshed.
+        on_page is called with each page of newly classified detail dicts
+        (with toxicity_label / toxicity_score set) before they are stored,
+        so callers can show results while later pages are still fetched.
+
+        Returns: number of newly classified items
+        """
+        key = username.lower()
+        sources = ["comments", "submissions"] if include_submissions else ["comments"]
+        model_id = self.model_id
+
+        with self._user_lock(key):
+            conn = self._connection()
+            now = time.time()
+            # Listings holding another model's verdicts are classified again from scratch
+            outdated = {
+                item_type for (item_type,) in conn.execute(
+                    "SELECT DISTINCT type FROM items WHERE username = ? AND model IS NOT ?", (key, model_id)
+                )
+            }
+            state = {
+                source: (newest, window, synced, full_synced)
+                for source, newest, window, synced, full_synced in conn.execute(
+                    "SELECT source, newest, window_size, synced, full_synced FROM users WHERE username = ?", (key,)
+                )
+            }
+
+            # Decide per listing whether to skip, fetch the delta or fetch everything
+            before = {}
+            stale = []
+            for source in sources:
+                newest, window, synced, full_synced = state.get(source, (None, 0, 0, 0))
+                full = force or window < max_posts or now - full_synced > self.full_refresh or SOURCES[source] in outdated
+                if not full and now - synced < self.ttl:
+                    continue
+                stale.append((source, full))
+                if not full and newest:
+                    before[source] = newest
+
+            if not stale:
+                return 0
+
+            # Verdicts already stored for this model, reused when a full fetch returns the same items
+            known = {
+                item_id: (label, score)
+                for item_id, label, score in conn.execute(
+                    "SELECT id, label, score FROM items WHERE username = ? AND model = ?", (key, model_id)
+                )
+            }
+            new_rows = []
+            newest_seen = {}
+            classified = 0
+
+            def fetch(wanted, before):
+                nonlocal classified
+                counts = dict.fromkeys(wanted, 0)
+                fetch_submissions = "submissions" in wanted
+                for source, page in fetch_user_pages(reddit, username, max_posts, include_submissions=fetch_submissions, page_size=page_size, before=before):
+                    if source not in wanted:
+                        continue
+                    counts[source] += len(page)
+                    # Listings are newest first, so the first item of a source is its new watermark
+                    newest_seen.setdefault(source, page[0][1]['id'])
+                    to_classify = [(text, detail) for text, detail in page if detail['id'] not in known]
+                    if to_classify:
+                        if source == "submissions":
+                            classify = long_classify_fn or self.long_classify_fn
+                        else:
+                            classify = classify_fn or self.classify_fn
+                        for (_, detail), (label, score) in zip(to_classify, classify([text for text, _ in to_classify])):
+                            known[detail['id']] = (label, float(score))
+                        classified += len(to_classify)
+                    for _, detail in page:
+                        label, score = known[detail['id']]
+                        new_rows.append((
+                            key, detail['id'], detail['type'], detail['content'], detail['subreddit'],
+                            detail['created'].timestamp(), label, float(score), model_id
+                        ))
+                        detail['toxicity_label'] = label
+                        detail['toxicity_score'] = score
+                    if on_page:
+                        on_page([detail for _, detail in page])
+                return counts
+
+            counts = fetch(dict(stale), before)
+
+            # A delta can't tell "nothing new" from "watermark deleted", and a
+            # full one may have skipped the newest items: fetch everything
+            fallback = []
+            for source, full in stale:
+                if full or source not in before:
+                    continue
+                full_synced = state[source][3]
+                if counts[source] >= max_posts or (counts[source] == 0 and now - full_synced > self.verify_after):
+                    fallback.append(source)
+            if fallback:
+                for source in fallback:
+                    newest_seen.pop(source, None)
+                stale = [(source, full or source in fallback) for source, full in stale]
+                fetch(dict.fromkeys(fallback, True), {})
+
+            with conn:
+                # A full fetch replaces the stored window, dropping deleted items
+                for source, full in stale:
+                    if full:
+                        conn.execute("DELETE FROM items WHERE username = ? AND type = ?", (key, SOURCES[source]))
+
+                if new_rows:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO items (username, id, type, content, subreddit, created, label, score, model)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        new_rows
+                    )
+
+                for source, full in stale:
+                    newest, window, synced, full_synced = state.get(source, (None, 0, 0, 0))
+                    if full:
+                        newest, window, full_synced = newest_seen.get(source), max_posts, now
+                    else:
+                        newest, window = newest_seen.get(source, newest), max(window, max_posts)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, source, newest, window, now, full_synced)
+                    )
+                    # Keep only the newest items of the window
+                    conn.execute(
+                        "DELETE FROM items WHERE username = ? AND type = ? AND id NOT IN ("
+                        " SELECT id FROM items WHERE username = ? AND type = ? ORDER BY created DESC LIMIT ?)",
+                        (key, SOURCES[source], key, SOURCES[source], window)
+                    )
+
+            return classified
+
+    def analyze(self, reddit, username, max_posts=10, include_submissions=True, classify_fn=None, long_classify_fn=None):
+        """
+        Refresh a user and return the analysis of their stored window
+
+        Returns: (toxic_count, total_count, details, toxic_items), or None if
+            the user has no items
+        """
+        self.refresh(reddit, username, max_posts, include_submissions, classify_fn=classify_fn, long_classify_fn=long_classify_fn)
+        return self.summary(username, max_posts, include_submissions)
+
+    def summary(self, username, max_posts=10, include_submissions=True):
+        """Aggregate the stored items of a user without contacting Reddit, current model only"""
+        types = ["comment", "submission"] if include_submissions else ["comment"]
+        conn = self._connection()
+        model_id = self.model_id
+
+        details = []
+        for item_type in types:
+            rows = conn.execute(
+                "SELECT id, type, content, subreddit, created, label, score FROM items"
+                " WHERE username = ? AND type = ? AND model = ? ORDER BY created DESC LIMIT ?",
+                (username.lower(), item_type, model_id, max_posts)
+            ).fetchall()
+            for item_id, item_type, content, subreddit, created, label, score in rows:
+                details.append({
+                    'type': item_type,
+                    'id': item_id,
+                    'content': content,
+                    'subreddit': subreddit,
+                    'created': datetime.fromtimestamp(created),
+                    'toxicity_label': label,
+                    'toxicity_score': score
+                })
+
+        if not details:
+            return None
+
+        try:
+            from .model import is_toxic
+        except ImportError:
+            from model import is_toxic
+        toxic_items = [d for d in details if is_toxic(d['toxicity_label'], d['toxicity_score'])]
+        return len(toxic_items), len(details), details, toxic_items
+
+def get_user_store():
+    """
+    Return the process-wide UserStore configured by SECUREDM_USER_DB
+
+    Returns: UserStore, or None if SECUREDM_USER_DB is set to an empty string
+    """
+    global _default_store, _default_created
+    if not _default_created:
+        with _store_lock:
+            if not _default_created:
+                db_path = os.getenv("SECUREDM_USER_DB", "user_analysis.sqlite")
+                if db_path:
+                    _default_store = UserStore(db_path, ttl=float(os.getenv("SECUREDM_USER_TTL", "60")))
+                _default_created = True
+    return _default_store
+
+def check_delta_refresh():
+    """
+    Delta refresh against a fake Reddit with real listing semantics
+
+    After new items, a deleted watermark item and a burst of more than
+    max_posts new items, the stored window must equal a fresh fetch.
+
+    Returns: list of (step, ok) pairs
+    """
+    try:
+        from .fakereddit import synthetic_reddit
+    except ImportError:
+        from fakereddit import synthetic_reddit
+
+    max_posts = 10
+    reddit = synthetic_reddit(1, 30)
+    calls = []
+
+    def classify(texts):
+        calls.append(len(texts))
+        return [("TOXIC" if "idiot" in text else "NON_TOXIC", 0.9 if "idiot" in text else 0.1) for text in texts]
+
+    def expected():
+        return [item.fullname for item in reddit.users["user0"]["comments"][:max_posts]]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # ttl=0 so every call refreshes; verify_after=0 so an empty delta is always checked
+        store = UserStore(os.path.join(tmp, "users.sqlite"), classify_fn=classify, ttl=0, verify_after=0, model_id="check")
+
+        def step(name, change):
+            change()
+            store.refresh(reddit, "user0", max_posts, include_submissions=False)
+            details = store.summary("user0", max_posts, include_submissions=False)[2]
+            results.append((name, [d['id'] for d in details] == expected()))
+
+        step("initial fetch", lambda: None)
+        step("3 new comments", lambda: reddit.prepend("user0", comments=[{"body": f"new {i}"} for i in range(3)]))
+        step("watermark deleted, 2 new", lambda: (
+            reddit.remove("user0", reddit.users["user0"]["comments"][0].fullname),
+            reddit.prepend("user0", comments=[{"body": f"after delete {i}"} for i in range(2)])
+        ))
+        step("burst of 15 new", lambda: reddit.prepend("user0", comments=[{"body": f"burst {i} idiot"} for i in range(15)]))
+        before = sum(calls)
+        step("nothing new", lambda: None)
+        results.append(("stored items not re-classified", sum(calls) == before))
+    return results
+
+def main():
+    """Check delta refresh against a fake Reddit"""
+    results = check_delta_refresh()
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+    if not all(ok for _, ok in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
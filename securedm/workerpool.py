@@ -0,0 +1,176 @@
+# workerpool.py
+import multiprocessing
+import os
+import queue
+import sys
+
+try:
+    from .backends import set_num_threads
+except ImportError:
+    from backends import set_num_threads
+
+def _worker_main(task_queue, result_queue, fn, num_threads):
+    # Each worker gets its own slice of the cores instead of every process
+    # fighting over the full intra-op thread pool
+    if num_threads:
+        try:
+            set_num_threads(num_threads)
+        except Exception as e:
+            print(f"⚠️ Could not pin worker threads: {e}", file=sys.stderr)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        seq, payload = task
+        try:
+            result_queue.put((seq, True, fn(payload)))
+        except Exception as e:
+            result_queue.put((seq, False, f"{type(e).__name__}: {e}"))
+
+class WorkerPool:
+    """
+    Process pool that applies fn to payloads and yields results in order
+
+    Workers are forked from the parent, so a model loaded (and warmed up)
+    before the pool starts is shared copy-on-write instead of being loaded
+    once per process. Platforms without fork fall back to spawn, where each
+    worker loads the model on first use.
+
+    Args:
+        fn: Module-level callable applied to each payload in a worker
+        workers (int): Number of worker processes
+        threads_per_worker (int): Intra-op threads per worker, defaults to
+            cpu_count // workers
+        prefetch (int): Payloads queued per worker ahead of the one running
+        max_retries (int): Times a payload is re-run after its worker died
+        pin_threads (bool): Pin torch threads in workers; off for pools
+            that never run the model, so they don't import torch
+    """
+
+    def __init__(self, fn, workers=2, threads_per_worker=None, prefetch=2, max_retries=2, pin_threads=True):
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.pin_threads = pin_threads
+        self.prefetch = max(1, prefetch)
+        self.max_retries = max_retries
+
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self._ctx = multiprocessing.get_context(method)
+        self._results = self._ctx.Queue()
+        self._procs = [None] * self.workers
+        self._queues = [None] * self.workers
+        # worker slot -> {seq: payload} handed to it and not answered yet
+        self._assigned = [{} for _ in range(self.workers)]
+        self._retries = {}
+        self.restarts = 0
+
+        for slot in range(self.workers):
+            self._start(slot)
+
+    def _start(self, slot):
+        # A dead worker's queue may hold half-read tasks, so every process gets a fresh one
+        self._queues[slot] = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._queues[slot], self._results, self.fn, self.threads_per_worker if self.pin_threads else 0),
+            daemon=True
+        )
+        proc.start()
+        self._procs[slot] = proc
+
+    def _assign(self, seq, payload):
+        slot = min(range(self.workers), key=lambda s: len(self._assigned[s]))
+        self._assigned[slot][seq] = payload
+        self._queues[slot].put((seq, payload))
+
+    def _has_capacity(self):
+        return any(len(assigned) < self.prefetch for assigned in self._assigned)
+
+    def _recover(self):
+        """Restart dead workers and hand their payloads to the live ones"""
+        for slot, proc in enumerate(self._procs):
+            if proc.exitcode is None:
+                continue
+            lost = self._assigned[slot]
+            self._assigned[slot] = {}
+            print(f"⚠️ Worker {proc.pid} exited with code {proc.exitcode}, restarting ({len(lost)} chunks re-queued)", file=sys.stderr)
+            self.restarts += 1
+            self._start(slot)
+            for seq, payload in lost.items():
+                self._retries[seq] = self._retries.get(seq, 0) + 1
+                if self._retries[seq] > self.max_retries:
+                    raise RuntimeError(f"Chunk {seq} crashed a worker {self._retries[seq]} times")
+                self._assign(seq, payload)
+
+    def _release(self, seq):
+        for assigned in self._assigned:
+            if assigned.pop(seq, None) is not None:
+                return True
+        # Answer from a worker that was presumed dead; the payload already ran elsewhere
+        return False
+
+    def imap(self, payloads):
+        """
+        Apply fn to every payload across the workers
+
+        At most workers * prefetch payloads are in flight, so a large input
+        is streamed rather than read up front.
+
+        Returns: generator of results in the same order as payloads
+        """
+        payloads = iter(payloads)
+        submitted = 0
+        next_seq = 0
+        done = {}
+        exhausted = False
+
+        while True:
+            # Results finished ahead of a slow chunk count against the window too
+            while not exhausted and self._has_capacity() and len(done) < self.workers * self.prefetch:
+                try:
+                    payload = next(payloads)
+                except StopIteration:
+                    exhausted = True
+                    break
+                self._assign(submitted, payload)
+                submitted += 1
+
+            if next_seq in done:
+                yield done.pop(next_seq)
+                next_seq += 1
+                continue
+            if exhausted and next_seq == submitted:
+                return
+
+            try:
+                seq, ok, value = self._results.get(timeout=0.5)
+            except queue.Empty:
+                self._recover()
+                continue
+
+            if not self._release(seq) or seq in done:
+                continue
+            if not ok:
+                raise RuntimeError(f"Chunk {seq} failed in a worker: {value}")
+            done[seq] = value
+
+    def close(self):
+        """Stop the workers after they finish their queued payloads"""
+        for slot, proc in enumerate(self._procs):
+            if proc is not None and proc.exitcode is None:
+                self._queues[slot].put(None)
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout=10)
+                if proc.exitcode is None:
+                    proc.terminate()
+        self._procs = [None] * self.workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
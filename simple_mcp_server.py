@@ -3,17 +3,21 @@
 Simple Reddit Toxicity Detection MCP Server
 """
 
+import argparse
 import json
 import sys
-from securedm.model import classify_dm
-import praw
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from securedm import metrics
+from securedm.model import classify_dm, classify_batch, warmup, enable_micro_batching, is_toxic
+from securedm.redditclient import get_reddit, fetch_user_pages
+from securedm.userstore import get_user_store
+from securedm.bulkanalysis import BulkAnalyzer, BULK_MAX_USERS, get_bucket, parse_usernames, summary_text
 
-# Reddit configuration
-REDDIT_CONFIG = {
-    "client_id": "8GP0nJUPDOfiht-FUS7Cig",
-    "client_secret": "6wzYEv5IZJFTJjh-o3iW5mRZ-GT-gw",
-    "user_agent": "ToxicityMCP/1.0"
-}
+USER_AGENT = "ToxicityMCP/1.0"
+
+TOOL_NAMES = ("analyze_reddit_user", "analyze_reddit_users", "classify_text", "get_stats")
 
 def handle_request(request):
     """Handle MCP requests"""
@@ -35,6 +39,18 @@ def handle_request(request):
                         "required": ["username"]
                     }
                 },
+                {
+                    "name": "analyze_reddit_users",
+                    "description": "Analyze toxicity of many Reddit users at once, within Reddit's rate limit",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "usernames": {"type": "array", "items": {"type": "string"}},
+                            "max_posts": {"type": "integer", "default": 10}
+                        },
+                        "required": ["usernames"]
+                    }
+                },
                 {
                     "name": "classify_text",
                     "description": "Classify text toxicity",
@@ -45,6 +61,16 @@ def handle_request(request):
                         },
                         "required": ["text"]
                     }
+                },
+                {
+                    "name": "get_stats",
+                    "description": "Per-stage latency, batch size, cache and error metrics of this server",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "format": {"type": "string", "enum": ["json", "prometheus"], "default": "json"}
+                        }
+                    }
                 }
             ]
         }
@@ -53,43 +79,88 @@ def handle_request(request):
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
         
-        if tool_name == "analyze_reddit_user":
-            return analyze_user(arguments)
-        elif tool_name == "classify_text":
-            return classify_text(arguments)
+        # Arbitrary names from clients must not become metric labels
+        stage = f"tool_{tool_name}" if tool_name in TOOL_NAMES else "tool_unknown"
+        with metrics.timer(stage):
+            result = call_tool(tool_name, arguments)
+        if result is not None:
+            if isinstance(result, dict) and "error" in result:
+                metrics.inc("securedm_errors_total", stage=stage)
+            return result
     
     return {"error": "Unknown method"}
 
+def call_tool(tool_name, arguments):
+    """Run one tool, None if there is no such tool"""
+    if tool_name == "analyze_reddit_user":
+        return analyze_user(arguments)
+    elif tool_name == "analyze_reddit_users":
+        return analyze_users(arguments)
+    elif tool_name == "classify_text":
+        return classify_text(arguments)
+    elif tool_name == "get_stats":
+        return get_stats(arguments)
+    return None
+
 def analyze_user(args):
     """Analyze Reddit user"""
     username = args.get("username")
     max_posts = args.get("max_posts", 10)
     
     try:
-        reddit = praw.Reddit(**REDDIT_CONFIG)
-        user = reddit.redditor(username)
+        reddit = get_reddit(USER_AGENT)
         
-        texts = []
-        # Get recent comments
-        for comment in user.comments.new(limit=max_posts):
-            if comment.body and comment.body != "[deleted]":
-                texts.append(comment.body)
+        store = get_user_store()
+        if store:
+            # Only fetch and classify comments newer than the last lookup
+            summary = store.analyze(reddit, username, max_posts, include_submissions=False)
+            toxic_count, total_count = summary[:2] if summary else (0, 0)
+        else:
+            total_count = 0
+            toxic_count = 0
+            
+            # Get recent comments, classifying each page as it arrives
+            for _, page in fetch_user_pages(reddit, username, max_posts, include_submissions=False):
+                page_texts = [text for text, _ in page]
+                for label, score in classify_batch(page_texts):
+                    if is_toxic(label, score):
+                        toxic_count += 1
+                total_count += len(page_texts)
         
-        # Analyze toxicity
-        toxic_count = 0
-        results = []
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"User: u/{username}\nTotal posts: {total_count}\nToxic posts: {toxic_count}\nToxicity rate: {(toxic_count/total_count*100 if total_count else 0.0):.1f}%"
+                }
+            ]
+        }
         
-        for text in texts:
-            label, score = classify_dm(text)
-            if label.upper() == "TOXIC":
-                toxic_count += 1
-            results.append({"text": text[:100], "label": label, "score": score})
+    except Exception as e:
+        return {"error": str(e)}
+
+def analyze_users(args):
+    """Analyze many Reddit users, comments only like analyze_reddit_user"""
+    usernames = parse_usernames(args.get("usernames"))
+    max_posts = args.get("max_posts", 10)
+    
+    if not usernames:
+        return {"error": "usernames required"}
+    if len(usernames) > BULK_MAX_USERS:
+        return {"error": f"at most {BULK_MAX_USERS} usernames per call"}
+    
+    try:
+        analyzer = BulkAnalyzer(get_reddit(USER_AGENT), store=get_user_store(), bucket=get_bucket())
+        try:
+            summaries = list(analyzer.analyze_many(usernames, max_posts, include_submissions=False))
+        finally:
+            analyzer.close()
         
         return {
             "content": [
                 {
                     "type": "text",
-                    "text": f"User: u/{username}\nTotal posts: {len(texts)}\nToxic posts: {toxic_count}\nToxicity rate: {(toxic_count/len(texts)*100):.1f}%"
+                    "text": summary_text(summaries)
                 }
             ]
         }
@@ -97,6 +168,14 @@ def analyze_user(args):
     except Exception as e:
         return {"error": str(e)}
 
+def get_stats(args):
+    """Metrics snapshot, or the Prometheus text served by webapp's /metrics"""
+    if args.get("format") == "prometheus":
+        text = metrics.render()
+    else:
+        text = json.dumps(metrics.snapshot(), indent=2, default=str)
+    return {"content": [{"type": "text", "text": text}]}
+
 def classify_text(args):
     """Classify single text"""
     text = args.get("text")
@@ -114,21 +193,132 @@ def classify_text(args):
     except Exception as e:
         return {"error": str(e)}
 
-def main():
-    """Main MCP server loop"""
-    print("Reddit Toxicity MCP Server started", file=sys.stderr)
+def make_response(request, result):
+    """Wrap a result in a JSON-RPC envelope when the request carried an id (concurrent mode only)"""
+    if not isinstance(request, dict) or "id" not in request:
+        return result
+    
+    response = {"jsonrpc": "2.0", "id": request["id"]}
+    if isinstance(result, dict) and set(result) == {"error"}:
+        response["error"] = {"code": -32000, "message": str(result["error"])}
+    else:
+        response["result"] = result
+    return response
+
+class ConcurrentServer:
+    """
+    Processes stdin requests on a worker pool so slow tools don't block fast ones
+    
+    Responses carry the request id and may be written out of order. Writes
+    are serialized, at most max_in_flight requests run or wait at once
+    (reading stops until a slot frees up), notifications/cancelled drops a
+    request, and EOF waits for everything in flight before returning.
+    """
+    
+    def __init__(self, workers=8, max_in_flight=32, output=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-worker")
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.output = output or sys.stdout
+        self.write_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.in_flight = {}
+        self.cancelled = set()
+    
+    def write(self, response):
+        with self.write_lock:
+            self.output.write(json.dumps(response) + "\n")
+            self.output.flush()
+    
+    def cancel(self, request_id):
+        with self.state_lock:
+            future = self.in_flight.get(request_id)
+            if future is None:
+                return
+            # Queued work is dropped; running work finishes but its response is discarded
+            self.cancelled.add(request_id)
+        future.cancel()
+    
+    def process(self, request):
+        request_id = request.get("id")
+        try:
+            response = make_response(request, handle_request(request))
+        except Exception as e:
+            response = make_response(request, {"error": str(e)})
+        
+        with self.state_lock:
+            if request_id in self.cancelled:
+                return
+        self.write(response)
     
-    for line in sys.stdin:
+    def finished(self, request_id, future):
+        with self.state_lock:
+            if self.in_flight.get(request_id) is future:
+                del self.in_flight[request_id]
+            self.cancelled.discard(request_id)
+        self.slots.release()
+    
+    def handle_line(self, line):
+        if not line.strip():
+            return
         try:
             request = json.loads(line.strip())
-            response = handle_request(request)
-            print(json.dumps(response))
-            sys.stdout.flush()
         except Exception as e:
-            error_response = {"error": str(e)}
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+            self.write({"error": str(e)})
+            return
+        
+        # Batch arrays, numbers and strings are not requests; one of them must not stop the server
+        if not isinstance(request, dict):
+            self.write({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request: expected a JSON object"}})
+            return
+        
+        if request.get("method") == "notifications/cancelled":
+            self.cancel(request.get("params", {}).get("requestId"))
+            return
+        
+        # Backpressure: stop reading stdin while too much work is pending
+        self.slots.acquire()
+        request_id = request.get("id")
+        future = self.pool.submit(self.process, request)
+        if request_id is not None:
+            with self.state_lock:
+                self.in_flight[request_id] = future
+        future.add_done_callback(lambda f: self.finished(request_id, f))
+    
+    def serve(self, stream):
+        for line in stream:
+            self.handle_line(line)
+        # Graceful drain: answer everything that was accepted before EOF
+        self.pool.shutdown(wait=True)
+
+def main():
+    """Main MCP server loop"""
+    parser = argparse.ArgumentParser(description="Reddit Toxicity MCP Server")
+    parser.add_argument("--concurrent", action="store_true", help="process requests on a worker pool")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads in concurrent mode")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="requests running or queued at once")
+    args = parser.parse_args()
+    
+    # Only responses go to the real stdout. Log prints from lazy loads, backend
+    # fallbacks or NLTK downloads would otherwise corrupt the protocol stream.
+    protocol = sys.stdout
+    with redirect_stdout(sys.stderr):
+        warmup()
+        print("Reddit Toxicity MCP Server started", file=sys.stderr)
+        
+        if args.concurrent:
+            # Concurrent classify calls share model batches
+            enable_micro_batching()
+            ConcurrentServer(args.workers, max(args.max_in_flight, args.workers), output=protocol).serve(sys.stdin)
+            return
+        
+        for line in sys.stdin:
+            try:
+                request = json.loads(line.strip())
+                response = handle_request(request)
+            except Exception as e:
+                response = {"error": str(e)}
+            protocol.write(json.dumps(response) + "\n")
+            protocol.flush()
 
 if __name__ == "__main__":
     main()
-
@@ -1,18 +1,18 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+import json
 import os
-import praw
-from securedm.model import classify_dm
-from datetime import datetime
+import queue
+import sys
+import threading
+import time
+from securedm import metrics
+from securedm.bulkanalysis import BulkAnalyzer, BULK_MAX_USERS, get_bucket, parse_usernames, totals
+from securedm.model import classify_batch, classify_long_many, warmup, enable_micro_batching, is_ready, is_toxic, BACKEND
+from securedm.redditclient import get_reddit, fetch_user_pages
+from securedm.userstore import get_user_store
 
 app = Flask(__name__)
 
-# Reddit credentials
-REDDIT_CONFIG = {
-    "client_id": os.getenv("REDDIT_CLIENT_ID", "8GP0nJUPDOfiht-FUS7Cig"),
-    "client_secret": os.getenv("REDDIT_CLIENT_SECRET", "6wzYEv5IZJFTJjh-o3iW5mRZ-GT-gw"),
-    "user_agent": "ToxicityAnalyzer/1.0"
-}
-
 @app.route('/')
 def home():
     return '''
@@ -28,6 +28,8 @@ def home():
             .results { margin-top: 30px; text-align: left; }
             .toxic { color: red; }
             .clean { color: green; }
+            .item { border-left: 3px solid #ccc; padding-left: 10px; margin: 10px 0; }
+            .item.toxic-item { border-left-color: red; }
         </style>
     </head>
     <body>
@@ -42,22 +44,60 @@ def home():
             </form>
             
             <div id="loading" style="display:none;">
-                <p>🔄 Analyzing user... Please wait</p>
+                <p>🔄 Analyzing user... results appear as they are classified</p>
             </div>
             
             <div id="results"></div>
+            <div id="items" class="results"></div>
         </div>
 
         <script>
+            let source = null;
+            
             document.getElementById('analyzeForm').onsubmit = function(e) {
                 e.preventDefault();
                 const username = document.getElementById('username').value;
                 const loading = document.getElementById('loading');
                 const results = document.getElementById('results');
+                const items = document.getElementById('items');
                 
                 loading.style.display = 'block';
                 results.innerHTML = '';
+                items.innerHTML = '';
+                
+                if (source) {
+                    source.close();
+                }
+                if (!window.EventSource) {
+                    analyzeOnce(username);
+                    return;
+                }
                 
+                // Items arrive as soon as each page is classified
+                source = new EventSource('/analyze/stream?username=' + encodeURIComponent(username));
+                source.addEventListener('item', function(e) {
+                    const data = JSON.parse(e.data);
+                    displayCounts(username, data, false);
+                    displayItem(data.item);
+                });
+                source.addEventListener('done', function(e) {
+                    source.close();
+                    loading.style.display = 'none';
+                    displayCounts(username, JSON.parse(e.data), true);
+                });
+                source.addEventListener('failed', function(e) {
+                    source.close();
+                    loading.style.display = 'none';
+                    results.innerHTML = '<p style="color:red;">❌ ' + JSON.parse(e.data).error + '</p>';
+                });
+                source.onerror = function() {
+                    // Connection dropped before "done"; keep what was shown
+                    source.close();
+                    loading.style.display = 'none';
+                };
+            };
+            
+            function analyzeOnce(username) {
                 fetch('/analyze', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
@@ -65,37 +105,53 @@ def home():
                 })
                 .then(response => response.json())
                 .then(data => {
-                    loading.style.display = 'none';
+                    document.getElementById('loading').style.display = 'none';
                     if (data.error) {
-                        results.innerHTML = '<p style="color:red;">❌ ' + data.error + '</p>';
+                        document.getElementById('results').innerHTML = '<p style="color:red;">❌ ' + data.error + '</p>';
                     } else {
-                        displayResults(data);
+                        displayCounts(data.username, data, true);
+                        data.toxic_items.forEach(displayItem);
                     }
                 });
-            };
+            }
             
-            function displayResults(data) {
-                const results = document.getElementById('results');
-                const toxicRate = ((data.toxic_count / data.total_count) * 100).toFixed(1);
+            function escapeHtml(text) {
+                const div = document.createElement('div');
+                div.textContent = text;
+                return div.innerHTML;
+            }
+            
+            function displayCounts(username, data, done) {
+                const toxicRate = data.total_count ? ((data.toxic_count / data.total_count) * 100).toFixed(1) : '0.0';
                 
                 let html = '<div class="results">';
-                html += '<h2>📊 Analysis Results for u/' + data.username + '</h2>';
-                html += '<p><strong>Total Posts Analyzed:</strong> ' + data.total_count + '</p>';
+                html += '<h2>📊 Analysis Results for u/' + escapeHtml(username) + (done ? '' : ' (in progress)') + '</h2>';
+                html += '<p><strong>' + (done ? 'Total Posts Analyzed' : 'Posts Analyzed So Far') + ':</strong> ' + data.total_count + '</p>';
                 html += '<p><strong>Toxic Posts:</strong> ' + data.toxic_count + '</p>';
                 html += '<p><strong>Toxicity Rate:</strong> <span class="' + (data.toxic_count > 0 ? 'toxic' : 'clean') + '">' + toxicRate + '%</span></p>';
-                
-                if (data.toxic_items.length > 0) {
-                    html += '<h3>🚨 Toxic Content Examples:</h3>';
-                    data.toxic_items.slice(0, 3).forEach(item => {
-                        html += '<div style="border-left: 3px solid red; padding-left: 10px; margin: 10px 0;">';
-                        html += '<p><strong>' + item.type + ':</strong> ' + item.content + '</p>';
-                        html += '<p><small>Score: ' + item.toxicity_score.toFixed(3) + '</small></p>';
-                        html += '</div>';
-                    });
-                }
-                
                 html += '</div>';
-                results.innerHTML = html;
+                document.getElementById('results').innerHTML = html;
+            }
+            
+            function displayItem(item) {
+                const items = document.getElementById('items');
+                // Decided server-side with the same threshold as toxic_count
+                const isToxic = item.toxic;
+                // A refreshed item replaces the stored copy shown earlier
+                let div = document.getElementById('item-' + item.id);
+                if (!div) {
+                    div = document.createElement('div');
+                    div.id = 'item-' + item.id;
+                }
+                div.className = 'item' + (isToxic ? ' toxic-item' : '');
+                div.innerHTML = '<p><strong>' + item.type + ':</strong> ' + escapeHtml(item.content) + '</p>'
+                    + '<p><small>' + (isToxic ? '🚨 ' : '') + 'Score: ' + item.toxicity_score.toFixed(3) + '</small></p>';
+                // Toxic content first, everything else below it
+                if (isToxic) {
+                    items.insertBefore(div, items.firstChild);
+                } else {
+                    items.appendChild(div);
+                }
             }
         </script>
     </body>
@@ -104,91 +160,291 @@ def home():
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
+    with metrics.timer("request"):
+        try:
+            data = request.get_json()
+            username = data.get('username', '').strip()
+            
+            if not username:
+                return jsonify({'error': 'Username required'})
+            
+            # Shared read-only Reddit client with pooled connections
+            reddit = get_reddit()
+            
+            # Analyze user
+            with metrics.timer("analyze_user"):
+                result = analyze_user(reddit, username)
+            
+            if not result:
+                metrics.inc("securedm_requests_total", outcome="not_found")
+                return jsonify({'error': 'User not found or no recent posts'})
+            
+            toxic_count, total_count, details, toxic_items = result
+            
+            with metrics.timer("serialize"):
+                response = jsonify({
+                    'username': username,
+                    'toxic_count': toxic_count,
+                    'total_count': total_count,
+                    'toxic_items': [_item_event(d) for d in toxic_items[:5]]  # Top 5 toxic items
+                })
+            metrics.inc("securedm_requests_total", outcome="ok")
+            return response
+            
+        except Exception as e:
+            metrics.inc("securedm_errors_total", stage="request")
+            return jsonify({'error': str(e)})
+
+# Every request draws on the Reddit quota all users share, so one can't ask for unlimited items
+MAX_POSTS_LIMIT = int(os.getenv("SECUREDM_MAX_POSTS", "100"))
+
+def parse_max_posts(value, default=10):
+    """
+    max_posts from a request, capped at MAX_POSTS_LIMIT
+
+    Returns: int, or None if value is not a positive integer
+    """
+    if value is None:
+        return default
     try:
-        data = request.get_json()
-        username = data.get('username', '').strip()
-        
+        max_posts = int(value)
+    except (TypeError, ValueError):
+        return None
+    if max_posts < 1:
+        return None
+    return min(max_posts, MAX_POSTS_LIMIT)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _is_toxic_item(detail):
+    return is_toxic(detail['toxicity_label'], detail['toxicity_score'])
+
+def _item_event(detail):
+    return {
+        'type': detail['type'],
+        'id': detail['id'],
+        'content': detail['content'],
+        'subreddit': detail['subreddit'],
+        'created': detail['created'].isoformat(),
+        'toxicity_label': detail['toxicity_label'],
+        'toxicity_score': float(detail['toxicity_score']),
+        'toxic': _is_toxic_item(detail)
+    }
+
+@app.route('/analyze/stream')
+def analyze_stream():
+    """
+    Server-Sent Events variant of /analyze
+    
+    Emits an "item" event per classified comment or submission, with the
+    running toxic_count / total_count, while later pages are still being
+    fetched and classified. Ends with a "done" event carrying the same
+    fields as /analyze, or "failed" with an error.
+    """
+    username = request.args.get('username', '').strip()
+    max_posts = parse_max_posts(request.args.get('max_posts'))
+    if max_posts is None:
+        return jsonify({'error': 'max_posts must be a positive integer'}), 400
+    
+    def generate():
         if not username:
-            return jsonify({'error': 'Username required'})
+            yield _sse('failed', {'error': 'Username required'})
+            return
         
-        # Initialize Reddit (read-only)
-        reddit = praw.Reddit(**REDDIT_CONFIG)
+        started = time.perf_counter()
+        first = True
+        # id -> item, so a refreshed copy of a stored item isn't counted twice
+        seen = {}
         
-        # Analyze user
-        result = analyze_user(reddit, username)
-        
-        if not result:
-            return jsonify({'error': 'User not found or no recent posts'})
-        
-        toxic_count, total_count, details, toxic_items = result
-        
-        return jsonify({
-            'username': username,
-            'toxic_count': toxic_count,
-            'total_count': total_count,
-            'toxic_items': toxic_items[:5]  # Top 5 toxic items
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)})
+        with metrics.timer("analyze_stream"):
+            try:
+                for detail in stream_user_items(get_reddit(), username, max_posts):
+                    if first:
+                        metrics.observe("securedm_stage_seconds", time.perf_counter() - started, stage="first_result")
+                        first = False
+                    seen[detail['id']] = detail
+                    yield _sse('item', {
+                        'item': _item_event(detail),
+                        'toxic_count': sum(1 for d in seen.values() if _is_toxic_item(d)),
+                        'total_count': len(seen)
+                    })
+            except Exception as e:
+                metrics.inc("securedm_errors_total", stage="analyze_stream")
+                yield _sse('failed', {'error': str(e)})
+                return
+            
+            # The store trims its window after a refresh, so it has the final say
+            store = get_user_store()
+            if store:
+                result = store.summary(username, max_posts)
+            else:
+                details = list(seen.values())
+                toxic_items = [d for d in details if _is_toxic_item(d)]
+                result = (len(toxic_items), len(details), details, toxic_items) if details else None
+            if not result:
+                metrics.inc("securedm_requests_total", outcome="not_found")
+                yield _sse('failed', {'error': 'User not found or no recent posts'})
+                return
+            
+            toxic_count, total_count, details, toxic_items = result
+            metrics.inc("securedm_requests_total", outcome="stream")
+            yield _sse('done', {
+                'username': username,
+                'toxic_count': toxic_count,
+                'total_count': total_count,
+                'toxic_items': [_item_event(d) for d in toxic_items[:5]]
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        # Don't let proxies hold events back until the response ends
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-def analyze_user(reddit, username, max_posts=10):
-    try:
-        user = reddit.redditor(username)
-        texts = []
-        analysis_details = []
-
-        # Fetch recent comments
-        for comment in user.comments.new(limit=max_posts):
-            if comment.body and comment.body != "[deleted]":
-                texts.append(comment.body)
-                analysis_details.append({
-                    'type': 'comment',
-                    'content': comment.body[:100] + "..." if len(comment.body) > 100 else comment.body,
-                    'subreddit': str(comment.subreddit),
-                    'created': datetime.fromtimestamp(comment.created_utc)
-                })
+@app.route('/analyze/bulk', methods=['POST'])
+def analyze_bulk():
+    """
+    Analyze many users, streaming one JSON line per user as each finishes
+    
+    Body: {"usernames": [...] or "a, b c", "max_posts": 10}. The last line
+    is {"done": true, "totals": {...}}.
+    """
+    data = request.get_json(silent=True) or {}
+    usernames = parse_usernames(data.get('usernames'))
+    max_posts = parse_max_posts(data.get('max_posts'))
+    if max_posts is None:
+        return jsonify({'error': 'max_posts must be a positive integer'}), 400
+    
+    if not usernames:
+        return jsonify({'error': 'Usernames required'})
+    if len(usernames) > BULK_MAX_USERS:
+        return jsonify({'error': f'At most {BULK_MAX_USERS} usernames per request'})
+    
+    # Every bulk request draws from the same per-process Reddit quota
+    analyzer = BulkAnalyzer(get_reddit(), store=get_user_store(), bucket=get_bucket())
+    
+    def generate():
+        summaries = []
+        try:
+            with metrics.timer("analyze_bulk"):
+                for summary in analyzer.analyze_many(usernames, max_posts):
+                    summaries.append(summary)
+                    yield json.dumps(summary, default=str) + "\n"
+            yield json.dumps({'done': True, 'totals': totals(summaries)}) + "\n"
+            metrics.inc("securedm_requests_total", outcome="bulk")
+        finally:
+            analyzer.close()
+    
+    return Response(generate(), mimetype="application/x-ndjson")
 
-        # Fetch recent submissions
-        for submission in user.submissions.new(limit=max_posts):
-            content = submission.title
-            if submission.selftext:
-                content += " " + submission.selftext
-            
-            texts.append(content)
-            analysis_details.append({
-                'type': 'submission',
-                'content': content[:100] + "..." if len(content) > 100 else content,
-                'subreddit': str(submission.subreddit),
-                'created': datetime.fromtimestamp(submission.created_utc)
-            })
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process answers, whether or not the model is loaded
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
 
-        if not texts:
-            return None
+@app.route('/readyz')
+def readyz():
+    # Readiness: only take traffic once the model has run its warmup batch
+    torch = sys.modules.get("torch")
+    ready = is_ready()
+    return jsonify({
+        'ready': ready,
+        'pid': os.getpid(),
+        'backend': BACKEND,
+        'threads': torch.get_num_threads() if torch else None
+    }), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format; counters are per process
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Small pages for streaming, so the first items are classified after a few posts, not 25
+STREAM_PAGE_SIZE = 8
+
+def stream_user_items(reddit, username, max_posts=10, page_size=STREAM_PAGE_SIZE):
+    """
+    Yield a user's classified items as soon as each page is classified
+    
+    With the user store, stored items come first (instantly), followed by
+    anything new from the refresh; a full refresh may send an item again
+    with its new classification. Without the store every page is fetched
+    and classified here.
+    
+    Yields: detail dicts with toxicity_label and toxicity_score
+    """
+    store = get_user_store()
+    if not store:
+        for source, page in fetch_user_pages(reddit, username, max_posts, page_size=page_size):
+            page_texts = [text for text, _ in page]
+            # Title + selftext can be tens of kilobytes, so submissions are
+            # classified in token windows under a per-document budget
+            classify = classify_long_many if source == "submissions" else classify_batch
+            for (text, detail), (label, score) in zip(page, classify(page_texts)):
+                detail['toxicity_label'] = label
+                detail['toxicity_score'] = score
+                yield detail
+        return
+    
+    stored = store.summary(username, max_posts)
+    if stored:
+        for detail in stored[2]:
+            yield detail
+    
+    # The refresh runs in the background and hands over pages as they are classified
+    pages = queue.Queue()
+    
+    def refresh():
+        try:
+            store.refresh(reddit, username, max_posts, on_page=lambda details: pages.put((details, None)), page_size=page_size)
+            pages.put((None, None))
+        except Exception as e:
+            pages.put((None, e))
+    
+    threading.Thread(target=refresh, name="analyze-stream", daemon=True).start()
+    while True:
+        details, error = pages.get()
+        if error is not None:
+            raise error
+        if details is None:
+            return
+        yield from details
 
-        # Analyze each text for toxicity
-        toxic_count = 0
-        toxic_items = []
+def analyze_user(reddit, username, max_posts=10):
+    try:
+        # Only fetch and classify what's new since the last lookup
+        store = get_user_store()
+        if store:
+            return store.analyze(reddit, username, max_posts)
         
-        for i, text in enumerate(texts):
-            try:
-                label, score = classify_dm(text)
-                analysis_details[i]['toxicity_label'] = label
-                analysis_details[i]['toxicity_score'] = score
-                
-                if label and label.upper() == "TOXIC":
-                    toxic_count += 1
-                    toxic_items.append(analysis_details[i])
-                    
-            except Exception as e:
-                analysis_details[i]['toxicity_label'] = "ERROR"
-                analysis_details[i]['toxicity_score'] = 0.0
+        # Comments and submissions download concurrently; each page is
+        # classified as soon as it arrives while the rest keep downloading
+        analysis_details = list(stream_user_items(reddit, username, max_posts, page_size=25))
+        if not analysis_details:
+            return None
 
-        return toxic_count, len(texts), analysis_details, toxic_items
+        # Comments first, then submissions, as before
+        analysis_details.sort(key=lambda d: d['type'] != 'comment')
+        toxic_items = [d for d in analysis_details if _is_toxic_item(d)]
+        toxic_count = len(toxic_items)
+
+        return toxic_count, len(analysis_details), analysis_details, toxic_items
 
     except Exception as e:
         return None
 
+def prepare():
+    """Load and warm up the model before serving, see wsgi.py for production"""
+    # Load the model before serving so the first request doesn't pay for it
+    warmup()
+    # Concurrent requests share model calls instead of running batch size 1
+    if os.getenv("SECUREDM_MICROBATCH", "1") != "0":
+        enable_micro_batching()
+
 if __name__ == '__main__':
+    # Development server; production runs under gunicorn -c gunicorn.conf.py wsgi:app
+    prepare()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
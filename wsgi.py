@@ -0,0 +1,13 @@
+"""
+Production entry point for the web app
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py turns on preload_app, so this module is imported once in
+the master: the model is loaded and warmed up there and every forked
+worker shares its weights copy-on-write instead of loading its own copy.
+"""
+
+from webapp import app, prepare
+
+prepare()